@@ -0,0 +1,65 @@
+"""
+Compare two benchmark results JSON files written by run_benchmark.py
+
+Benchmarks slower than the threshold ratio are marked as regression, and exit code is 1
+"""
+
+import argparse
+import json
+import sys
+
+DEFAULT_THRESHOLD = 1.2
+
+
+def load_results(file_name: str) -> dict:
+    """Return best seconds of benchmarks by (case, benchmark name)"""
+
+    with open(file_name, encoding="utf-8") as f:
+        results = json.load(f)
+    return {
+        (case["case"], name): result["best_seconds"]
+        for case in results["cases"]
+        for name, result in case["benchmarks"].items()
+    }
+
+
+def compare_results(baseline: dict, current: dict, threshold: float = DEFAULT_THRESHOLD) -> list:
+    """Return comparison rows of benchmarks in both results, with regression flag"""
+
+    rows = []
+    for key in sorted(baseline.keys() & current.keys()):
+        ratio = current[key] / baseline[key] if baseline[key] > 0 else float("inf")
+        rows.append(
+            {
+                "case": key[0],
+                "benchmark": key[1],
+                "baseline_seconds": baseline[key],
+                "current_seconds": current[key],
+                "ratio": ratio,
+                "regression": ratio > threshold,
+            }
+        )
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two benchmark results")
+    parser.add_argument("baseline", help="baseline results JSON file")
+    parser.add_argument("current", help="current results JSON file")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="slow down ratio reported as regression",
+    )
+    args = parser.parse_args()
+
+    rows = compare_results(load_results(args.baseline), load_results(args.current), args.threshold)
+    for row in rows:
+        mark = "  REGRESSION" if row["regression"] else ""
+        print(
+            f"{row['case']:<28} {row['benchmark']:<26} "
+            f"{row['baseline_seconds']:>10.3f}s {row['current_seconds']:>10.3f}s "
+            f"{row['ratio']:>6.2f}x{mark}"
+        )
+    sys.exit(1 if any(row["regression"] for row in rows) else 0)
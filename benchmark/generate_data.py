@@ -0,0 +1,288 @@
+"""
+Generate synthetic hospital source workbook and FTE database for benchmark
+
+Functions:
+exported functions:
+- generate_source_workbook
+- generate_fte_database
+- period_names
+
+local functions:
+- make_cost_centres
+- make_staff
+- make_overrides
+- make_period_records
+
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from dataprocess import (  # noqa: E402
+    ReturnCodes,
+    build_columnar_store,
+    columnar_store_available,
+)
+
+# staff category, order in reports, rank prefix, number of ranks, share of staff
+STAFF_CATEGORIES = [
+    ("Doctor", 1, "MO", 5, 0.12),
+    ("Nurse", 2, "RN", 6, 0.38),
+    ("Allied Health", 3, "AH", 5, 0.12),
+    ("Pharmacy", 4, "PH", 3, 0.04),
+    ("Technician", 5, "TE", 4, 0.08),
+    ("Administration", 6, "AD", 5, 0.14),
+    ("Support Services", 7, "SS", 4, 0.10),
+    ("Management", 8, "MG", 3, 0.02),
+]
+
+# share of staff split to several cost centres in override sheet
+OVERRIDE_STAFF_SHARE = 0.25
+# share of staff replaced in each month
+MONTHLY_STAFF_TURNOVER = 0.02
+# share of disabled cost centres in cost centre sheet
+DISABLED_COST_CENTRE_SHARE = 0.05
+
+FIRST_STAFF_NUMBER = 100001
+
+
+def period_names(number_of_periods: int, last_year: int = 2025, last_month: int = 6) -> list:
+    """Return yyyymm period names of number_of_periods months ending at last_year / last_month"""
+
+    periods = []
+    year, month = last_year, last_month
+    for _ in range(number_of_periods):
+        periods.append(f"{year}{str(month).zfill(2)}")
+        year, month = (year - 1, 12) if month == 1 else (year, month - 1)
+    return periods[::-1]
+
+
+def make_cost_centres(number_of_cost_centres: int) -> pd.DataFrame:
+    """Return cost centre codes and names, codes are 3 digits or more"""
+
+    codes = np.arange(1, number_of_cost_centres + 1)
+    return pd.DataFrame(
+        {
+            "code": codes,
+            "Value": [str(c).zfill(3) for c in codes],
+            "Description": [f"Department {c}" for c in codes],
+        }
+    )
+
+
+def make_staff(
+    rng: np.random.Generator, number_of_staff: int, number_of_cost_centres: int, first_staff_number: int
+) -> pd.DataFrame:
+    """Return staff records with rank, staff category, FTE and default cost centre"""
+
+    shares = np.array([c[4] for c in STAFF_CATEGORIES])
+    category_index = rng.choice(len(STAFF_CATEGORIES), size=number_of_staff, p=shares / shares.sum())
+    rank_number = rng.integers(1, 100, size=number_of_staff)
+    ranks = [
+        f"{STAFF_CATEGORIES[c][2]}{r % STAFF_CATEGORIES[c][3] + 1}"
+        for c, r in zip(category_index, rank_number)
+    ]
+    return pd.DataFrame(
+        {
+            "StaffNo": np.arange(first_staff_number, first_staff_number + number_of_staff),
+            "Rank": ranks,
+            "Section": "General",
+            "Staff Category": [STAFF_CATEGORIES[c][0] for c in category_index],
+            "FTE": rng.choice([1.0, 1.0, 1.0, 1.0, 0.8, 0.5], size=number_of_staff),
+            # a few large cost centres hold most staff, as in a hospital
+            "Default Cost Centre": np.minimum(
+                rng.zipf(1.3, size=number_of_staff), number_of_cost_centres
+            ),
+        }
+    )
+
+
+def make_overrides(rng: np.random.Generator, staff_df: pd.DataFrame, number_of_cost_centres: int) -> pd.DataFrame:
+    """Return override records splitting some staff to 2 or 3 cost centres"""
+
+    number_of_override_staff = int(len(staff_df) * OVERRIDE_STAFF_SHARE)
+    override_staff_df = staff_df.sample(n=number_of_override_staff, random_state=rng)
+    splits = [[50, 50], [60, 40], [70, 30], [40, 30, 30]]
+    split_index = rng.integers(0, len(splits), size=number_of_override_staff)
+    percentages = [splits[i] for i in split_index]
+    counts = np.array([len(p) for p in percentages])
+
+    override_df = override_staff_df.loc[
+        override_staff_df.index.repeat(counts), ["StaffNo", "Rank"]
+    ].reset_index(drop=True)
+    override_df["CCode"] = rng.integers(1, number_of_cost_centres + 1, size=len(override_df))
+    override_df["CostCentre"] = [f"Department {c}" for c in override_df["CCode"]]
+    override_df["Allocated Percentage"] = np.concatenate(percentages) if percentages else []
+    return override_df
+
+
+def generate_source_workbook(
+    file_name: str, number_of_staff: int, number_of_cost_centres: int, seed: int = 1
+) -> str:
+    """Write synthetic source workbook of the 4 sheets read by process_source_data"""
+
+    rng = np.random.default_rng(seed)
+    cost_centres_df = make_cost_centres(number_of_cost_centres)
+    staff_df = make_staff(rng, number_of_staff, number_of_cost_centres, FIRST_STAFF_NUMBER)
+    override_df = make_overrides(rng, staff_df, number_of_cost_centres)
+    # staff number not in base data is reported, not an error
+    override_df.loc[len(override_df)] = [FIRST_STAFF_NUMBER - 1, staff_df["Rank"].iloc[0], 1, "Department 1", 100]
+
+    cost_centre_sheet_df = pd.DataFrame(
+        {
+            "Value": cost_centres_df["Value"],
+            "Description": cost_centres_df["Description"],
+            "Enabled/ Disabled": "Enabled",
+        }
+    )
+    disabled_df = cost_centre_sheet_df.sample(
+        frac=DISABLED_COST_CENTRE_SHARE, random_state=rng
+    ).assign(**{"Enabled/ Disabled": "Disabled"})
+    disabled_df["Value"] = [str(number_of_cost_centres + i + 1).zfill(3) for i in range(len(disabled_df))]
+    cost_centre_sheet_df = pd.concat([cost_centre_sheet_df, disabled_df], ignore_index=True)
+
+    staff_category_order_df = pd.DataFrame(
+        {
+            "Staff Category": [c[0] for c in STAFF_CATEGORIES],
+            "Order": [c[1] for c in STAFF_CATEGORIES],
+        }
+    )
+
+    with pd.ExcelWriter(file_name, engine="openpyxl") as writer:
+        staff_df.to_excel(writer, sheet_name="Base", index=False)
+        # override sheet has a title row above its header
+        pd.DataFrame([["Cost centre override"]]).to_excel(
+            writer, sheet_name="Override", index=False, header=False
+        )
+        override_df.to_excel(writer, sheet_name="Override", index=False, startrow=1)
+        cost_centre_sheet_df.to_excel(writer, sheet_name="Cost Centre", index=False)
+        staff_category_order_df.to_excel(writer, sheet_name="Staff Category Order", index=False)
+
+    return file_name
+
+
+def make_period_records(
+    staff_df: pd.DataFrame, override_df: pd.DataFrame, cost_centres_df: pd.DataFrame
+) -> pd.DataFrame:
+    """Return FTE database records of a period, in the columns written by update_fte_database"""
+
+    category_order = {c[0]: c[1] for c in STAFF_CATEGORIES}
+    cost_centre_name = dict(zip(cost_centres_df["code"], cost_centres_df["Description"]))
+    staff_by_number = staff_df.set_index("StaffNo")
+
+    override_staff_df = staff_by_number.loc[override_df["StaffNo"]]
+    override_records_df = pd.DataFrame(
+        {
+            "staff_number": override_df["StaffNo"].astype(str).to_numpy(),
+            "Rank": override_staff_df["Rank"].to_numpy(),
+            "Staff Category": override_staff_df["Staff Category"].to_numpy(),
+            "cost centre code": override_df["CCode"].to_numpy(),
+            "allocation": (
+                override_df["Allocated Percentage"].to_numpy() / 100.0
+                * override_staff_df["FTE"].to_numpy()
+            ),
+        }
+    )
+    base_staff_df = staff_df[~staff_df["StaffNo"].isin(override_df["StaffNo"])]
+    base_records_df = pd.DataFrame(
+        {
+            "staff_number": base_staff_df["StaffNo"].astype(str),
+            "Rank": base_staff_df["Rank"],
+            "Staff Category": base_staff_df["Staff Category"],
+            "cost centre code": base_staff_df["Default Cost Centre"],
+            "allocation": base_staff_df["FTE"],
+        }
+    )
+    records_df = pd.concat([override_records_df, base_records_df], ignore_index=True)
+    records_df.insert(3, "staff category order", records_df["Staff Category"].map(category_order))
+    records_df.insert(5, "cost centre name", records_df["cost centre code"].map(cost_centre_name))
+    records_df["cost centre code"] = records_df["cost centre code"].astype(str).str.zfill(3)
+    return records_df
+
+
+def generate_fte_database(
+    database_file_name: str,
+    number_of_staff: int,
+    number_of_cost_centres: int,
+    number_of_periods: int,
+    seed: int = 2,
+    columnar_store: bool = True,
+) -> list:
+    """Write synthetic FTE database excel file of number_of_periods months, return period names
+
+    Staff turnover and override changes happen each month. Columnar store is
+    built next to the database when pyarrow is available and columnar_store is True.
+    """
+
+    rng = np.random.default_rng(seed)
+    cost_centres_df = make_cost_centres(number_of_cost_centres)
+    staff_df = make_staff(rng, number_of_staff, number_of_cost_centres, FIRST_STAFF_NUMBER)
+    override_df = make_overrides(rng, staff_df, number_of_cost_centres)
+    next_staff_number = FIRST_STAFF_NUMBER + number_of_staff
+
+    periods = period_names(number_of_periods)
+    database_excel_file = database_file_name + ".xlsx"
+    # sheets are written once without styling, reading them is the same as the
+    # sheets written by update_fte_database
+    with pd.ExcelWriter(database_excel_file, engine="openpyxl") as writer:
+        for period in periods:
+            make_period_records(staff_df, override_df, cost_centres_df).to_excel(
+                writer, sheet_name=period, index=False
+            )
+
+            # staff leaving are replaced by new staff for next month
+            number_of_leavers = int(len(staff_df) * MONTHLY_STAFF_TURNOVER)
+            leavers = staff_df.sample(n=number_of_leavers, random_state=rng)["StaffNo"]
+            joiners_df = make_staff(rng, number_of_leavers, number_of_cost_centres, next_staff_number)
+            next_staff_number += number_of_leavers
+            staff_df = pd.concat(
+                [staff_df[~staff_df["StaffNo"].isin(leavers)], joiners_df], ignore_index=True
+            )
+            override_df = pd.concat(
+                [
+                    override_df[~override_df["StaffNo"].isin(leavers)],
+                    make_overrides(rng, joiners_df, number_of_cost_centres),
+                ],
+                ignore_index=True,
+            )
+
+    if columnar_store and columnar_store_available():
+        if build_columnar_store(database_excel_file) != ReturnCodes.OK:
+            print(f"Columnar store of {database_excel_file} not built")
+
+    return periods
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic hospital HR data")
+    parser.add_argument("--staff", type=int, default=1000, help="number of staff")
+    parser.add_argument("--cost-centres", type=int, default=50, help="number of cost centres")
+    parser.add_argument("--periods", type=int, default=12, help="number of monthly periods in database")
+    parser.add_argument("--seed", type=int, default=1, help="random seed")
+    parser.add_argument("--output-dir", default=".", help="directory of generated files")
+    parser.add_argument(
+        "--no-columnar-store", action="store_true", help="do not build columnar store of database"
+    )
+    args = parser.parse_args()
+
+    name = f"staff{args.staff}_cc{args.cost_centres}"
+    source_file = generate_source_workbook(
+        os.path.join(args.output_dir, f"source_{name}.xlsx"), args.staff, args.cost_centres, args.seed
+    )
+    print(f"Source workbook {source_file} generated")
+    database_file_name = os.path.join(args.output_dir, f"database_{name}_p{args.periods}")
+    generate_fte_database(
+        database_file_name,
+        args.staff,
+        args.cost_centres,
+        args.periods,
+        args.seed + 1,
+        columnar_store=not args.no_columnar_store,
+    )
+    print(f"FTE database {database_file_name}.xlsx generated")
@@ -0,0 +1,358 @@
+"""
+Run benchmark of source data ingest and report generation on synthetic data
+
+Results are written to a JSON file of stable format, to be compared between
+versions with compare_results.py
+
+Functions:
+exported functions:
+- run_case
+
+local functions:
+- case_name
+- prepare_case_data
+- time_function
+- time_startup
+- environment_info
+
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from importlib import metadata
+
+BENCHMARK_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIRECTORY = os.path.join(BENCHMARK_DIRECTORY, "..", "src")
+sys.path.insert(0, SOURCE_DIRECTORY)
+
+import pandas as pd  # noqa: E402
+
+from dataprocess import (  # noqa: E402
+    ReturnCodes,
+    process_source_data,
+    load_fte_database,
+    generate_department_reports,
+    DEPARTMENT_REPORT_GENERATORS,
+    DEPARTMENT_REPORT_NAMES,
+    FteDatabase,
+    read_sheet_names,
+    EXCEL_READER_AUTO,
+    EXCEL_READER_ENGINES,
+    excel_reader_engines,
+    set_excel_reader,
+)
+from timing import start_timing_report, stop_timing_report  # noqa: E402
+from generate_data import (  # noqa: E402
+    generate_source_workbook,
+    generate_fte_database,
+    period_names,
+)
+
+RESULTS_FORMAT_VERSION = 1
+
+# number of staff, number of cost centres, number of periods
+PRESETS = {
+    "small": [(1000, 50, 12)],
+    "medium": [(10000, 50, 12), (10000, 500, 12), (10000, 500, 60)],
+    "large": [(100000, 500, 12), (100000, 500, 60)],
+}
+
+# report keys with PDF sections rendered by worker processes
+PARALLEL_PDF_REPORTS = {"fte_costcentre"}
+
+# python arguments of startup benchmarks run in a new interpreter, {source} is the case source
+# workbook, and their seconds budget; libraries of data and PDF are imported on first use
+STARTUP_COMMANDS = {
+    "startup_import_dataprocess": (["-c", "import dataprocess"], 0.25),
+    "startup_cli_validate": (["cli.py", "--no-timing", "validate", "{source}"], 0.5),
+}
+
+
+def case_name(number_of_staff: int, number_of_cost_centres: int, number_of_periods: int) -> str:
+    return f"staff{number_of_staff}_cc{number_of_cost_centres}_p{number_of_periods}"
+
+
+def prepare_case_data(
+    data_directory: str, number_of_staff: int, number_of_cost_centres: int, number_of_periods: int
+):
+    """Return source workbook and database excel file names of the case, generated when missing"""
+
+    source_file = os.path.join(
+        data_directory, f"source_staff{number_of_staff}_cc{number_of_cost_centres}.xlsx"
+    )
+    if not os.path.exists(source_file):
+        print(f"generating {source_file}")
+        generate_source_workbook(source_file, number_of_staff, number_of_cost_centres)
+
+    database_file_name = os.path.join(
+        data_directory,
+        "database_" + case_name(number_of_staff, number_of_cost_centres, number_of_periods),
+    )
+    if not os.path.exists(database_file_name + ".xlsx"):
+        print(f"generating {database_file_name}.xlsx")
+        generate_fte_database(
+            database_file_name, number_of_staff, number_of_cost_centres, number_of_periods
+        )
+
+    return source_file, database_file_name + ".xlsx"
+
+
+def time_function(repeat: int, function, *args) -> dict:
+    """Return run seconds of function called repeat times, and stage totals of the last run"""
+
+    seconds = []
+    for _ in range(repeat):
+        timing_report = start_timing_report(function.__name__)
+        start_time = time.perf_counter()
+        try:
+            result = function(*args)
+        finally:
+            seconds.append(time.perf_counter() - start_time)
+            stop_timing_report()
+        if type(result) is ReturnCodes and result != ReturnCodes.OK:
+            raise RuntimeError(f"{function.__name__} returned {result}")
+
+    return {
+        "best_seconds": round(min(seconds), 6),
+        "mean_seconds": round(sum(seconds) / len(seconds), 6),
+        "runs_seconds": [round(s, 6) for s in seconds],
+        "stages": {
+            path: round(v["seconds"], 6)
+            for path, v in timing_report.stage_totals(max_depth=2).items()
+        },
+    }
+
+
+def time_startup(repeat: int, arguments: list) -> dict:
+    """Return run seconds of python started with arguments in source directory, repeat times"""
+
+    seconds = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        subprocess.run([sys.executable, *arguments], cwd=SOURCE_DIRECTORY, check=True)
+        seconds.append(time.perf_counter() - start_time)
+
+    return {
+        "best_seconds": round(min(seconds), 6),
+        "mean_seconds": round(sum(seconds) / len(seconds), 6),
+        "runs_seconds": [round(s, 6) for s in seconds],
+        "stages": {},
+    }
+
+
+def run_case(
+    data_directory: str,
+    number_of_staff: int,
+    number_of_cost_centres: int,
+    number_of_periods: int,
+    repeat: int = 3,
+    pdf_workers: int = 1,
+    excel_reader: str = EXCEL_READER_AUTO,
+) -> dict:
+    """Run benchmarks of a data size case, return its results"""
+
+    set_excel_reader(excel_reader)
+    source_file, database_excel_file = prepare_case_data(
+        data_directory, number_of_staff, number_of_cost_centres, number_of_periods
+    )
+    # reports of the last 12 months, the maximum of a report
+    first_period = period_names(number_of_periods)[-min(number_of_periods, 12)]
+    start_year, start_month = int(first_period[:4]), int(first_period[4:])
+
+    benchmarks = {}
+    for name, (arguments, budget_seconds) in STARTUP_COMMANDS.items():
+        benchmarks[name] = time_startup(
+            repeat, [a.format(source=os.path.abspath(source_file)) for a in arguments]
+        )
+        benchmarks[name]["budget_seconds"] = budget_seconds
+
+    benchmarks["process_source_data"] = time_function(repeat, process_source_data, source_file)
+
+    def load_database():
+        fte_database = load_fte_database(database_excel_file)
+        if type(fte_database) is ReturnCodes:
+            return fte_database
+        fte_database.load_periods(fte_database.periods())
+        return ReturnCodes.OK
+
+    benchmarks["load_fte_database"] = time_function(repeat, load_database)
+
+    # database sheets listed and read from the excel file, as load_fte_database without columnar store
+    def load_database_excel():
+        fte_database = FteDatabase(database_excel_file, read_sheet_names(database_excel_file))
+        fte_database.load_periods(fte_database.periods())
+        return ReturnCodes.OK
+
+    # excel reading by each installed reader engine
+    set_excel_reader(EXCEL_READER_AUTO)
+    for engine in excel_reader_engines():
+        set_excel_reader(engine)
+        benchmarks[f"process_source_data_{engine}"] = time_function(
+            repeat, process_source_data, source_file
+        )
+        benchmarks[f"load_database_excel_{engine}"] = time_function(repeat, load_database_excel)
+    set_excel_reader(excel_reader)
+
+    with tempfile.TemporaryDirectory() as report_directory:
+        for key, generate_report in DEPARTMENT_REPORT_GENERATORS.items():
+            name = f"{key}_report"
+            title = DEPARTMENT_REPORT_NAMES[key][1]
+            counter = iter(range(repeat))
+
+            # database is loaded in each run, as in reports generation of main program
+            options = {"pdf_workers": pdf_workers} if key in PARALLEL_PDF_REPORTS else {}
+
+            def run_report():
+                report_file_name = os.path.join(report_directory, f"{name}_{next(counter)}")
+                return generate_report(
+                    database_excel_file, report_file_name, title, start_year, start_month, **options
+                )
+
+            run_report.__name__ = name
+            benchmarks[name] = time_function(repeat, run_report)
+
+        # the three reports generated concurrently, as in main program
+        counter = iter(range(repeat))
+
+        def run_reports_concurrently():
+            run = next(counter)
+            report_files = {
+                key: (os.path.join(report_directory, f"concurrent_{key}_{run}"), title)
+                for key, (_, title) in DEPARTMENT_REPORT_NAMES.items()
+            }
+            results = generate_department_reports(
+                database_excel_file,
+                report_files,
+                start_year,
+                start_month,
+                concurrent=True,
+                pdf_workers=pdf_workers,
+            )
+            failed = [r for r in results.values() if r != ReturnCodes.OK]
+            return failed[0] if failed else ReturnCodes.OK
+
+        benchmarks["reports_concurrent"] = time_function(repeat, run_reports_concurrently)
+
+    return {
+        "case": case_name(number_of_staff, number_of_cost_centres, number_of_periods),
+        "staff": number_of_staff,
+        "cost_centres": number_of_cost_centres,
+        "periods": number_of_periods,
+        "repeat": repeat,
+        "pdf_workers": pdf_workers,
+        "excel_reader": excel_reader,
+        "benchmarks": benchmarks,
+    }
+
+
+def environment_info() -> dict:
+    """Return versions of the environment the benchmark ran in"""
+
+    try:
+        git_commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BENCHMARK_DIRECTORY,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        git_commit = None
+
+    try:
+        import pyarrow
+
+        pyarrow_version = pyarrow.__version__
+    except ImportError:
+        pyarrow_version = None
+
+    try:
+        calamine_version = metadata.version("python-calamine")
+    except metadata.PackageNotFoundError:
+        calamine_version = None
+
+    return {
+        "git_commit": git_commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor_count": os.cpu_count(),
+        "pandas": pd.__version__,
+        "pyarrow": pyarrow_version,
+        "python_calamine": calamine_version,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ingest and report generation")
+    parser.add_argument(
+        "--preset", choices=sorted(PRESETS), default="small", help="data size cases to run"
+    )
+    parser.add_argument(
+        "--case",
+        nargs=3,
+        type=int,
+        action="append",
+        metavar=("STAFF", "COST_CENTRES", "PERIODS"),
+        help="data size case to run instead of preset, can be repeated",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="runs of each benchmark")
+    parser.add_argument(
+        "--data-dir",
+        default=os.path.join(BENCHMARK_DIRECTORY, "data"),
+        help="directory of generated data, reused between runs",
+    )
+    parser.add_argument(
+        "--pdf-workers", type=int, default=1, help="processes rendering cost centre PDF sections"
+    )
+    parser.add_argument(
+        "--excel-reader",
+        choices=[EXCEL_READER_AUTO, *EXCEL_READER_ENGINES],
+        default=EXCEL_READER_AUTO,
+        help="excel reader engine of the end to end benchmarks",
+    )
+    parser.add_argument("--output", help="results JSON file name")
+    args = parser.parse_args()
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    cases = args.case if args.case else PRESETS[args.preset]
+
+    results = {
+        "format_version": RESULTS_FORMAT_VERSION,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "environment": environment_info(),
+        "cases": [],
+    }
+    for number_of_staff, number_of_cost_centres, number_of_periods in cases:
+        print(f"running {case_name(number_of_staff, number_of_cost_centres, number_of_periods)}")
+        case_results = run_case(
+            args.data_dir,
+            number_of_staff,
+            number_of_cost_centres,
+            number_of_periods,
+            args.repeat,
+            args.pdf_workers,
+            args.excel_reader,
+        )
+        for name, result in case_results["benchmarks"].items():
+            over_budget = result["best_seconds"] > result.get("budget_seconds", float("inf"))
+            print(f"  {name}: {result['best_seconds']:.3f}s{'  OVER BUDGET' if over_budget else ''}")
+        results["cases"].append(case_results)
+
+    output = args.output
+    if output is None:
+        results_directory = os.path.join(BENCHMARK_DIRECTORY, "results")
+        os.makedirs(results_directory, exist_ok=True)
+        output = os.path.join(
+            results_directory,
+            f"benchmark_{results['environment']['git_commit'] or 'unknown'}_{datetime.now():%Y%m%d_%H%M%S}.json",
+        )
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    print(f"results written to {output}")
@@ -0,0 +1,297 @@
+"""
+Command line of database update and report generation, for batch and scheduled runs without window
+
+Flet is not imported, e.g.
+    python cli.py validate source.xlsx
+    python cli.py ingest source.xlsx HR_FTE_Database.xlsx --period 202507
+    python cli.py reports HR_FTE_Database.xlsx --start 202507 --months 12
+
+Exit code is 0 on success, and 10 - ReturnCodes value on error, e.g. 11 for
+ERROR_FILE_ERROR and 13 for ERROR_DATABASE_PERIOD_EXISTED. Problems are
+written to standard error.
+
+Functions:
+exported functions:
+- main
+- exit_code
+
+local functions:
+- parse_period
+- print_progress
+- save_timing_report
+- run_validate
+- run_ingest
+- run_reports
+- build_parser
+
+"""
+
+import argparse
+import os
+import sys
+from datetime import datetime
+
+from dataprocess import (
+    ReturnCodes,
+    JobControl,
+    EXCEL_MODE_APPEND,
+    EXCEL_MODE_REPLACE,
+    MAX_NUMBER_MONTH_IN_REPORT,
+    DEFAULT_PDF_WORKERS,
+    DEPARTMENT_REPORT_NAMES,
+    validate_source_file,
+    process_source_data,
+    update_fte_database,
+    generate_department_reports,
+    department_report_files,
+    configure_logging,
+    configure_excel_reader,
+)
+from timing import start_timing_report, stop_timing_report
+
+# exit code of ReturnCodes.ERROR, other errors are counted from it, e.g. ERROR_FILE_ERROR is 11
+EXIT_CODE_ERROR_BASE = 10
+
+DATABASE_UPDATE_TIMING_FILE_SUFFIX = "_update_timing.json"
+REPORTS_TIMING_FILE_NAME = "HR_reports_timing"
+
+# issues of source data reported by process_source_data, database is updated with them
+SOURCE_DATA_ISSUES = {
+    "issue_staff_numbers_not_in_base": "Staff Numbers not found in Base Data",
+    "issue_expand_staff_fte_not_1": "Staff Numbers with FTE not 100% in Expand Data",
+}
+
+
+def exit_code(result: ReturnCodes) -> int:
+    """Return process exit code of result, 0 for OK results"""
+
+    if result.value > 0:
+        return 0
+    return EXIT_CODE_ERROR_BASE - result.value
+
+
+def parse_period(period: str) -> tuple:
+    """Return (year, month) of yyyymm period argument"""
+
+    try:
+        date = datetime.strptime(period, "%Y%m")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"period '{period}' is not yyyymm, e.g. 202507") from None
+    return date.year, date.month
+
+
+def print_progress(quiet: bool):
+    """Return progress callback printing each new stage to standard error"""
+
+    last_stage = None
+
+    def progress_callback(stage: str, fraction: float):
+        nonlocal last_stage
+        if not quiet and stage != last_stage:
+            print(stage, file=sys.stderr)
+            last_stage = stage
+
+    return progress_callback
+
+
+def save_timing_report(timing_file_name: str):
+    """Stop the timing report of the run and save it as JSON file"""
+
+    timing_report = stop_timing_report()
+    if timing_report is None:
+        return
+    try:
+        timing_report.save_json(timing_file_name)
+    except OSError:
+        print(f"Timing report {timing_file_name} not saved", file=sys.stderr)
+
+
+def run_validate(args) -> int:
+    """Check sheets and headers of source file"""
+
+    problems = validate_source_file(args.source)
+    for problem in problems:
+        print(problem, file=sys.stderr)
+    if len(problems) > 0:
+        return exit_code(ReturnCodes.ERROR_FILE_ERROR)
+    return 0
+
+
+def run_ingest(args) -> int:
+    """Add the period of source file to FTE database"""
+
+    problems = validate_source_file(args.source)
+    for problem in problems:
+        print(problem, file=sys.stderr)
+    if len(problems) > 0:
+        return exit_code(ReturnCodes.ERROR_FILE_ERROR)
+
+    year, month = args.period
+    period = f"{year}{str(month).zfill(2)}"
+    job_control = JobControl(print_progress(args.quiet))
+    start_timing_report("update database")
+    try:
+        result = process_source_data(args.source, job_control, validate=False)
+        if type(result) is not ReturnCodes:
+            for issue, description in SOURCE_DATA_ISSUES.items():
+                if len(result[issue]) > 0:
+                    print(f"{description}: {', '.join(result[issue])}", file=sys.stderr)
+            result = update_fte_database(
+                args.database,
+                period,
+                result["hr_fte_df"],
+                mode=EXCEL_MODE_REPLACE if args.replace else EXCEL_MODE_APPEND,
+            )
+    finally:
+        if not args.no_timing:
+            save_timing_report(
+                os.path.splitext(args.database)[0] + DATABASE_UPDATE_TIMING_FILE_SUFFIX
+            )
+        else:
+            stop_timing_report()
+
+    if result == ReturnCodes.ERROR_DATABASE_PERIOD_EXISTED:
+        print(
+            f"Database {args.database} already has period {period}, use --replace to overwrite it",
+            file=sys.stderr,
+        )
+    elif exit_code(result) != 0:
+        print(f"Database {args.database} not updated: {result.name}", file=sys.stderr)
+    return exit_code(result)
+
+
+def run_reports(args) -> int:
+    """Generate department reports from FTE database"""
+
+    year, month = args.start
+    output_dir = args.output_dir
+    if output_dir is None:
+        output_dir = os.path.dirname(os.path.abspath(args.database))
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+    except OSError as error:
+        print(f"Output directory {output_dir} cannot be created: {error}", file=sys.stderr)
+        return exit_code(ReturnCodes.ERROR_FILE_ERROR)
+    timestamp = f"{year}{str(month).zfill(2)}_{datetime.now():%H%M}"
+    report_files = department_report_files(output_dir, timestamp, args.report)
+
+    job_control = JobControl(print_progress(args.quiet))
+    start_timing_report("generate reports")
+    try:
+        results = generate_department_reports(
+            args.database,
+            report_files,
+            year,
+            month,
+            number_of_month=args.months,
+            job_control=job_control,
+            concurrent=not args.sequential,
+            pdf_workers=args.pdf_workers,
+        )
+    finally:
+        if not args.no_timing:
+            save_timing_report(
+                os.path.join(output_dir, f"{REPORTS_TIMING_FILE_NAME}_{timestamp}.json")
+            )
+        else:
+            stop_timing_report()
+
+    failed = []
+    for key, (report_file_name, _) in report_files.items():
+        if exit_code(results[key]) == 0:
+            print(f"{report_file_name}.pdf")
+            print(f"{report_file_name}.xlsx")
+        else:
+            print(f"Report {report_file_name} not generated: {results[key].name}", file=sys.stderr)
+            failed.append(results[key])
+
+    # first failed report in report order decides the exit code
+    return exit_code(failed[0]) if len(failed) > 0 else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Return argument parser of the validate, ingest and reports commands"""
+
+    parser = argparse.ArgumentParser(
+        description="HR cost reporting without window, for batch and scheduled runs"
+    )
+    parser.add_argument(
+        "--quiet", action="store_true", help="do not print progress stages"
+    )
+    parser.add_argument(
+        "--no-timing", action="store_true", help="do not write timing report JSON file"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    validate_parser = commands.add_parser(
+        "validate", help="check sheets and headers of source file"
+    )
+    validate_parser.add_argument("source", help="source excel file")
+    validate_parser.set_defaults(run=run_validate)
+
+    ingest_parser = commands.add_parser(
+        "ingest", help="add the period of source file to FTE database"
+    )
+    ingest_parser.add_argument("source", help="source excel file")
+    ingest_parser.add_argument(
+        "database", help="FTE database file, .xlsx or .sqlite / .db, created if missing"
+    )
+    ingest_parser.add_argument(
+        "--period", type=parse_period, required=True, help="period of source data, yyyymm"
+    )
+    ingest_parser.add_argument(
+        "--replace", action="store_true", help="overwrite the period if it is in database"
+    )
+    ingest_parser.set_defaults(run=run_ingest)
+
+    reports_parser = commands.add_parser(
+        "reports", help="generate department reports from FTE database"
+    )
+    reports_parser.add_argument("database", help="FTE database file")
+    reports_parser.add_argument(
+        "--start", type=parse_period, required=True, help="first period of reports, yyyymm"
+    )
+    reports_parser.add_argument(
+        "--months",
+        type=int,
+        choices=range(1, MAX_NUMBER_MONTH_IN_REPORT + 1),
+        default=MAX_NUMBER_MONTH_IN_REPORT,
+        metavar=f"1..{MAX_NUMBER_MONTH_IN_REPORT}",
+        help="number of months in reports",
+    )
+    reports_parser.add_argument(
+        "--report",
+        choices=list(DEPARTMENT_REPORT_NAMES),
+        action="append",
+        help="report to generate, can be repeated, all reports if not given",
+    )
+    reports_parser.add_argument(
+        "--output-dir",
+        help="directory of report files, created if missing, directory of database if not given",
+    )
+    reports_parser.add_argument(
+        "--sequential", action="store_true", help="generate reports one after another"
+    )
+    reports_parser.add_argument(
+        "--pdf-workers",
+        type=int,
+        default=DEFAULT_PDF_WORKERS,
+        help="processes rendering cost centre PDF sections, with --sequential",
+    )
+    reports_parser.set_defaults(run=run_reports)
+
+    return parser
+
+
+def main(argv: list = None) -> int:
+    """Run command of argv, return exit code"""
+
+    args = build_parser().parse_args(argv)
+    # log level and excel reader from HR_COST_LOG_LEVEL and HR_COST_EXCEL_READER, as in the app
+    configure_logging()
+    configure_excel_reader()
+    return args.run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
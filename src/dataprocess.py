@@ -4,44 +4,240 @@ Module provide all the necessary functions for data processing which are consume
 Functions:
 exported class:
 - ReturnCodes
+- FteDatabase
+- JobControl
+- FteCube
+- SqliteFteDatabase
 
 exported functions:
+- configure_logging
+- set_log_level
+- configure_excel_reader
+- set_excel_reader
+- validate_source_file
 - process_source_data
+- load_fte_database
+- update_fte_database
 - ReturnCodes
 - generate_department_fte_summary_report
 - generate_department_headcount_summary_report
 - generate_department_fte_costcentre_report
+- generate_department_reports
+- department_report_files
 - generate_excel_fr_df
 
 local functions:
 - get_available_periods
+- excel_reader_engines
+- read_with_excel_reader
+- read_excel
+- open_excel_file
+- read_sheet_names
+- aggregate_period
+- aggregate_periods
+- build_staff_category_table
+- prepare_report_aggregation
+- get_columnar_store_dir
+- columnar_store_available
+- read_columnar_manifest
+- write_columnar_manifest
+- write_columnar_period
+- build_columnar_store
+- is_sqlite_database
+- connect_sqlite_database
+- update_sqlite_database
+- write_excel_sheets
+- excel_writer_engine
+- excel_number_format
+- format_excel_columns
 - prepare_department_fte_trend_report
 - prepare_department_headcount_trend_report
 - prepare_department_fte_costcentre_report
 - generate_pdf_report
+- generate_pdf_report_parallel
+- generate_department_reports_concurrently
+- generate_department_report_process
+- render_pdf_sections
 - check_file_header
+- read_source_excel_file
+- process_source_excel_file
+- expand_source_records
 - report_css_style
+- report_table_html
+- format_report_numbers
 - clean_sheet_name
+- to_category_dtypes
+- lazy_import
 
 """
 
-import pandas as pd
+from __future__ import annotations
+
 import os
-from markdown_pdf import MarkdownPdf, Section
-from py_markdown_table.markdown_table import markdown_table
+import sys
+import json
+import logging
+import shutil
+import sqlite3
+import threading
+import time
+import multiprocessing
+import queue
+import io
+import copy
+import html
+from contextlib import closing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from importlib.util import find_spec, module_from_spec, LazyLoader
 from enum import Enum
 from textwrap import shorten
-
-# set DEBUG True to display verbose debug information, programmer use only
-DEBUG = True
+from typing import Union
+from timing import (
+    timing_span,
+    start_timing_report,
+    stop_timing_report,
+    add_timing_spans,
+)
+
+
+def lazy_import(name: str):
+    """Return module of name, imported on first use of its attributes
+
+    Program start and command line runs not using a library, e.g. validating
+    a source file without the PDF libraries, do not pay for importing it.
+    First use is not thread safe before Python 3.12. The app runs one job thread
+    at a time under the job lock shared by its pages, and concurrent reports and
+    PDF sections run in worker processes, so no two threads first use a library.
+    """
+
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = find_spec(name)
+    loader = LazyLoader(spec.loader)
+    spec.loader = loader
+    module = module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+# data, excel and PDF libraries take most of the import time of this module
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+openpyxl = lazy_import("openpyxl")
+pymupdf = lazy_import("pymupdf")
+markdown_pdf = lazy_import("markdown_pdf")
+
+logger = logging.getLogger(__name__)
+
+# environment variable to set log level, e.g. DEBUG to display verbose debug information
+LOG_LEVEL_ENVIRONMENT_VARIABLE = "HR_COST_LOG_LEVEL"
+DEFAULT_LOG_LEVEL = "WARNING"
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+# environment variable to select excel reader engine, e.g. openpyxl
+EXCEL_READER_ENVIRONMENT_VARIABLE = "HR_COST_EXCEL_READER"
+# auto reads with the fastest engine installed, and falls back to the next engine on failure
+EXCEL_READER_AUTO = "auto"
+# pandas excel reader engines and their library, fastest first
+EXCEL_READER_ENGINES = {"calamine": "python_calamine", "openpyxl": "openpyxl"}
+# excel reader engine selected by set_excel_reader
+excel_reader = EXCEL_READER_AUTO
 
 HEADER_SEPARATOR = "!"
 
 # set the maximum number of months in report
 MAX_NUMBER_MONTH_IN_REPORT = 12
+
+# progress checkpoints of process_source_data, reading 4 sheets and expanding records
+SOURCE_PROCESSING_STEPS = 5
+# sheets of source file in order, with their header row (0 based) and required headers,
+# the last sheet staff category order is optional
+SOURCE_SHEETS = [
+    (
+        "Base",
+        0,
+        ["StaffNo", "Rank", "Section", "Staff Category", "FTE", "Default Cost Centre"],
+    ),
+    ("Override", 1, ["StaffNo", "Rank", "CCode", "CostCentre", "Allocated Percentage"]),
+    ("Cost Centre", 0, ["Value", "Description", "Enabled/ Disabled"]),
+    ("Staff Category Order", 0, ["Staff Category", "Order"]),
+]
+SOURCE_REQUIRED_SHEETS = 3
 STAFF_CATEGORY_LENGTH = 30
 SHEET_NAME_MAX_LENGTH = 31
 
+# columnar copy of the database, stored in directory next to the database excel file
+COLUMNAR_STORE_SUFFIX = "_columnar"
+COLUMNAR_MANIFEST_FILE_NAME = "manifest.json"
+# FTE database in SQLite file is selected by file extension, other database files are excel workbooks
+SQLITE_DATABASE_EXTENSIONS = (".sqlite", ".db")
+SQLITE_TABLE_NAME = "fte_records"
+# SQLite column of each FTE database column
+SQLITE_COLUMNS = {
+    "staff_number": "staff_number",
+    "Rank": "rank",
+    "Staff Category": "staff_category",
+    "staff category order": "staff_category_order",
+    "cost centre code": "cost_centre_code",
+    "cost centre name": "cost_centre_name",
+    "allocation": "allocation",
+}
+# first index covers FTE aggregates of periods, headcount groups first records by staff number
+SQLITE_INDEXES = [
+    ("period", "cost_centre_name", "staff_category", "rank", "allocation"),
+    ("period", "staff_number"),
+    ("period", "staff_category"),
+    ("cost_centre_code", "period"),
+]
+# seconds to wait for the write lock held by another user
+SQLITE_BUSY_TIMEOUT = 30
+
+# per-period aggregates next to the period file in columnar store, and their version,
+# aggregates of other version are written again by rebuilding the store
+PERIOD_AGGREGATES_FILE_SUFFIX = ".aggregates.parquet"
+PERIOD_AGGREGATES_VERSION = 1
+PERIOD_AGGREGATES_COLUMNS = [
+    "table",
+    "cost centre name",
+    "cost centre code",
+    "Staff Category",
+    "Rank",
+    "staff category order",
+    "allocation",
+    "records",
+    "headcount",
+]
+
+# code columns of database are text, e.g. cost centre code "001" not to be read as number 1
+FTE_DATABASE_DTYPES = {"staff_number": str, "cost centre code": str}
+# columns of FTE records kept as pandas category, their values repeat on many records
+FTE_CATEGORY_COLUMNS = [
+    "staff_number",
+    "Rank",
+    "Staff Category",
+    "cost centre code",
+    "cost centre name",
+]
+
+# modes of writing excel file, new file only / add new sheets / add or overwrite sheets
+EXCEL_MODE_NEW = "new"
+EXCEL_MODE_APPEND = "append"
+EXCEL_MODE_REPLACE = "replace"
+
+# decimals of numbers in report tables, the same in PDF and excel reports
+FTE_REPORT_DECIMALS = 2
+HEADCOUNT_REPORT_DECIMALS = 0
+FTE_COSTCENTRE_REPORT_DECIMALS = 1
+
+# number of processes rendering PDF sections, 1 renders in the calling process
+DEFAULT_PDF_WORKERS = 1
+# chunks of sections per PDF worker, smaller chunks balance the load of workers
+PDF_CHUNKS_PER_WORKER = 4
+# seconds between progress updates while waiting for PDF workers
+PDF_PROGRESS_INTERVAL = 0.2
+
 
 def generate_markdown_padding(
     orgin_text: str, length: int = STAFF_CATEGORY_LENGTH
@@ -102,11 +298,81 @@ def report_css_style():
     return css
 
 
+def report_table_html(display_df: pd.DataFrame, repeated_column: str = None) -> str:
+    """Return HTML table of report table of display strings, for PDF section
+
+    Missing values are shown as "-". Total row, of "Total" in first column, is bold
+    after two blank rows. Value of repeated_column same as in the row above is blank,
+    e.g. staff category of its ranks.
+    """
+
+    # whole table as one array, reports have many small tables
+    values = display_df.to_numpy(dtype=object)
+    cells = np.where(pd.isna(values), "-", values).astype(str)
+    for character, entity in (("&", "&amp;"), ("<", "&lt;"), (">", "&gt;")):
+        cells = np.char.replace(cells, character, entity)
+
+    total_rows = values[:, 0] == "Total"
+    if repeated_column is not None:
+        column = display_df.columns.get_loc(repeated_column)
+        repeated = np.zeros(len(values), dtype=bool)
+        repeated[1:] = values[1:, column] == values[:-1, column]
+        cells[repeated & ~total_rows, column] = ""
+    cells = np.where(
+        total_rows[:, None] & (cells != ""),
+        np.char.add(np.char.add("<strong>", cells), "</strong>"),
+        cells,
+    )
+
+    rows = ["<tr><td>" + "</td><td>".join(row) + "</td></tr>" for row in cells.tolist()]
+    blank_row = "<tr>" + "<td></td>" * len(display_df.columns) + "</tr>\n"
+    for row_number in np.flatnonzero(total_rows):
+        rows[row_number] = blank_row + blank_row + rows[row_number]
+
+    header = "".join(
+        f"<th>{html.escape(str(column), quote=False)}</th>" for column in display_df.columns
+    )
+    # no blank line inside, markdown ends the HTML block at a blank line
+    return (
+        f"<table>\n<thead>\n<tr>{header}</tr>\n</thead>\n<tbody>\n"
+        + "\n".join(rows)
+        + "\n</tbody>\n</table>\n"
+    )
+
+
+def format_report_numbers(
+    table_df: pd.DataFrame, decimals: int, text_columns: tuple = ("Staff Category", "Rank")
+) -> pd.DataFrame:
+    """Return report table with numbers as display strings of thousands separators and decimals
+
+    All numbers of the table are formatted in one pass, missing numbers are kept missing
+    for report_table_html.
+    """
+
+    values = table_df.to_numpy(dtype=object)
+    number_columns = [
+        column_number
+        for column_number, column in enumerate(table_df.columns)
+        if column not in text_columns
+    ]
+    numbers = values[:, number_columns].astype(float)
+    # Python format rounds the exact float value, np.round then a string conversion would
+    # print ties differently, e.g. 0.35 as 0.4 not 0.3, so numbers are formatted one by one
+    formatted = np.array(
+        list(map(f"{{:,.{decimals}f}}".format, numbers.ravel().tolist())), dtype=object
+    ).reshape(numbers.shape)
+    values[:, number_columns] = np.where(np.isnan(numbers), None, formatted)
+
+    return pd.DataFrame(values, index=table_df.index, columns=table_df.columns)
+
+
 class ReturnCodes(Enum):
     """Enumeration for return codes"""
 
     ERROR_PROGRAM = -10
+    ERROR_CANCELLED = -5
     ERROR_FILE_DATA_ERROR = -4
+    ERROR_DATABASE_PERIOD_EXISTED = -3
     ERROR_FILE_LOADING = -2
     ERROR_FILE_ERROR = -1
     ERROR = 0
@@ -115,10 +381,6 @@ class ReturnCodes(Enum):
     OK_UPDATE_DATABASE = 3
 
 
-# set dataframe display format for float to 2 decimal places with $ sign
-pd.options.display.float_format = "${:,.2f}".format
-
-
 def header_processing_excel(header_text: str) -> list:
     return header_text.split(HEADER_SEPARATOR)
 
@@ -134,6 +396,936 @@ def header_processing_pdf(header_text: str, header_mark="##### ") -> str:
     return processed_header_strings
 
 
+def to_category_dtypes(data_df: pd.DataFrame) -> pd.DataFrame:
+    """Return FTE records with FTE_CATEGORY_COLUMNS as category dtype, other columns are not changed"""
+
+    return data_df.astype(
+        {column: "category" for column in FTE_CATEGORY_COLUMNS if column in data_df.columns}
+    )
+
+
+class JobControl:
+    """Progress report and cancel request of a job running in worker thread
+
+    progress_callback is called with stage description and fraction done
+    (0.0 to 1.0) of the stage, from the worker thread.
+    """
+
+    def __init__(self, progress_callback=None):
+        self.progress_callback = progress_callback
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        """Request the job to stop at its next checkpoint"""
+        self.cancel_event.set()
+
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def checkpoint(self, stage: str, done: int = 0, total: int = 1) -> bool:
+        """Report progress of stage, return True if job is cancelled and should stop"""
+
+        if self.cancel_event.is_set():
+            return True
+        if self.progress_callback is not None:
+            self.progress_callback(stage, done / total if total > 0 else 1.0)
+        return False
+
+    def sub_jobs(self, names: list) -> dict:
+        """Return job control of each concurrent sub job by name, sharing cancel request of this job
+
+        Progress of sub jobs is reported as their average fraction done, stage is prefixed by sub job name.
+        """
+
+        fractions = {name: 0.0 for name in names}
+        lock = threading.Lock()
+
+        def sub_job(name: str) -> JobControl:
+            def progress_callback(stage: str, fraction: float):
+                with lock:
+                    fractions[name] = fraction
+                    total_fraction = sum(fractions.values()) / len(fractions)
+                if self.progress_callback is not None:
+                    self.progress_callback(f"{name}: {stage}", total_fraction)
+
+            job_control = JobControl(progress_callback)
+            job_control.cancel_event = self.cancel_event
+            return job_control
+
+        return {name: sub_job(name) for name in names}
+
+
+def set_log_level(level: Union[str, int]):
+    """Set log level of data processing, e.g. "DEBUG" to display verbose debug information"""
+
+    if isinstance(level, str):
+        level = level.upper()
+    logger.setLevel(level)
+
+
+def configure_logging(level: Union[str, int, None] = None):
+    """Configure log output of program, level from HR_COST_LOG_LEVEL environment variable if not given"""
+
+    if level is None:
+        level = os.environ.get(LOG_LEVEL_ENVIRONMENT_VARIABLE, DEFAULT_LOG_LEVEL)
+    logging.basicConfig(format=LOG_FORMAT)
+    try:
+        set_log_level(level)
+    except ValueError:
+        set_log_level(DEFAULT_LOG_LEVEL)
+        logger.warning("Unknown log level '%s'", level)
+
+
+def set_excel_reader(reader: str):
+    """Set excel reader engine of source and database files, EXCEL_READER_AUTO or a key of EXCEL_READER_ENGINES"""
+
+    global excel_reader
+
+    reader = reader.lower()
+    if reader != EXCEL_READER_AUTO and reader not in EXCEL_READER_ENGINES:
+        raise ValueError(f"Unknown excel reader '{reader}'")
+    excel_reader = reader
+
+
+def configure_excel_reader(reader: Union[str, None] = None):
+    """Configure excel reader engine, from HR_COST_EXCEL_READER environment variable if not given"""
+
+    if reader is None:
+        reader = os.environ.get(EXCEL_READER_ENVIRONMENT_VARIABLE, EXCEL_READER_AUTO)
+    try:
+        set_excel_reader(reader)
+    except ValueError:
+        set_excel_reader(EXCEL_READER_AUTO)
+        logger.warning("Unknown excel reader '%s'", reader)
+
+
+def excel_reader_engines() -> list:
+    """Return excel reader engines to read with in order, the selected engine or the installed engines"""
+
+    if excel_reader != EXCEL_READER_AUTO:
+        return [excel_reader]
+
+    # openpyxl is always the last engine, it also writes the database and reports
+    return [
+        engine
+        for engine, library in EXCEL_READER_ENGINES.items()
+        if engine == "openpyxl" or find_spec(library) is not None
+    ]
+
+
+def read_with_excel_reader(read_function, excel_file_name: str, **kwargs):
+    """Return read_function(excel_file_name, engine=...) of the first engine reading the file
+
+    An engine failing on the file is logged and the next engine is tried, the
+    error of the last engine is raised. File access errors are raised at once,
+    they are the same for every engine.
+    """
+
+    *fallback_engines, last_engine = excel_reader_engines()
+    for engine in fallback_engines:
+        try:
+            return read_function(excel_file_name, engine=engine, **kwargs)
+        except OSError:
+            raise
+        except Exception as e:
+            logger.info("Excel reader %s failed on %s (%s), trying next", engine, excel_file_name, e)
+    return read_function(excel_file_name, engine=last_engine, **kwargs)
+
+
+def read_excel(excel_file_name: str, **kwargs):
+    """pd.read_excel with the configured excel reader engine"""
+
+    return read_with_excel_reader(pd.read_excel, excel_file_name, **kwargs)
+
+
+def open_excel_file(excel_file_name: str) -> pd.ExcelFile:
+    """Open excel file for parsing its sheets, with the configured excel reader engine"""
+
+    return read_with_excel_reader(pd.ExcelFile, excel_file_name)
+
+
+def read_sheet_names(excel_file_name: str) -> list:
+    """Return sheet names of excel file, from the workbook without parsing the sheets
+
+    read_excel with nrows=0 is not used, calamine parses every full sheet for it.
+    """
+
+    with open_excel_file(excel_file_name) as excel_file:
+        return excel_file.sheet_names
+
+
+class FteDatabase:
+    """FTE database loaded from database file, one dataframe per period sheet
+
+    A loaded FteDatabase can be passed to the report functions in place of the
+    database file name, so that one reports generation run parses the file once.
+    Only the sheet names are read on loading, period sheets are parsed on demand,
+    from the columnar store if columnar_store_dir is set, or from the excel file.
+    Reports are built from per-period aggregates, read from the columnar store if
+    aggregates_in_store is set, else computed once from the period data.
+    """
+
+    def __init__(
+        self,
+        data_file_name: str,
+        period_names: list,
+        columnar_store_dir: str = None,
+        aggregates_in_store: bool = False,
+    ):
+        self.data_file_name = data_file_name
+        self.period_names = list(period_names)
+        self.columnar_store_dir = columnar_store_dir
+        self.aggregates_in_store = aggregates_in_store
+        self.period_data = {}
+        self.period_aggregates = {}
+        self.aggregations = {}
+        self.cube = None
+
+    def periods(self) -> list:
+        """Return the period (sheet) names available in database"""
+        return list(self.period_names)
+
+    def load_periods(self, periods: list):
+        """Parse the sheets of periods not loaded yet, other sheets are not parsed"""
+
+        missing_periods = [p for p in periods if p not in self.period_data]
+        if len(missing_periods) == 0:
+            return
+
+        if self.columnar_store_dir is not None:
+            for period in missing_periods:
+                self.period_data[period] = to_category_dtypes(
+                    pd.read_parquet(
+                        os.path.join(self.columnar_store_dir, f"{period}.parquet")
+                    )
+                )
+        else:
+            period_data = read_excel(
+                self.data_file_name,
+                sheet_name=missing_periods,
+                header=0,
+                dtype=FTE_DATABASE_DTYPES,
+            )
+            for period, data_df in period_data.items():
+                self.period_data[period] = to_category_dtypes(data_df)
+
+    def get_period_data(self, period: str) -> pd.DataFrame:
+        """Return the dataframe of a period"""
+
+        if period not in self.period_data:
+            self.load_periods([period])
+        return self.period_data[period]
+
+    def load_period_aggregates(self, periods: list):
+        """Load aggregates of periods not loaded yet, see aggregate_period"""
+
+        missing_periods = [p for p in periods if p not in self.period_aggregates]
+        if len(missing_periods) == 0:
+            return
+
+        if self.aggregates_in_store:
+            for period in missing_periods:
+                self.period_aggregates[period] = pd.read_parquet(
+                    os.path.join(
+                        self.columnar_store_dir, period + PERIOD_AGGREGATES_FILE_SUFFIX
+                    )
+                )
+        else:
+            self.load_periods(missing_periods)
+            for period in missing_periods:
+                self.period_aggregates[period] = aggregate_period(self.period_data[period])
+
+    def get_cube(self, periods: list) -> "FteCube":
+        """Return FteCube of periods and periods of previous cube, built again only for new periods"""
+
+        if self.cube is None or not self.cube.has_periods(periods):
+            cube_periods = set(periods)
+            if self.cube is not None:
+                cube_periods.update(self.cube.periods)
+            cube_periods = [p for p in self.period_names if p in cube_periods]
+            self.load_period_aggregates(cube_periods)
+            with timing_span("build fte cube"):
+                self.cube = FteCube(
+                    {period: self.period_aggregates[period] for period in cube_periods}
+                )
+            self.aggregations = {}
+        return self.cube
+
+    def has_aggregation(self, periods: list) -> bool:
+        """Return True if aggregated data of periods is computed"""
+        return tuple(periods) in self.aggregations
+
+    def aggregation_copy(self, periods: list) -> "FteDatabase":
+        """Return copy of database with only the aggregated data of periods
+
+        The copy is small to send to report worker processes, period data,
+        aggregates and cube are left out.
+        """
+
+        aggregation = self.get_aggregation(periods)
+        database_copy = copy.copy(self)
+        database_copy.period_data = {}
+        database_copy.period_aggregates = {}
+        database_copy.cube = None
+        database_copy.aggregations = {tuple(periods): aggregation}
+        return database_copy
+
+    def get_aggregation(self, periods: list) -> dict:
+        """Return aggregated data of periods, computed once and shared by all reports"""
+
+        key = tuple(periods)
+        if key not in self.aggregations:
+            cube = self.get_cube(periods)
+            with timing_span("aggregate periods"):
+                self.aggregations[key] = cube.aggregation(periods)
+        return self.aggregations[key]
+
+
+class FteCube:
+    """FTE allocation of periods as period x cost centre x staff category rank arrays
+
+    The cube is built from the per-period aggregates of aggregate_period.
+    Cost centre, staff category, rank and period are encoded into integer
+    codes, and allocation is summed with np.bincount into a dense array
+    once. Report tables of any window of the periods are array reductions of
+    it. The record count array tells a missing row (NaN in reports) from zero FTE.
+    Records without cost centre are in the extra last cost centre, records
+    without rank are in the staff category total only.
+    """
+
+    def __init__(self, period_aggregates: dict):
+        self.periods = list(period_aggregates.keys())
+        self.period_index = {period: i for i, period in enumerate(self.periods)}
+
+        aggregates_df = pd.concat(period_aggregates.values(), ignore_index=True)
+        period_codes = np.repeat(
+            np.arange(len(self.periods)),
+            [len(period_df) for period_df in period_aggregates.values()],
+        )
+        fte_rows = (aggregates_df["table"] == "fte").to_numpy()
+        cost_centre_rows = (aggregates_df["table"] == "cost centre").to_numpy()
+        category_rows = (aggregates_df["table"] == "staff category").to_numpy()
+
+        # codes of names in sorted order, missing value is code -1
+        self.cost_centre_names = sorted(aggregates_df["cost centre name"].dropna().unique())
+        self.staff_categories = sorted(aggregates_df["Staff Category"].dropna().unique())
+        ranks = sorted(aggregates_df["Rank"].dropna().unique())
+        cost_centre_codes = pd.Index(self.cost_centre_names).get_indexer(
+            aggregates_df["cost centre name"]
+        )
+        category_codes = pd.Index(self.staff_categories).get_indexer(
+            aggregates_df["Staff Category"]
+        )
+        rank_codes = pd.Index(ranks).get_indexer(aggregates_df["Rank"])
+        rank_codes[rank_codes < 0] = len(ranks)
+
+        # staff category and rank pairs of records, in sorted order
+        pair_ids, pair_codes = np.unique(
+            category_codes[fte_rows] * (len(ranks) + 1) + rank_codes[fte_rows],
+            return_inverse=True,
+        )
+        self.pair_categories = pair_ids // (len(ranks) + 1)
+        self.pair_ranks = np.array(
+            [ranks[r] if r < len(ranks) else None for r in pair_ids % (len(ranks) + 1)],
+            dtype=object,
+        )
+        self.pair_has_rank = pair_ids % (len(ranks) + 1) < len(ranks)
+
+        cube_cost_centre_codes = np.where(
+            cost_centre_codes < 0, len(self.cost_centre_names), cost_centre_codes
+        )[fte_rows]
+        self.shape = (
+            len(self.periods),
+            len(self.cost_centre_names) + 1,
+            len(pair_ids),
+        )
+        flat_codes = (
+            period_codes[fte_rows] * self.shape[1] + cube_cost_centre_codes
+        ) * self.shape[2] + pair_codes.reshape(-1)
+        self.fte = np.bincount(
+            flat_codes,
+            weights=aggregates_df["allocation"].to_numpy(dtype=float)[fte_rows],
+            minlength=np.prod(self.shape),
+        ).reshape(self.shape)
+        self.records = (
+            np.bincount(
+                flat_codes,
+                weights=aggregates_df["records"].to_numpy(dtype=float)[fte_rows],
+                minlength=np.prod(self.shape),
+            )
+            .round()
+            .astype("int64")
+            .reshape(self.shape)
+        )
+
+        self.headcount = (
+            np.bincount(
+                period_codes[category_rows] * len(self.staff_categories)
+                + category_codes[category_rows],
+                weights=aggregates_df["headcount"].to_numpy(dtype=float)[category_rows],
+                minlength=len(self.periods) * len(self.staff_categories),
+            )
+            .round()
+            .astype("int64")
+            .reshape(len(self.periods), len(self.staff_categories))
+        )
+
+        # periods of each cost centre, with its cost centre code in period
+        self.cost_centre_present = np.zeros(
+            (len(self.periods), len(self.cost_centre_names)), dtype=bool
+        )
+        self.cost_centre_present[
+            period_codes[cost_centre_rows], cost_centre_codes[cost_centre_rows]
+        ] = True
+        self.cost_centre_code = np.empty(
+            (len(self.periods), len(self.cost_centre_names)), dtype=object
+        )
+        self.cost_centre_code[
+            period_codes[cost_centre_rows], cost_centre_codes[cost_centre_rows]
+        ] = aggregates_df["cost centre code"].to_numpy()[cost_centre_rows]
+
+        self.category_order_df = pd.DataFrame(
+            {
+                "period": period_codes[category_rows],
+                "Staff Category": aggregates_df["Staff Category"].to_numpy()[category_rows],
+                "staff category order": aggregates_df["staff category order"].to_numpy()[
+                    category_rows
+                ],
+            }
+        )
+
+    def has_periods(self, periods: list) -> bool:
+        """Return True if all periods are in the cube"""
+        return all(period in self.period_index for period in periods)
+
+    def category_table(self, values: np.ndarray, present: np.ndarray, periods: list) -> pd.DataFrame:
+        """Return table of staff categories present in periods, not present value is NaN
+
+        values and present are arrays of period x staff category.
+        """
+
+        has_category = present.any(axis=0)
+        return pd.DataFrame(
+            np.where(present, values, np.nan)[:, has_category].T,
+            index=pd.Index(
+                np.array(self.staff_categories, dtype=object)[has_category],
+                name="Staff Category",
+            ),
+            columns=periods,
+        )
+
+    def aggregation(self, periods: list) -> dict:
+        """Return FTE, headcount and cost centre breakdown of periods window, see aggregate_periods"""
+
+        period_indexes = np.array([self.period_index[p] for p in periods], dtype=int)
+        fte = self.fte[period_indexes]
+        records = self.records[period_indexes]
+
+        # staff category order of periods, order of later period replaces earlier one
+        staff_category_order_df = (
+            self.category_order_df[self.category_order_df["period"].isin(period_indexes)]
+            .drop_duplicates(subset=["Staff Category"], keep="last")
+            .sort_values(["staff category order", "Staff Category"], kind="stable")
+        )
+        staff_category_order_df = pd.DataFrame(
+            {
+                "Staff Category": staff_category_order_df["Staff Category"].to_list(),
+                "staff category order": range(1, len(staff_category_order_df) + 1),
+            }
+        )
+
+        # staff category totals are sums of its staff category rank pairs
+        pair_to_category = np.zeros((self.shape[2], len(self.staff_categories)))
+        pair_to_category[np.arange(self.shape[2]), self.pair_categories] = 1
+        fte_by_category_df = self.category_table(
+            fte.sum(axis=1) @ pair_to_category,
+            (records.sum(axis=1) @ pair_to_category) > 0,
+            periods,
+        )
+
+        headcount = self.headcount[period_indexes]
+        headcount_by_category_df = self.category_table(headcount, headcount > 0, periods)
+        # headcount of period having all staff categories is kept as integer
+        headcount_by_category_df = headcount_by_category_df.apply(
+            lambda x: x.astype("int64") if x.notna().all() else x
+        )
+
+        # cost centre, staff category and rank having records in periods
+        cost_centre_codes, pair_codes = np.nonzero(
+            records[:, :-1, :].any(axis=0) & self.pair_has_rank
+        )
+        fte_by_costcentre_df = pd.DataFrame(
+            np.where(
+                records[:, cost_centre_codes, pair_codes] > 0,
+                fte[:, cost_centre_codes, pair_codes],
+                np.nan,
+            ).T,
+            index=pd.MultiIndex.from_arrays(
+                [
+                    np.array(self.cost_centre_names, dtype=object)[cost_centre_codes],
+                    np.array(self.staff_categories, dtype=object)[
+                        self.pair_categories[pair_codes]
+                    ],
+                    self.pair_ranks[pair_codes],
+                ],
+                names=["cost centre name", "Staff Category", "Rank"],
+            ),
+            columns=periods,
+        )
+
+        # periods of each cost centre, and its code in the last of the periods
+        cost_centre_present = self.cost_centre_present[period_indexes]
+        cost_centre_periods = {}
+        cost_centre_code_dict = {}
+        for c in np.nonzero(cost_centre_present.any(axis=0))[0]:
+            present_indexes = np.nonzero(cost_centre_present[:, c])[0]
+            cost_centre_periods[self.cost_centre_names[c]] = [
+                periods[i] for i in present_indexes
+            ]
+            cost_centre_code_dict[self.cost_centre_names[c]] = self.cost_centre_code[
+                period_indexes[present_indexes[-1]], c
+            ]
+
+        return {
+            "periods": list(periods),
+            "staff_category_order_df": staff_category_order_df,
+            "fte_by_category_df": fte_by_category_df,
+            "headcount_by_category_df": headcount_by_category_df,
+            "fte_by_costcentre_df": fte_by_costcentre_df,
+            "cost_centre_periods": cost_centre_periods,
+            "cost_centre_code_dict": cost_centre_code_dict,
+        }
+
+
+@timing_span("aggregate period")
+def aggregate_period(data_df: pd.DataFrame) -> pd.DataFrame:
+    """Return aggregates of a period, from which FteCube is built without the period records
+
+    Rows of table "fte" have allocation sum and number of records by cost centre,
+    staff category and rank, missing cost centre or rank is kept. Rows of table
+    "cost centre" have the code of first record of each cost centre. Rows of table
+    "staff category" have the order of its first record and its headcount, counting
+    the staff category of first record of each staff.
+    """
+
+    data_df = data_df.assign(allocation=data_df["allocation"].astype(float))
+    category_df = data_df.dropna(subset=["Staff Category"])
+
+    fte_df = (
+        category_df.groupby(
+            ["cost centre name", "Staff Category", "Rank"],
+            dropna=False,
+            sort=False,
+            observed=True,
+        )["allocation"]
+        .agg(["sum", "size"])
+        .reset_index()
+        .rename(columns={"sum": "allocation", "size": "records"})
+    )
+
+    cost_centre_df = data_df.dropna(subset=["cost centre name"]).drop_duplicates(
+        subset=["cost centre name"]
+    )[["cost centre name", "cost centre code"]]
+
+    headcount = (
+        data_df.drop_duplicates(subset=["staff_number"])
+        .groupby("Staff Category", observed=True)
+        .size()
+    )
+    staff_category_df = category_df.drop_duplicates(subset=["Staff Category"])[
+        ["Staff Category", "staff category order"]
+    ]
+    staff_category_df = staff_category_df.assign(
+        headcount=headcount.reindex(staff_category_df["Staff Category"].to_numpy())
+        .fillna(0)
+        .to_numpy()
+    )
+
+    return pd.concat(
+        [
+            fte_df.assign(table="fte"),
+            cost_centre_df.assign(table="cost centre"),
+            staff_category_df.assign(table="staff category"),
+        ],
+        ignore_index=True,
+    ).reindex(columns=PERIOD_AGGREGATES_COLUMNS)
+
+
+@timing_span("aggregate periods")
+def aggregate_periods(period_data: dict) -> dict:
+    """Return FTE, headcount and cost centre breakdown of periods, in one pass over all periods
+
+    period_data is dataframe of each period in period order. Tables have a
+    column of each period, missing values are NaN.
+    """
+
+    return FteCube(
+        {period: aggregate_period(data_df) for period, data_df in period_data.items()}
+    ).aggregation(list(period_data))
+
+
+def build_staff_category_table(
+    result_df: pd.DataFrame, staff_category_order_df: pd.DataFrame
+) -> pd.DataFrame:
+    """Return report table of result_df rows in staff category order with Total row
+
+    result_df index is Staff Category, or Staff Category and Rank, with a column of each period.
+    Numbers are rounded to 2 decimals, as written to excel.
+    """
+
+    sorted_result_df = result_df.join(
+        staff_category_order_df.set_index(["Staff Category", "staff category order"]),
+        how="inner",
+    )
+
+    sorted_result_df.reset_index(inplace=True)
+    sorted_result_df.set_index("staff category order", inplace=True)
+
+    # stable sort keeps ranks of the same staff category in rank order
+    sorted_result_df.sort_index(inplace=True, kind="stable")
+
+    sorted_result_df.set_index("Staff Category", inplace=True)
+
+    if "Rank" in sorted_result_df.columns:
+        sorted_result_df["Rank"] = sorted_result_df["Rank"].astype(str)
+
+    sorted_result_df.loc["Total"] = sorted_result_df.sum(numeric_only=True)
+
+    sorted_result_df.reset_index(inplace=True)
+
+    return sorted_result_df.round(2)
+
+
+@timing_span("load_fte_database")
+def load_fte_database(data_source: Union[str, FteDatabase]):
+    """Return FteDatabase of database file or ReturnCodes if file cannot be loaded
+
+    FteDatabase input is returned as it is. Database file of SQLite extension is
+    loaded as SqliteFteDatabase. The columnar store of the database is used when
+    it is in sync with the database excel file.
+    """
+
+    if isinstance(data_source, FteDatabase):
+        return data_source
+
+    if is_sqlite_database(data_source):
+        if not os.path.exists(data_source):
+            return ReturnCodes.ERROR_FILE_LOADING
+        try:
+            with closing(connect_sqlite_database(data_source)) as connection:
+                period_names = [
+                    row[0]
+                    for row in connection.execute(
+                        f"SELECT DISTINCT period FROM {SQLITE_TABLE_NAME} ORDER BY period"
+                    )
+                ]
+        except sqlite3.Error:
+            return ReturnCodes.ERROR_FILE_LOADING
+        return SqliteFteDatabase(data_source, period_names)
+
+    manifest = read_columnar_manifest(data_source)
+    if manifest is not None:
+        return FteDatabase(
+            data_source,
+            manifest["periods"],
+            get_columnar_store_dir(data_source),
+            manifest.get("aggregates_version") == PERIOD_AGGREGATES_VERSION,
+        )
+
+    try:
+        period_names = read_sheet_names(data_source)
+    except Exception:
+        return ReturnCodes.ERROR_FILE_LOADING
+
+    return FteDatabase(data_source, period_names)
+
+
+def get_columnar_store_dir(database_excel_file: str) -> str:
+    """Return the columnar store directory of database excel file"""
+    return os.path.splitext(database_excel_file)[0] + COLUMNAR_STORE_SUFFIX
+
+
+def columnar_store_available() -> bool:
+    """Return True if parquet library for columnar store is installed"""
+    return find_spec("pyarrow") is not None
+
+
+def read_columnar_manifest(database_excel_file: str):
+    """Return manifest of columnar store, or None if store is missing or not in sync with database excel file"""
+
+    if not columnar_store_available():
+        return None
+
+    manifest_file = os.path.join(
+        get_columnar_store_dir(database_excel_file), COLUMNAR_MANIFEST_FILE_NAME
+    )
+    try:
+        with open(manifest_file, encoding="utf-8") as f:
+            manifest = json.load(f)
+        excel_stat = os.stat(database_excel_file)
+    except (OSError, ValueError):
+        return None
+
+    # database excel file changed outside the program, columnar store is out of date
+    if (
+        manifest.get("excel_mtime_ns") != excel_stat.st_mtime_ns
+        or manifest.get("excel_size") != excel_stat.st_size
+    ):
+        return None
+
+    return manifest
+
+
+def write_columnar_manifest(database_excel_file: str, periods: list):
+    """Write manifest of columnar store, marking it in sync with database excel file"""
+
+    excel_stat = os.stat(database_excel_file)
+    manifest = {
+        "excel_mtime_ns": excel_stat.st_mtime_ns,
+        "excel_size": excel_stat.st_size,
+        "periods": sorted(periods),
+        "aggregates_version": PERIOD_AGGREGATES_VERSION,
+    }
+    store_dir = get_columnar_store_dir(database_excel_file)
+    manifest_file = os.path.join(store_dir, COLUMNAR_MANIFEST_FILE_NAME)
+    with open(manifest_file + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(manifest_file + ".tmp", manifest_file)
+
+
+def write_columnar_period(database_excel_file: str, period: str, hr_fte_df: pd.DataFrame):
+    """Write the dataframe of a period and its aggregates to the columnar store"""
+
+    store_dir = get_columnar_store_dir(database_excel_file)
+    os.makedirs(store_dir, exist_ok=True)
+    period_file = os.path.join(store_dir, f"{period}.parquet")
+    hr_fte_df.to_parquet(period_file + ".tmp", index=False)
+    os.replace(period_file + ".tmp", period_file)
+
+    # only the written period is aggregated, reports of other periods use their stored aggregates
+    aggregates_file = os.path.join(store_dir, period + PERIOD_AGGREGATES_FILE_SUFFIX)
+    aggregate_period(hr_fte_df).to_parquet(aggregates_file + ".tmp", index=False)
+    os.replace(aggregates_file + ".tmp", aggregates_file)
+
+
+def build_columnar_store(database_excel_file: str):
+    """Build the columnar store from all period sheets of database excel file, return ReturnCodes"""
+
+    if not columnar_store_available():
+        return ReturnCodes.ERROR_PROGRAM
+
+    try:
+        data_df_dict = read_excel(
+            database_excel_file, sheet_name=None, header=0, dtype=FTE_DATABASE_DTYPES
+        )
+    except Exception:
+        return ReturnCodes.ERROR_FILE_LOADING
+
+    shutil.rmtree(get_columnar_store_dir(database_excel_file), ignore_errors=True)
+    for period, data_df in data_df_dict.items():
+        write_columnar_period(database_excel_file, period, data_df)
+    write_columnar_manifest(database_excel_file, list(data_df_dict.keys()))
+
+    return ReturnCodes.OK
+
+
+class SqliteFteDatabase(FteDatabase):
+    """FTE database in SQLite file, one row per record with its period
+
+    Period records and per-period aggregates are queried with SQL, only for
+    the periods of a report. Each query opens its own connection, so the
+    database can be shared with worker threads and processes.
+    """
+
+    def __init__(self, data_file_name: str, period_names: list):
+        super().__init__(data_file_name, period_names)
+
+    def load_periods(self, periods: list):
+        """Query the records of periods not loaded yet"""
+
+        missing_periods = [p for p in periods if p not in self.period_data]
+        if len(missing_periods) == 0:
+            return
+
+        placeholders = ", ".join("?" * len(missing_periods))
+        with closing(connect_sqlite_database(self.data_file_name)) as connection:
+            records_df = pd.read_sql_query(
+                f"SELECT period, {', '.join(SQLITE_COLUMNS.values())} FROM {SQLITE_TABLE_NAME} "
+                f"WHERE period IN ({placeholders}) ORDER BY rowid",
+                connection,
+                params=missing_periods,
+            )
+        records_df = records_df.rename(
+            columns={v: k for k, v in SQLITE_COLUMNS.items()}
+        )
+        for period in missing_periods:
+            self.period_data[period] = to_category_dtypes(
+                records_df[records_df["period"] == period]
+                .drop(columns="period")
+                .reset_index(drop=True)
+            )
+
+    def load_period_aggregates(self, periods: list):
+        """Query aggregates of periods not loaded yet, see aggregate_period"""
+
+        missing_periods = [p for p in periods if p not in self.period_aggregates]
+        if len(missing_periods) == 0:
+            return
+
+        period_filter = f"period IN ({', '.join('?' * len(missing_periods))})"
+        # first record of each group in period, records are in insertion order
+        first_records = (
+            f"SELECT MIN(rowid) FROM {SQLITE_TABLE_NAME} WHERE {period_filter} "
+            "AND {column} IS NOT NULL GROUP BY period, {column}"
+        )
+        with closing(connect_sqlite_database(self.data_file_name)) as connection:
+            fte_df = pd.read_sql_query(
+                'SELECT period, cost_centre_name AS "cost centre name", '
+                'staff_category AS "Staff Category", rank AS "Rank", '
+                "TOTAL(allocation) AS allocation, COUNT(*) AS records "
+                f"FROM {SQLITE_TABLE_NAME} WHERE {period_filter} "
+                "AND staff_category IS NOT NULL "
+                "GROUP BY period, cost_centre_name, staff_category, rank",
+                connection,
+                params=missing_periods,
+            )
+            cost_centre_df = pd.read_sql_query(
+                'SELECT period, cost_centre_name AS "cost centre name", '
+                'cost_centre_code AS "cost centre code" '
+                f"FROM {SQLITE_TABLE_NAME} WHERE rowid IN "
+                f"({first_records.format(column='cost_centre_name')})",
+                connection,
+                params=missing_periods,
+            )
+            staff_category_df = pd.read_sql_query(
+                'SELECT period, staff_category AS "Staff Category", '
+                'staff_category_order AS "staff category order" '
+                f"FROM {SQLITE_TABLE_NAME} WHERE rowid IN "
+                f"({first_records.format(column='staff_category')})",
+                connection,
+                params=missing_periods,
+            )
+            # headcount counts the staff category of first record of each staff in period
+            headcount_df = pd.read_sql_query(
+                'SELECT period, staff_category AS "Staff Category", COUNT(*) AS headcount '
+                f"FROM {SQLITE_TABLE_NAME} WHERE rowid IN "
+                f"(SELECT MIN(rowid) FROM {SQLITE_TABLE_NAME} WHERE {period_filter} "
+                "GROUP BY period, staff_number) "
+                "AND staff_category IS NOT NULL GROUP BY period, staff_category",
+                connection,
+                params=missing_periods,
+            )
+
+        staff_category_df = staff_category_df.merge(
+            headcount_df, on=["period", "Staff Category"], how="left"
+        ).fillna({"headcount": 0})
+        aggregates_df = pd.concat(
+            [
+                fte_df.assign(table="fte"),
+                cost_centre_df.assign(table="cost centre"),
+                staff_category_df.assign(table="staff category"),
+            ],
+            ignore_index=True,
+        )
+        for period in missing_periods:
+            self.period_aggregates[period] = (
+                aggregates_df[aggregates_df["period"] == period]
+                .reindex(columns=PERIOD_AGGREGATES_COLUMNS)
+                .reset_index(drop=True)
+            )
+
+
+def is_sqlite_database(database_file: str) -> bool:
+    """Return True if database file is SQLite database by its extension"""
+    return os.path.splitext(database_file)[1].lower() in SQLITE_DATABASE_EXTENSIONS
+
+
+def connect_sqlite_database(database_file: str) -> sqlite3.Connection:
+    """Return connection of SQLite FTE database in autocommit mode, table and indexes are created if missing"""
+
+    connection = sqlite3.connect(
+        database_file, timeout=SQLITE_BUSY_TIMEOUT, isolation_level=None
+    )
+    # readers are not blocked by a writer adding a period
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute(
+        f"CREATE TABLE IF NOT EXISTS {SQLITE_TABLE_NAME} (period TEXT NOT NULL, "
+        "staff_number TEXT, rank TEXT, staff_category TEXT, staff_category_order NUMERIC, "
+        "cost_centre_code TEXT, cost_centre_name TEXT, allocation REAL)"
+    )
+    for index_columns in SQLITE_INDEXES:
+        connection.execute(
+            f"CREATE INDEX IF NOT EXISTS {SQLITE_TABLE_NAME}_{'_'.join(index_columns)} "
+            f"ON {SQLITE_TABLE_NAME} ({', '.join(index_columns)})"
+        )
+    return connection
+
+
+def update_sqlite_database(
+    database_file: str, period: str, hr_fte_df: pd.DataFrame, mode: str
+):
+    """Write period data to SQLite database in one transaction, return ReturnCodes
+
+    Modes are the same as update_fte_database.
+    """
+
+    new_database = not os.path.exists(database_file)
+    if mode == EXCEL_MODE_NEW and not new_database:
+        logger.warning("database file %s existed", database_file)
+        return ReturnCodes.ERROR_FILE_ERROR
+
+    records_df = pd.DataFrame(
+        {
+            column: hr_fte_df[name] if name in hr_fte_df.columns else None
+            for name, column in SQLITE_COLUMNS.items()
+        }
+    )
+    for column in ["staff_number", "rank", "cost_centre_code"]:
+        records_df[column] = records_df[column].map(str, na_action="ignore")
+    records_df["allocation"] = records_df["allocation"].astype(float)
+    records_df.insert(0, "period", period)
+    records = records_df.astype(object).where(records_df.notna(), None).values.tolist()
+
+    try:
+        with closing(connect_sqlite_database(database_file)) as connection:
+            # write lock is taken before the period is checked
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                period_existed = (
+                    connection.execute(
+                        f"SELECT 1 FROM {SQLITE_TABLE_NAME} WHERE period = ? LIMIT 1",
+                        (period,),
+                    ).fetchone()
+                    is not None
+                )
+                if period_existed and mode == EXCEL_MODE_APPEND:
+                    connection.execute("ROLLBACK")
+                    logger.warning("period %s existed in database %s", period, database_file)
+                    return ReturnCodes.ERROR_DATABASE_PERIOD_EXISTED
+                if mode not in (EXCEL_MODE_APPEND, EXCEL_MODE_REPLACE, EXCEL_MODE_NEW):
+                    connection.execute("ROLLBACK")
+                    return ReturnCodes.ERROR_PROGRAM
+                connection.execute(
+                    f"DELETE FROM {SQLITE_TABLE_NAME} WHERE period = ?", (period,)
+                )
+                connection.executemany(
+                    f"INSERT INTO {SQLITE_TABLE_NAME} (period, {', '.join(SQLITE_COLUMNS.values())}) "
+                    f"VALUES ({', '.join('?' * (len(SQLITE_COLUMNS) + 1))})",
+                    records,
+                )
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+    except sqlite3.Error:
+        logger.error("database %s not updated", database_file, exc_info=True)
+        return ReturnCodes.ERROR_FILE_ERROR
+
+    return (
+        ReturnCodes.OK_GEN_NEW_DATABASE if new_database else ReturnCodes.OK_UPDATE_DATABASE
+    )
+
+
 def get_available_periods(
     data_available: list, start_year: int, start_month: int, max_number_of_month: int
 ):
@@ -168,407 +1360,281 @@ def get_available_periods(
     return available_periods
 
 
-def prepare_department_fte_trend_report(
-    data_file_name: str,
+def prepare_report_aggregation(
+    data_source: Union[str, FteDatabase],
     start_year: int,
     start_month: int,
-    max_number_of_month: int = MAX_NUMBER_MONTH_IN_REPORT,
+    max_number_of_month: int,
+    job_control: JobControl,
 ):
-    """Return markdown report content and css for fte trend report generation from database file"""
+    """Return aggregated data of report periods from database file or loaded FteDatabase, or error code"""
 
-    try:
-        # data_df_dict = pd.read_excel(data_file_name,sheet_name=None,header=0,dtype=object)
-        data_df_dict = pd.read_excel(data_file_name, sheet_name=None, header=0)
-    except Exception:
-        return ReturnCodes.ERROR_FILE_LOADING
-        # raise f"Error loading file {data_file_name}: {e}"
+    fte_database = load_fte_database(data_source)
+    if type(fte_database) is ReturnCodes:
+        return fte_database
 
     available_periods = get_available_periods(
-        data_df_dict.keys(), start_year, start_month, max_number_of_month
+        fte_database.periods(), start_year, start_month, max_number_of_month
     )
 
+    if type(available_periods) is ReturnCodes:
+        return available_periods
     if len(available_periods) == 0:
         return ReturnCodes.ERROR_FILE_DATA_ERROR
 
-    result_dict = {}
-    results_order_dict = {}
-
-    excel_df_dict = {}
-    for period in available_periods:
-        data_df = data_df_dict[period]
-
-        data_df["allocation"] = data_df["allocation"].astype(float)
-        period_df = data_df.groupby(["Staff Category"])["allocation"].sum()
-        result_dict[period] = period_df
-
-        result_order_df = data_df.drop_duplicates(subset=["Staff Category"]).loc[
-            :, ["Staff Category", "staff category order"]
-        ]
-        dict_from_zipped = dict(
-            zip(
-                result_order_df["Staff Category"],
-                result_order_df["staff category order"],
-            )
-        )
-
-        if len(results_order_dict.keys()) == 0:
-            results_order_dict = dict_from_zipped
-        else:
-            results_order_dict.update(dict_from_zipped)
-
-    result_order_to_df = {}
-    result_order_to_df["Staff Category"] = []
-    result_order_to_df["staff category order"] = []
-    order = 1
-    for k, v in sorted(results_order_dict.items(), key=lambda x: (x[1], x[0])):
-        result_order_to_df["Staff Category"].append(k)
-        result_order_to_df["staff category order"].append(order)
-        order += 1
-
-    result = pd.DataFrame(result_dict)
-    results_order_df = pd.DataFrame.from_dict(result_order_to_df)
-
-    sorted_result_df = result.join(
-        results_order_df.set_index(["Staff Category", "staff category order"]),
-        how="inner",
-    )
-
-    sorted_result_df.reset_index(inplace=True)
-    sorted_result_df.set_index("staff category order", inplace=True)
-
-    sorted_result_df.sort_index(inplace=True)
-
-    sorted_result_df.set_index("Staff Category", inplace=True)
-
-    sorted_result_df.loc["Total"] = sorted_result_df.sum(numeric_only=True)
-
-    sorted_result_df.reset_index(inplace=True)
-
-    sorted_result_df = sorted_result_df.round(2).astype(str)
-
-    sorted_result_dict = sorted_result_df.to_dict(orient="index")
+    if job_control.checkpoint("Loading database", 0):
+        return ReturnCodes.ERROR_CANCELLED
+    try:
+        with timing_span("load periods"):
+            if not fte_database.has_aggregation(available_periods):
+                fte_database.load_period_aggregates(available_periods)
+    except Exception:
+        return ReturnCodes.ERROR_FILE_LOADING
 
-    # sorted_result_dict = sorted_result_df.round(2).astype(str).to_dict(orient="index")
+    return fte_database.get_aggregation(available_periods)
 
-    excel_df_dict["fte"] = {"data": sorted_result_df}
 
-    markdown_table_data = []
+@timing_span("prepare_department_fte_trend_report")
+def prepare_department_fte_trend_report(
+    data_source: Union[str, FteDatabase],
+    start_year: int,
+    start_month: int,
+    max_number_of_month: int = MAX_NUMBER_MONTH_IN_REPORT,
+    job_control: JobControl = None,
+):
+    """Return report content and css for fte trend report generation from database file or loaded FteDatabase"""
 
-    empty_v = {}
-    for k, v in sorted_result_dict.items():
-        for key in v.keys():
-            empty_v[key] = ""
-        break
+    if job_control is None:
+        job_control = JobControl()
 
-    for k, v in sorted_result_dict.items():
-        for key in v.keys():
-            if key != "Staff Category":
-                v[key] = f"{float(v[key]):,.2f}"
-        if v["Staff Category"] == "Total":
-            markdown_table_data.append(empty_v)
-            markdown_table_data.append(empty_v)
-            for key in v.keys():
-                v[key] = "**" + v[key] + "**"
-        markdown_table_data.append(v)
+    aggregation = prepare_report_aggregation(
+        data_source, start_year, start_month, max_number_of_month, job_control
+    )
+    if type(aggregation) is ReturnCodes:
+        return aggregation
 
-    markdown = (
-        markdown_table(markdown_table_data)
-        .set_params(row_sep="markdown", quote=False)
-        .get_markdown()
+    sorted_result_df = build_staff_category_table(
+        aggregation["fte_by_category_df"], aggregation["staff_category_order_df"]
     )
-    markdown = markdown.replace("nan", "-")
+    excel_df_dict = {}
+    excel_df_dict["fte"] = {
+        "data": sorted_result_df,
+        "number_format": excel_number_format(FTE_REPORT_DECIMALS),
+    }
+
+    with timing_span("html table"):
+        table_html = report_table_html(
+            format_report_numbers(sorted_result_df, FTE_REPORT_DECIMALS)
+        )
 
     css = report_css_style()
     md = {}
-    md["content"] = markdown
+    md["content"] = table_html
     md["css"] = css
     return_md = [md]
     return {"md": return_md, "excel_df": excel_df_dict}
 
 
+@timing_span("prepare_department_headcount_trend_report")
 def prepare_department_headcount_trend_report(
-    data_file_name: str,
+    data_source: Union[str, FteDatabase],
     start_year: int,
     start_month: int,
     max_number_of_month: int = MAX_NUMBER_MONTH_IN_REPORT,
+    job_control: JobControl = None,
 ):
-    """Return markdown report content and css for department headcount trend report generation from database file"""
+    """Return report content and css for department headcount trend report generation from database file or loaded FteDatabase"""
 
-    try:
-        # data_df_dict = pd.read_excel(data_file_name,sheet_name=None,header=0,dtype=object)
-        data_df_dict = pd.read_excel(data_file_name, sheet_name=None, header=0)
-    except Exception:
-        return ReturnCodes.ERROR_FILE_LOADING
+    if job_control is None:
+        job_control = JobControl()
 
-    available_periods = get_available_periods(
-        data_df_dict.keys(), start_year, start_month, max_number_of_month
+    aggregation = prepare_report_aggregation(
+        data_source, start_year, start_month, max_number_of_month, job_control
     )
+    if type(aggregation) is ReturnCodes:
+        return aggregation
 
-    if len(available_periods) == 0:
-        return ReturnCodes.ERROR_FILE_DATA_ERROR
-
-    result_dict = {}
-    results_order_dict = {}
+    sorted_result_df = build_staff_category_table(
+        aggregation["headcount_by_category_df"], aggregation["staff_category_order_df"]
+    )
     excel_df_dict = {}
-
-    for period in available_periods:
-        data_df = data_df_dict[period]
-
-        period_df = (
-            data_df.drop_duplicates(subset=["staff_number"])
-            .groupby(["Staff Category"])
-            .size()
-        )
-        result_dict[period] = period_df
-
-        result_order_df = data_df.drop_duplicates(subset=["Staff Category"]).loc[
-            :, ["Staff Category", "staff category order"]
-        ]
-        dict_from_zipped = dict(
-            zip(
-                result_order_df["Staff Category"],
-                result_order_df["staff category order"],
-            )
+    excel_df_dict["headcount"] = {
+        "data": sorted_result_df,
+        "number_format": excel_number_format(HEADCOUNT_REPORT_DECIMALS),
+    }
+
+    with timing_span("html table"):
+        table_html = report_table_html(
+            format_report_numbers(sorted_result_df, HEADCOUNT_REPORT_DECIMALS)
         )
-        if len(results_order_dict.keys()) == 0:
-            results_order_dict = dict_from_zipped
-        else:
-            results_order_dict.update(dict_from_zipped)
-
-    result_order_to_df = {}
-    result_order_to_df["Staff Category"] = []
-    result_order_to_df["staff category order"] = []
-    order = 1
-    for k, v in sorted(results_order_dict.items(), key=lambda x: (x[1], x[0])):
-        result_order_to_df["Staff Category"].append(k)
-        result_order_to_df["staff category order"].append(order)
-        order += 1
-
-    result = pd.DataFrame(result_dict)
-    results_order_df = pd.DataFrame.from_dict(result_order_to_df)
-
-    sorted_result_df = pd.merge(
-        result, results_order_df, on="Staff Category", how="inner"
-    )
-    sorted_result_df.set_index("staff category order", inplace=True)
-
-    sorted_result_df.sort_index(inplace=True)
-    sorted_result_df.set_index("Staff Category", inplace=True)
-
-    sorted_result_df.loc["Total"] = sorted_result_df.sum(numeric_only=True)
-
-    sorted_result_df.reset_index(inplace=True)
-
-    sorted_result_df = sorted_result_df.round(2).astype(str)
-
-    sorted_result_dict = sorted_result_df.to_dict(orient="index")
-
-    excel_df_dict["headcount"] = {"data": sorted_result_df}
-
-    markdown_table_data = []
-
-    empty_v = {}
-    for k, v in sorted_result_dict.items():
-        for key in v.keys():
-            empty_v[key] = ""
-        break
-
-    for k, v in sorted_result_dict.items():
-        for key in v.keys():
-            if key != "Staff Category":
-                v[key] = f"{float(v[key]):,.0f}"
-        if v["Staff Category"] == "Total":
-            markdown_table_data.append(empty_v)
-            markdown_table_data.append(empty_v)
-            for key in v.keys():
-                v[key] = "**" + v[key] + "**"
-        markdown_table_data.append(v)
-
-    markdown = (
-        markdown_table(markdown_table_data)
-        .set_params(row_sep="markdown", quote=False)
-        .get_markdown()
-    )
-    markdown = markdown.replace("nan", "-")
 
     css = report_css_style()
     md = {}
-    md["content"] = markdown
+    md["content"] = table_html
     md["css"] = css
     return_md = [md]
     return {"md": return_md, "excel_df": excel_df_dict}
 
 
+@timing_span("prepare_department_fte_costcentre_report")
 def prepare_department_fte_costcentre_report(
-    data_file_name: str,
+    data_source: Union[str, FteDatabase],
     start_year: int,
     start_month: int,
     max_number_of_month: int = MAX_NUMBER_MONTH_IN_REPORT,
+    job_control: JobControl = None,
 ):
-    """Return markdown report content and css for department fte report generation from database file"""
+    """Return report content and css for department fte report generation from database file or loaded FteDatabase"""
 
-    try:
-        # data_df_dict = pd.read_excel(data_file_name,sheet_name=None,header=0,dtype=object)
-        data_df_dict = pd.read_excel(data_file_name, sheet_name=None, header=0)
-    except Exception:
-        return ReturnCodes.ERROR_FILE_LOADING
+    if job_control is None:
+        job_control = JobControl()
 
-    available_periods = get_available_periods(
-        data_df_dict.keys(), start_year, start_month, max_number_of_month
+    aggregation = prepare_report_aggregation(
+        data_source, start_year, start_month, max_number_of_month, job_control
     )
-
-    if type(available_periods) is ReturnCodes:
-        return available_periods
-    if len(available_periods) == 0:
-        return ReturnCodes.ERROR_FILE_DATA_ERROR
+    if type(aggregation) is ReturnCodes:
+        return aggregation
 
     return_md = []
-    all_costcentre_result_dict = {}
-    cost_centre_code_dict = {}
-    for period in available_periods:
-        data_df = data_df_dict[period]
-
-        cost_centres = data_df["cost centre name"].copy().drop_duplicates().to_list()
-
-        # data_df["Staff Category duplicate"] = data_df["Staff Category"]
-
-        for c in cost_centres:
-            if c not in all_costcentre_result_dict.keys():
-                all_costcentre_result_dict[c] = {
-                    period: data_df[data_df["cost centre name"] == c]
-                }
-            else:
-                all_costcentre_result_dict[c][period] = data_df[
-                    data_df["cost centre name"] == c
-                ]
-            cost_centre_code_dict[c] = all_costcentre_result_dict[c][period][
-                "cost centre code"
-            ].iloc[0]
+    fte_by_costcentre_df = aggregation["fte_by_costcentre_df"]
+    matrix_cost_centres = set(
+        fte_by_costcentre_df.index.unique(level="cost centre name")
+    )
+    cost_centre_code_dict = aggregation["cost_centre_code_dict"]
 
     excel_df_dict = {}
-    for cost_centre, v in sorted(all_costcentre_result_dict.items()):
-        result_dict = {}
-        results_order_dict = {}
-        for period, target_df in v.items():
-            new_target_df = target_df.copy()
-
-            new_target_df["allocation"] = new_target_df["allocation"].astype(float)
-            period_df = new_target_df.groupby(["Staff Category", "Rank"])[
-                "allocation"
-            ].sum()
-            result_dict[period] = period_df
-
-            result_order_df = data_df.drop_duplicates(subset=["Staff Category"]).loc[
-                :, ["Staff Category", "staff category order"]
-            ]
-            dict_from_zipped = dict(
-                zip(
-                    result_order_df["Staff Category"],
-                    result_order_df["staff category order"],
-                )
-            )
-            if len(results_order_dict.keys()) == 0:
-                results_order_dict = dict_from_zipped
-            else:
-                results_order_dict.update(dict_from_zipped)
-
-        result_order_to_df = {}
-        result_order_to_df["Staff Category"] = []
-        result_order_to_df["staff category order"] = []
-        order = 1
-        for k, v in sorted(results_order_dict.items(), key=lambda x: (x[1], x[0])):
-            result_order_to_df["Staff Category"].append(k)
-            result_order_to_df["staff category order"].append(order)
-            order += 1
-
-        result = pd.DataFrame(result_dict)
-        results_order_df = pd.DataFrame.from_dict(result_order_to_df)
-
-        sorted_result_df = result.join(
-            results_order_df.set_index(["Staff Category", "staff category order"]),
-            how="inner",
-        )
-
-        sorted_result_df.reset_index(inplace=True)
-        sorted_result_df.set_index("staff category order", inplace=True)
-
-        sorted_result_df.sort_index(inplace=True)
-
-        sorted_result_df.set_index("Staff Category", inplace=True)
-
-        sorted_result_df["Rank"] = sorted_result_df["Rank"].astype(str)
-
-        sorted_result_df.loc["Total"] = sorted_result_df.sum(numeric_only=True)
-
-        sorted_result_df.reset_index(inplace=True)
-
-        sorted_result_df = sorted_result_df.round(2).astype(str)
+    number_of_cost_centres = len(aggregation["cost_centre_periods"])
+    for cost_centre_number, (cost_centre, periods) in enumerate(
+        aggregation["cost_centre_periods"].items()
+    ):
+        # stop between cost centres when cancelled
+        if job_control.checkpoint(
+            f"Cost centre {cost_centre}", cost_centre_number, number_of_cost_centres
+        ):
+            return ReturnCodes.ERROR_CANCELLED
+
+        if cost_centre in matrix_cost_centres:
+            result = fte_by_costcentre_df.loc[cost_centre].reindex(columns=periods)
+        else:
+            # no record with staff category and rank in the cost centre
+            result = fte_by_costcentre_df.iloc[:0].droplevel(0).reindex(columns=periods)
 
-        sorted_result_dict = (
-            # sorted_result_df.round(2).astype(str).to_dict(orient="index")
-            sorted_result_df.to_dict(orient="index")
+        sorted_result_df = build_staff_category_table(
+            result, aggregation["staff_category_order_df"]
         )
 
         # excel_df_list.append({'data' : sorted_result_df})
-        excel_df_dict[cost_centre] = {"data": sorted_result_df}
-
-        markdown_table_data = []
-
-        empty_v = {}
-        for k, v in sorted_result_dict.items():
-            for key in v.keys():
-                empty_v[key] = ""
-            break
-
-        last_staff_category = ""
-        for k, v in sorted_result_dict.items():
-            for key in v.keys():
-                if key != "Staff Category" and key != "Rank":
-                    v[key] = f"{float(v[key]):,.1f}"
-            if v["Staff Category"] == "Total":
-                last_staff_category = ""
-                markdown_table_data.append(empty_v)
-                markdown_table_data.append(empty_v)
-                for key in v.keys():
-                    v[key] = "**" + v[key] + "**"
-                v["Rank"] = ""
-            elif v["Staff Category"] == last_staff_category:
-                v["Staff Category"] = ""
-            else:
-                last_staff_category = v["Staff Category"]
-
-            markdown_table_data.append(v)
-
-        markdown = (
-            markdown_table(markdown_table_data)
-            .set_params(row_sep="markdown", quote=False)
-            .get_markdown()
-        )
-        markdown = markdown.replace("nan", "-")
+        excel_df_dict[cost_centre] = {
+            "data": sorted_result_df,
+            "number_format": excel_number_format(FTE_COSTCENTRE_REPORT_DECIMALS),
+        }
 
-        markdown_with_costcentre_name = f"##### Cost Centre : {cost_centre} ({cost_centre_code_dict[cost_centre]})<p>\n\n{markdown}"
+        display_df = format_report_numbers(sorted_result_df, FTE_COSTCENTRE_REPORT_DECIMALS)
+        display_df.loc[display_df["Staff Category"] == "Total", "Rank"] = ""
+        with timing_span("html table"):
+            table_html = report_table_html(display_df, repeated_column="Staff Category")
+
+        table_with_costcentre_name = f"##### Cost Centre : {cost_centre} ({cost_centre_code_dict[cost_centre]})<p>\n\n{table_html}"
 
         css = report_css_style()
         result_md = {}
-        result_md["content"] = markdown_with_costcentre_name
+        result_md["content"] = table_with_costcentre_name
         result_md["css"] = css
         return_md.append(result_md)
     return {"md": return_md, "excel_df": excel_df_dict}
 
 
-def generate_pdf_report(report_name: str, content: list, title: str = "Report"):
-    """Generate PDF report from markdown content and css list input from prepare report functions"""
+@timing_span("generate_pdf_report")
+def generate_pdf_report(
+    report_name: str,
+    content: list,
+    title: str = "Report",
+    job_control: JobControl = None,
+    workers: int = DEFAULT_PDF_WORKERS,
+):
+    """Generate PDF report from markdown content and css list input from prepare report functions
+
+    With workers more than 1, sections are rendered in worker processes and merged in order,
+    sections are rendered one after another if the worker processes fail.
+    """
+
+    if job_control is None:
+        job_control = JobControl()
 
     # header = f"## {title}"
     header = header_processing_pdf(title, header_mark="##### ")
 
-    pdf = MarkdownPdf()
-    for c in content:
-        pdf.add_section(
-            Section(header + "\n\n\n" + c["content"], paper_size="A4-L", toc=False),
-            user_css=c["css"],
-        )
-    pdf.save(report_name + ".pdf")
+    sections = [(header + "\n\n\n" + c["content"], c["css"]) for c in content]
+    if workers > 1 and len(sections) > 1:
+        try:
+            return generate_pdf_report_parallel(report_name, sections, workers, job_control)
+        except (OSError, BrokenProcessPool):
+            logger.warning(
+                "PDF worker processes failed, sections of %s rendered one after another",
+                report_name,
+                exc_info=True,
+            )
+
+    pdf = markdown_pdf.MarkdownPdf()
+    with timing_span("render sections"):
+        for section_number, (text, css) in enumerate(sections):
+            if job_control.checkpoint("Writing PDF", section_number, len(sections)):
+                return ReturnCodes.ERROR_CANCELLED
+            pdf.add_section(
+                markdown_pdf.Section(text, paper_size="A4-L", toc=False),
+                user_css=css,
+            )
+    with timing_span("save pdf"):
+        pdf.save(report_name + ".pdf")
+    return ReturnCodes.OK
+
+
+def render_pdf_sections(sections: list) -> bytes:
+    """Return PDF of sections of (markdown text, css), run in worker process of parallel rendering"""
+
+    pdf = markdown_pdf.MarkdownPdf()
+    for text, css in sections:
+        pdf.add_section(markdown_pdf.Section(text, paper_size="A4-L", toc=False), user_css=css)
+    pdf_bytes = io.BytesIO()
+    pdf.save_bytes(pdf_bytes)
+    return pdf_bytes.getvalue()
+
+
+def generate_pdf_report_parallel(
+    report_name: str, sections: list, workers: int, job_control: JobControl
+):
+    """Render chunks of sections in worker processes, and merge the partial PDFs in section order"""
+
+    number_of_chunks = min(len(sections), workers * PDF_CHUNKS_PER_WORKER)
+    chunk_size = -(-len(sections) // number_of_chunks)
+    chunks = [
+        sections[i : i + chunk_size] for i in range(0, len(sections), chunk_size)
+    ]
+
+    executor = ProcessPoolExecutor(max_workers=min(workers, len(chunks)))
+    try:
+        with timing_span("render sections"):
+            futures = [executor.submit(render_pdf_sections, chunk) for chunk in chunks]
+            pending = set(futures)
+            while pending:
+                if job_control.checkpoint(
+                    "Writing PDF", len(futures) - len(pending), len(futures)
+                ):
+                    return ReturnCodes.ERROR_CANCELLED
+                _, pending = wait(
+                    pending, timeout=PDF_PROGRESS_INTERVAL, return_when=FIRST_COMPLETED
+                )
+        with timing_span("save pdf"):
+            report_pdf = pymupdf.open()
+            for future in futures:
+                with pymupdf.open("pdf", future.result()) as partial_pdf:
+                    report_pdf.insert_pdf(partial_pdf)
+            report_pdf.set_metadata(markdown_pdf.MarkdownPdf.meta)
+            report_pdf.save(report_name + ".pdf")
+            report_pdf.close()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return ReturnCodes.OK
 
 
 def check_file_header(df: pd.DataFrame, expected_headers: list) -> list:
@@ -582,26 +1648,119 @@ def check_file_header(df: pd.DataFrame, expected_headers: list) -> list:
     return missing_headers
 
 
-def process_source_data(excelfile: str) -> int:
-    """Process the source excel file and return data dictionary or error code"""
+@timing_span("validate source file")
+def validate_source_file(excelfile: str) -> list:
+    """Return problems of sheets and header rows of the source excel file, empty list if none
+
+    Workbook is opened in read-only mode and only the header row of each sheet
+    is read, so a wrong file is reported at once without parsing its sheets.
+    """
+
+    try:
+        workbook = openpyxl.load_workbook(excelfile, read_only=True, data_only=True)
+    except Exception as e:
+        return [f"Source file cannot be opened: {e}"]
+
+    problems = []
+    try:
+        worksheets = workbook.worksheets
+        if len(worksheets) < SOURCE_REQUIRED_SHEETS:
+            required_sheets = ", ".join(s[0] for s in SOURCE_SHEETS[:SOURCE_REQUIRED_SHEETS])
+            problems.append(
+                f"Source file has {len(worksheets)} sheets, "
+                f"{SOURCE_REQUIRED_SHEETS} sheets ({required_sheets}) are required"
+            )
+
+        for i, (worksheet, (sheet_name, header_row, header)) in enumerate(
+            zip(worksheets, SOURCE_SHEETS)
+        ):
+            header_cells = next(
+                worksheet.iter_rows(
+                    min_row=header_row + 1, max_row=header_row + 1, values_only=True
+                ),
+                (),
+            )
+            missing_headers = [h for h in header if h not in header_cells]
+            if len(missing_headers) > 0:
+                problems.append(
+                    f"Sheet {i + 1} '{worksheet.title}' ({sheet_name}) row {header_row + 1} "
+                    f"missing headers: {', '.join(missing_headers)}"
+                )
+    finally:
+        workbook.close()
+
+    return problems
+
+
+@timing_span("process_source_data")
+def process_source_data(
+    excelfile: str, job_control: JobControl = None, validate: bool = True
+) -> int:
+    """Process the source excel file and return data dictionary or error code
+
+    Sheets and header rows are checked by validate_source_file before parsing,
+    validate is False when the caller has checked them already.
+    """
+
+    if job_control is None:
+        job_control = JobControl()
+    if job_control.checkpoint("Reading source file", 0, SOURCE_PROCESSING_STEPS):
+        return ReturnCodes.ERROR_CANCELLED
+
+    if validate:
+        problems = validate_source_file(excelfile)
+        for problem in problems:
+            logger.warning("%s: %s", excelfile, problem)
+        if len(problems) > 0:
+            return ReturnCodes.ERROR_FILE_ERROR
+
+    # the whole file is read again by the next engine when an engine fails on any sheet
+    *fallback_engines, last_engine = excel_reader_engines()
+    for engine in fallback_engines:
+        try:
+            result = read_source_excel_file(excelfile, engine, job_control)
+        except Exception as e:
+            logger.info("Excel reader %s failed on %s (%s), trying next", engine, excelfile, e)
+            continue
+        if result != ReturnCodes.ERROR_FILE_ERROR:
+            return result
+        logger.info("Excel reader %s failed on %s, trying next", engine, excelfile)
+
+    return read_source_excel_file(excelfile, last_engine, job_control)
+
+
+def read_source_excel_file(
+    excelfile: str, engine: str, job_control: JobControl
+) -> int:
+    """Open the source excel file once with engine, parse and process all its sheets"""
+
+    try:
+        with timing_span("open source file"):
+            source_excel_file = pd.ExcelFile(excelfile, engine=engine)
+    except Exception:
+        return ReturnCodes.ERROR_FILE_ERROR
+
+    with source_excel_file:
+        return process_source_excel_file(source_excel_file, job_control)
+
+
+def process_source_excel_file(
+    excel_file: pd.ExcelFile, job_control: JobControl = None
+) -> int:
+    """Process the opened source excel file and return data dictionary or error code"""
+
+    if job_control is None:
+        job_control = JobControl()
 
     # read sheet 1
     try:
-        file_base_data_df = pd.read_excel(
-            excelfile, sheet_name=0, header=0, dtype=object
-        )
+        with timing_span("read base sheet"):
+            file_base_data_df = excel_file.parse(sheet_name=0, header=0, dtype=object)
         # file_base_data_df = pd.read_excel(excelfile,sheet_name=0,header=0)
     except Exception:
         return ReturnCodes.ERROR_FILE_ERROR
 
-    header = [
-        "StaffNo",
-        "Rank",
-        "Section",
-        "Staff Category",
-        "FTE",
-        "Default Cost Centre",
-    ]
+    header = SOURCE_SHEETS[0][2]
     missing_headers = check_file_header(file_base_data_df, header)
     if len(missing_headers) > 0:
         return ReturnCodes.ERROR_FILE_ERROR
@@ -641,14 +1800,16 @@ def process_source_data(excelfile: str) -> int:
     for i in unique_rank_cat:
         cats = i.split("\t")
         unique_rank_cat_dict[cats[0]] = cats[1]
-    if DEBUG:
-        print(unique_rank_cat_dict)
-        print(type(unique_rank_cat_dict))
+    logger.debug("Rank to staff category: %s", unique_rank_cat_dict)
+
+    if job_control.checkpoint("Reading override sheet", 1, SOURCE_PROCESSING_STEPS):
+        return ReturnCodes.ERROR_CANCELLED
 
     # read sheet 2
     try:
         # file_expand_data_df = pd.read_excel(excelfile,sheet_name=1,header=1,dtype=object)
-        file_expand_data_df = pd.read_excel(excelfile, sheet_name=1, header=1)
+        with timing_span("read override sheet"):
+            file_expand_data_df = excel_file.parse(sheet_name=1, header=1)
     except Exception:
 
         return ReturnCodes.ERROR_FILE_ERROR
@@ -657,7 +1818,7 @@ def process_source_data(excelfile: str) -> int:
     if len(first_row_df.dropna(subset=["Rank"])) == 0:
         clean_base_data_df = clean_base_data_df.head(len(clean_base_data_df) - 1)
 
-    header = ["StaffNo", "Rank", "CCode", "CostCentre", "Allocated Percentage"]
+    header = SOURCE_SHEETS[1][2]
     missing_headers = check_file_header(file_expand_data_df, header)
     if len(missing_headers) > 0:
 
@@ -669,6 +1830,12 @@ def process_source_data(excelfile: str) -> int:
     file_expand_records_count: int = len(file_expand_data_df.index)
     clean_expand_records_count: int = len(clean_expand_data_df.index)
 
+    if file_expand_records_count != clean_expand_records_count:
+        logger.debug(
+            "Expand data had %d empty rows removed.",
+            file_expand_records_count - clean_expand_records_count,
+        )
+
     new_clean_expand_data_df = clean_expand_data_df.copy()
     new_clean_expand_data_df["Allocated Percentage"] = new_clean_expand_data_df[
         "Allocated Percentage"
@@ -684,21 +1851,23 @@ def process_source_data(excelfile: str) -> int:
     )
     clean_expand_data_df = new_clean_expand_data_df
 
-    if DEBUG:
-        print("clean_expand_data_df ------ ")
-        print(clean_expand_data_df.head(5))
+    logger.debug("clean_expand_data_df ------\n%s", clean_expand_data_df.head(5))
+
+    if job_control.checkpoint("Reading cost centre sheet", 2, SOURCE_PROCESSING_STEPS):
+        return ReturnCodes.ERROR_CANCELLED
 
     # read sheet 3, cost center information
     try:
-        file_cost_centre_data_df = pd.read_excel(
-            excelfile, sheet_name=2, header=0, dtype=object
-        )
+        with timing_span("read cost centre sheet"):
+            file_cost_centre_data_df = excel_file.parse(
+                sheet_name=2, header=0, dtype=object
+            )
         # file_cost_centre_data_df = pd.read_excel(excelfile,sheet_name=2,header=0)
     except Exception:
         # print(f"Error loading base sheet 3: {e}")
         return ReturnCodes.ERROR_FILE_ERROR
 
-    header = ["Value", "Description", "Enabled/ Disabled"]
+    header = SOURCE_SHEETS[2][2]
     missing_headers = check_file_header(file_cost_centre_data_df, header)
     if len(missing_headers) > 0:
         # print(f"Error: sheet 3 Missing expected column '{", ".join(missing_headers)}' in cost centre  data sheet.")
@@ -713,11 +1882,11 @@ def process_source_data(excelfile: str) -> int:
     file_cost_centre_records_count: int = len(file_cost_centre_data_df.index)
     clean_cost_centre_records_count: int = len(clean_cost_centre_data_df.index)
 
-    if DEBUG:
-        if file_cost_centre_records_count != clean_cost_centre_records_count:
-            print(
-                f"Cost centres data had {file_cost_centre_records_count - clean_cost_centre_records_count } 'Disabled' rows removed."
-            )
+    if file_cost_centre_records_count != clean_cost_centre_records_count:
+        logger.debug(
+            "Cost centres data had %d 'Disabled' rows removed.",
+            file_cost_centre_records_count - clean_cost_centre_records_count,
+        )
 
     # get the cost centre information
     clean_cost_centre_dict = clean_cost_centre_data_df.to_dict(orient="index")
@@ -726,28 +1895,26 @@ def process_source_data(excelfile: str) -> int:
     for k, v in clean_cost_centre_dict.items():
         cost_centre_info[str(v["Value"])] = v["Description"]
 
-    if DEBUG:
-        first_line = True
-        for k, v in cost_centre_info.items():
-            if first_line:
-                print(f"{k} : {v}", end="")
-                first_line = False
-            else:
-                print(", ")
-                print(f"{k} : {v}", end="")
-        print()
-    # read sheet 4 Staff Category Order
-    try:
-        # file_staff_category_order_data_df = pd.read_excel(excelfile,sheet_name=3,header=0,dtype=object)
-        file_staff_category_order_data_df = pd.read_excel(
-            excelfile, sheet_name=3, header=0
-        )
-        has_staff_category_order_data = True
-    except Exception:
-        has_staff_category_order_data = False
+    logger.debug("Cost centres: %s", cost_centre_info)
+
+    if job_control.checkpoint(
+        "Reading staff category order sheet", 3, SOURCE_PROCESSING_STEPS
+    ):
+        return ReturnCodes.ERROR_CANCELLED
+
+    # read sheet 4 Staff Category Order, the sheet is optional
+    has_staff_category_order_data = len(excel_file.sheet_names) > SOURCE_REQUIRED_SHEETS
 
     if has_staff_category_order_data:
-        header = ["Staff Category", "Order"]
+        try:
+            with timing_span("read staff category order sheet"):
+                file_staff_category_order_data_df = excel_file.parse(
+                    sheet_name=3, header=0
+                )
+        except Exception:
+            return ReturnCodes.ERROR_FILE_ERROR
+
+        header = SOURCE_SHEETS[3][2]
         missing_headers = check_file_header(file_staff_category_order_data_df, header)
         if len(missing_headers) > 0:
             return ReturnCodes.ERROR_FILE_ERROR
@@ -765,14 +1932,15 @@ def process_source_data(excelfile: str) -> int:
             clean_staff_category_order_data_df.index
         )
 
-        if DEBUG:
-            if (
+        if (
+            file_staff_category_order_records_count
+            != clean_staff_category_order_records_count
+        ):
+            logger.debug(
+                "Staff category order data had %d empty rows removed.",
                 file_staff_category_order_records_count
-                != clean_staff_category_order_records_count
-            ):
-                print(
-                    f"Expand data had {file_expand_records_count - clean_expand_records_count} empty rows removed."
-                )
+                - clean_staff_category_order_records_count,
+            )
 
         clean_staff_category_order_data_dict = (
             clean_staff_category_order_data_df.to_dict(orient="index")
@@ -798,122 +1966,116 @@ def process_source_data(excelfile: str) -> int:
         for i in range(len(sorted_staff_category_order_list)):
             staff_category_order_dict[sorted_staff_category_order_list[i]] = i + 1
 
-    # expand the list
-    clean_base_data_df = clean_base_data_df.set_index("StaffNo")
-    clean_base_dict = clean_base_data_df.to_dict(orient="index")
-    if DEBUG:
-        print("clean_base_dict ------ ")
-        print(clean_base_dict)
-    # clean_base_dict has key as StaffNo, value as dict of other columns
-    clean_expand_dict = clean_expand_data_df.to_dict(orient="index")
-    # clean_expand_dict has key as index, value as dict of other columns, including StaffNo as StaffNo is not unique here
-
-    expanded_entries = []
-    staff_rank_category = {}
-    issue_staff_numbers_not_in_base = set()
-    issue_staff_numbers_fte_not_100_in_expand = []
-
-    unique_staff_in_base = {}
-    unique_staff_in_expand = {}
-    for k, v in clean_base_dict.items():
-        unique_staff_in_base[str(k)] = v["FTE"]
-
-    for k, v in clean_expand_dict.items():
-
-        staff_number = str(v["StaffNo"])
-        if staff_number not in unique_staff_in_expand.keys():
-            unique_staff_in_expand[staff_number] = v["Allocated Percentage"]
-        else:
-            unique_staff_in_expand[staff_number] += v["Allocated Percentage"]
-
-        if DEBUG:
-            print(f"Processing expand record for staff number {staff_number}")
-            print(v)
-        if staff_number in clean_base_dict.keys():
-            if DEBUG:
-                print(f"Found staff number {staff_number} in base data.")
-            staff_rank_category[staff_number] = clean_base_dict[staff_number][
-                "Staff Category"
-            ]
-            del clean_base_dict[staff_number]
-
-        if staff_number in unique_staff_in_base.keys():
-            if (
-                v["Rank"] in unique_rank_cat_dict.keys()
-                and unique_rank_cat_dict[v["Rank"]] in staff_category_order_dict.keys()
-            ):
-                expanded_item = {
-                    "staff_number": staff_number,
-                    "Rank": v["Rank"],
-                    "Staff Category": unique_rank_cat_dict[v["Rank"]],
-                    "staff category order": staff_category_order_dict[
-                        unique_rank_cat_dict[v["Rank"]]
-                    ],
-                    "cost centre code": str(v["CCode"]).zfill(3),
-                    "cost centre name": cost_centre_info[str(v["CCode"]).zfill(3)],
-                    "allocation": v["Allocated Percentage"]
-                    * unique_staff_in_base[staff_number],
-                }
-                expanded_entries.append(expanded_item)
-
-                if DEBUG:
-                    print(f"Adding expanded record for staff number {staff_number}")
-            else:
-                return ReturnCodes.ERROR_FILE_DATA_ERROR
-        else:
-            issue_staff_numbers_not_in_base.add(staff_number)
-            # found record in expand data but not in base data. It is not counted as error, just skip it.
-            if DEBUG:
-                print(
-                    f"Error : Rank {v['Rank']} not found in base data for staff number {staff_number}."
-                )
+    if job_control.checkpoint("Expanding records", 4, SOURCE_PROCESSING_STEPS):
+        return ReturnCodes.ERROR_CANCELLED
 
-    for k, v in clean_base_dict.items():
-        clean_item = {
-            "staff_number": k,
-            "Rank": v["Rank"],
-            "Staff Category": v["Staff Category"],
-            "staff category order": staff_category_order_dict[v["Staff Category"]],
-            "cost centre code": str(v["Default Cost Centre"]).zfill(3),
-            "cost centre name": cost_centre_info[
-                str(v["Default Cost Centre"]).zfill(3)
-            ],
-            "allocation": v["FTE"],
+    return expand_source_records(
+        clean_base_data_df,
+        clean_expand_data_df,
+        unique_rank_cat_dict,
+        staff_category_order_dict,
+        cost_centre_info,
+    )
+
+
+@timing_span("expand records")
+def expand_source_records(
+    clean_base_data_df: pd.DataFrame,
+    clean_expand_data_df: pd.DataFrame,
+    unique_rank_cat_dict: dict,
+    staff_category_order_dict: dict,
+    cost_centre_info: dict,
+):
+    """Return data dictionary of base records expanded by override records, or error code"""
+
+    # expand the list, override records replace the base record of the same staff
+    base_fte = clean_base_data_df.set_index("StaffNo")["FTE"]
+    logger.debug("clean_base_data_df ------\n%s", clean_base_data_df)
+
+    expand_in_base = clean_expand_data_df["StaffNo"].isin(base_fte.index)
+    # found records in expand data but not in base data. It is not counted as error, just skip them.
+    issue_staff_numbers_not_in_base = set(
+        clean_expand_data_df.loc[~expand_in_base, "StaffNo"]
+    )
+
+    override_data_df = clean_expand_data_df[expand_in_base]
+    override_cost_centre_code = override_data_df["CCode"].str.zfill(3)
+    override_staff_category = override_data_df["Rank"].map(unique_rank_cat_dict)
+    override_entries_df = pd.DataFrame(
+        {
+            "staff_number": override_data_df["StaffNo"],
+            "Rank": override_data_df["Rank"],
+            "Staff Category": override_staff_category,
+            "staff category order": override_staff_category.map(
+                staff_category_order_dict
+            ),
+            "cost centre code": override_cost_centre_code,
+            "cost centre name": override_cost_centre_code.map(cost_centre_info),
+            "allocation": override_data_df["Allocated Percentage"]
+            * override_data_df["StaffNo"].map(base_fte),
         }
-        expanded_entries.append(clean_item)
-
-        # if DEBUG:
-        #    print(f"Adding base only record for staff number {k}")
-        #    print(clean_item)
-
-        # expanded_entries.append({'staff_number' : k, 'rank' : v['Rank'], 'Staff Category' : v['Staff Category'], 'staff category order' : staff_category_order_dict[v['Staff Category']],'cost centre code' : str(v['Default Cost Centre']).zfill(3), 'cost centre name' : cost_centre_info[str(v['Default Cost Centre']).zfill(3)], 'allocation' : v['FTE']})
-
-    result_df = pd.DataFrame(expanded_entries)
-    if DEBUG:
-        print(f"Total records processed: {len(result_df.index)}")
-        print(result_df)
-
-    result_dict = {"hr_fte_df": result_df}
-    for k, v in unique_staff_in_expand.items():
-        if v != 1.0:
-            issue_staff_numbers_fte_not_100_in_expand.append(f"{k}({v})")
-            if DEBUG:
-                print(
-                    f"Staff number {k} has total FTE allocation of {v} in expand data."
-                )
+    )
+
+    base_only_data_df = clean_base_data_df[
+        ~clean_base_data_df["StaffNo"].isin(clean_expand_data_df["StaffNo"])
+    ]
+    base_cost_centre_code = (
+        base_only_data_df["Default Cost Centre"].astype(str).str.zfill(3)
+    )
+    base_entries_df = pd.DataFrame(
+        {
+            "staff_number": base_only_data_df["StaffNo"],
+            "Rank": base_only_data_df["Rank"],
+            "Staff Category": base_only_data_df["Staff Category"],
+            "staff category order": base_only_data_df["Staff Category"].map(
+                staff_category_order_dict
+            ),
+            "cost centre code": base_cost_centre_code,
+            "cost centre name": base_cost_centre_code.map(cost_centre_info),
+            "allocation": base_only_data_df["FTE"],
+        }
+    )
+
+    # rank or staff category without order, or cost centre not enabled
+    for entries_df in (override_entries_df, base_entries_df):
+        if (
+            entries_df[["Staff Category", "staff category order", "cost centre name"]]
+            .isna()
+            .any(axis=None)
+        ):
+            return ReturnCodes.ERROR_FILE_DATA_ERROR
+
+    result_df = pd.concat([override_entries_df, base_entries_df], ignore_index=True)
+    logger.debug("Total records processed: %d", len(result_df.index))
+    logger.debug("result_df ------\n%s", result_df)
+
+    # total allocation of each staff in expand data, in order of first appearance
+    staff_allocation = clean_expand_data_df.groupby("StaffNo", sort=False)[
+        "Allocated Percentage"
+    ]
+    unique_staff_in_expand = staff_allocation.sum().where(
+        staff_allocation.count() == staff_allocation.size()
+    )
+    staff_fte_not_1 = unique_staff_in_expand[unique_staff_in_expand != 1.0]
+    issue_staff_numbers_fte_not_100_in_expand = [
+        f"{k}({v})" for k, v in staff_fte_not_1.items()
+    ]
+
+    result_dict = {"hr_fte_df": to_category_dtypes(result_df)}
     result_dict["issue_staff_numbers_not_in_base"] = sorted(
         list(issue_staff_numbers_not_in_base)
     )
     result_dict["issue_expand_staff_fte_not_1"] = (
         issue_staff_numbers_fte_not_100_in_expand
     )
-    if DEBUG:
-        print(
-            f"Staff numbers with FTE not equal to 1 in expand data: {issue_staff_numbers_fte_not_100_in_expand}"
-        )
-        print(
-            f"Staff numbers not in base: {result_dict['issue_staff_numbers_not_in_base']}"
-        )
+    logger.debug(
+        "Staff numbers with FTE not equal to 1 in expand data: %s",
+        issue_staff_numbers_fte_not_100_in_expand,
+    )
+    logger.debug(
+        "Staff numbers not in base: %s",
+        result_dict["issue_staff_numbers_not_in_base"],
+    )
 
     return result_dict
 
@@ -924,57 +2086,239 @@ def clean_sheet_name(sheet_name: str) -> str:
     return sheet_name.translate(mytable)[:SHEET_NAME_MAX_LENGTH]
 
 
+def excel_writer_engine() -> str:
+    """Return engine of writing new excel files, xlsxwriter if installed as it writes faster"""
+    return "xlsxwriter" if find_spec("xlsxwriter") is not None else "openpyxl"
+
+
+def excel_number_format(decimals: int) -> str:
+    """Return excel number format of thousands separator and decimals, e.g. #,##0.00"""
+    return "#,##0." + "0" * decimals if decimals > 0 else "#,##0"
+
+
+def format_excel_columns(
+    writer: pd.ExcelWriter,
+    sheet_name: str,
+    data_df: pd.DataFrame,
+    first_row: int,
+    number_format: str = None,
+):
+    """Center cells of data_df written from first_row of sheet, numeric columns in number_format
+
+    xlsxwriter sets a format of each column, openpyxl, also writing to existing files,
+    styles the cells of each column. Column header cells keep their header style.
+    """
+
+    number_columns = [
+        number_format is not None and pd.api.types.is_numeric_dtype(dtype)
+        for dtype in data_df.dtypes
+    ]
+
+    if writer.engine == "xlsxwriter":
+        worksheet = writer.sheets[sheet_name]
+        text_cell_format = writer.book.add_format({"align": "center", "valign": "vcenter"})
+        number_cell_format = (
+            writer.book.add_format(
+                {"align": "center", "valign": "vcenter", "num_format": number_format}
+            )
+            if any(number_columns)
+            else None
+        )
+        for column_number, number_column in enumerate(number_columns):
+            worksheet.set_column(
+                column_number,
+                column_number,
+                None,
+                number_cell_format if number_column else text_cell_format,
+            )
+        return
+
+    # writer.sheets of openpyxl looks up every sheet of workbook
+    worksheet = writer.book[sheet_name]
+    alignment = openpyxl.styles.Alignment(horizontal="center", vertical="center")
+    for number_column, column_cells in zip(
+        number_columns,
+        worksheet.iter_cols(
+            min_row=first_row + 1,
+            max_row=first_row + len(data_df),
+            max_col=len(data_df.columns),
+        ),
+    ):
+        for cell in column_cells:
+            cell.alignment = alignment
+            if number_column:
+                cell.number_format = number_format
+
+
+def write_excel_sheets(writer: pd.ExcelWriter, input_data_dict: dict):
+    """Write header and data dataframes of input_data_dict to sheets of excel writer
+
+    Numbers of data are written as numbers, in number_format of the sheet if given.
+    """
+
+    for sheet_name, data_df_dict in input_data_dict.items():
+
+        clean_name = clean_sheet_name(sheet_name)
+        data_row = 0
+
+        if "header" in data_df_dict.keys():
+            header_df = data_df_dict["header"]
+            header_df.to_excel(writer, sheet_name=clean_name, index=False, header=False)
+            format_excel_columns(writer, clean_name, header_df, 0)
+            data_row = len(header_df)
+
+        if "data" in data_df_dict.keys():
+            data_df = data_df_dict["data"]
+            data_df.to_excel(
+                writer, sheet_name=clean_name, index=False, startrow=data_row, header=True
+            )
+            format_excel_columns(
+                writer,
+                clean_name,
+                data_df,
+                data_row + 1,
+                data_df_dict.get("number_format"),
+            )
+
+
+@timing_span("generate_excel_fr_df")
 def generate_excel_fr_df(
     # reportname: str, sheet_names: list[str], result_df: pd.DataFrame
     reportname: str,
     input_data_dict: dict,
+    mode: str = EXCEL_MODE_NEW,
 ):
+    """Write input_data_dict sheets to excel file, return ReturnCodes
+
+    mode EXCEL_MODE_NEW only creates new file, EXCEL_MODE_APPEND adds new sheets to
+    existing file and EXCEL_MODE_REPLACE adds or overwrites sheets of existing file.
+    Other sheets of existing file are kept as they are.
+    """
+
     reportname = reportname + ".xlsx"
 
     if not os.path.exists(reportname):
-        with pd.ExcelWriter(f"{reportname}", mode="w") as writer:
-            # df1.to_excel(writer, sheet_name='Sheet_name_3')
-            for sheet_name, data_df_dict in input_data_dict.items():
-                
-                clean_name = clean_sheet_name(sheet_name)
-                
-                if "header" in data_df_dict.keys():
-                    data_df_dict["header"].style.set_properties(**{'text-align': 'center', 'vertical-align': 'middle'}).to_excel(
-                        writer, sheet_name=f"{clean_name}", index=False, header=False,
-                    )
-                    
-
-                    if "data" in data_df_dict.keys():
-                        data_df_dict["data"].style.set_properties(**{'text-align': 'center', 'vertical-align': 'middle'}).to_excel(
-                            writer,
-                            sheet_name=f"{clean_name}",
-                            index=False,
-                            startrow=writer.sheets[clean_name].max_row, header=True,
-                        )
-                elif "data" in data_df_dict.keys():
-                    data_df_dict["data"].style.set_properties(**{'text-align': 'center', 'vertical-align': 'middle'}).to_excel(
-                        writer, index=False, sheet_name=f"{clean_name}"
-                    )
-        
+        with pd.ExcelWriter(reportname, mode="w", engine=excel_writer_engine()) as writer:
+            with timing_span("write sheets"):
+                write_excel_sheets(writer, input_data_dict)
+
         return ReturnCodes.OK_GEN_NEW_DATABASE
-    else:
-        if DEBUG:
-            print(f"report file {reportname} existed")
+    elif mode == EXCEL_MODE_NEW:
+        logger.warning("report file %s existed", reportname)
         return ReturnCodes.ERROR_FILE_ERROR
 
+    clean_names = [clean_sheet_name(sheet_name) for sheet_name in input_data_dict.keys()]
+    try:
+        with open_excel_file(reportname) as excel_file:
+            existing_names = excel_file.sheet_names
+    except Exception:
+        return ReturnCodes.ERROR_FILE_LOADING
+
+    if mode == EXCEL_MODE_APPEND:
+        if any(name in existing_names for name in clean_names):
+            logger.warning("sheets %s existed in report file %s", clean_names, reportname)
+            return ReturnCodes.ERROR_DATABASE_PERIOD_EXISTED
+    elif mode != EXCEL_MODE_REPLACE:
+        return ReturnCodes.ERROR_PROGRAM
+
+    with pd.ExcelWriter(
+        reportname, mode="a", engine="openpyxl", if_sheet_exists="overlay"
+    ) as writer:
+        for name in clean_names:
+            if name in writer.book.sheetnames:
+                # recreate the sheet at the same position, old content not to be overlaid
+                sheet_index = writer.book.sheetnames.index(name)
+                del writer.book[name]
+                writer.book.create_sheet(name, sheet_index)
+        with timing_span("write sheets"):
+            write_excel_sheets(writer, input_data_dict)
+
+    return ReturnCodes.OK_UPDATE_DATABASE
+
+
+@timing_span("update_fte_database")
+def update_fte_database(
+    database_file_name: str,
+    period: str,
+    hr_fte_df: pd.DataFrame,
+    mode: str = EXCEL_MODE_APPEND,
+):
+    """Write period data to database excel file and its columnar store, return ReturnCodes
+
+    mode EXCEL_MODE_APPEND adds a new period, EXCEL_MODE_REPLACE adds or overwrites
+    the period. Other periods in database are not changed. Database file name of
+    excel database is with or without .xlsx extension, e.g. picked in file dialog.
+    Database file name of SQLite extension, e.g. HR_FTE_Database.sqlite, is written
+    as SQLite database.
+    """
+
+    if is_sqlite_database(database_file_name):
+        return update_sqlite_database(database_file_name, period, hr_fte_df, mode)
+
+    if database_file_name.lower().endswith(".xlsx"):
+        database_file_name = database_file_name[: -len(".xlsx")]
+    database_excel_file = database_file_name + ".xlsx"
+    new_database = not os.path.exists(database_excel_file)
+    if new_database:
+        store_periods = []
+    else:
+        manifest = read_columnar_manifest(database_excel_file)
+        store_periods = (
+            None
+            if manifest is None
+            or manifest.get("aggregates_version") != PERIOD_AGGREGATES_VERSION
+            else manifest["periods"]
+        )
+
+    result = generate_excel_fr_df(
+        database_file_name, {period: {"data": hr_fte_df}}, mode=mode
+    )
+    if result not in (ReturnCodes.OK_GEN_NEW_DATABASE, ReturnCodes.OK_UPDATE_DATABASE):
+        return result
+
+    if columnar_store_available():
+        # database excel file is the master copy, columnar store failure is not an error
+        try:
+            with timing_span("write columnar store"):
+                if store_periods is None:
+                    # columnar store missing or out of date, build it from all periods once
+                    build_columnar_store(database_excel_file)
+                else:
+                    if new_database:
+                        shutil.rmtree(
+                            get_columnar_store_dir(database_excel_file),
+                            ignore_errors=True,
+                        )
+                    write_columnar_period(database_excel_file, period, hr_fte_df)
+                    write_columnar_manifest(
+                        database_excel_file, list(set(store_periods) | {period})
+                    )
+        except Exception:
+            logger.warning(
+                "columnar store of %s not written", database_excel_file, exc_info=True
+            )
+
+    return result
+
 
+@timing_span("generate_department_fte_summary_report")
 def generate_department_fte_summary_report(
-    fte_data_file_name: str,
+    fte_data_source: Union[str, FteDatabase],
     summary_report_file_name: str,
     report_title: str,
     start_year: int,
     start_month: int,
     number_of_month: int = MAX_NUMBER_MONTH_IN_REPORT,
+    job_control: JobControl = None,
+    pdf_workers: int = DEFAULT_PDF_WORKERS,
 ):
-    """Generate department FTE summary report from database file"""
+    """Generate department FTE summary report from database file or loaded FteDatabase"""
+
+    if job_control is None:
+        job_control = JobControl()
 
     department_fte_trend_content = prepare_department_fte_trend_report(
-        fte_data_file_name, start_year, start_month, number_of_month
+        fte_data_source, start_year, start_month, number_of_month, job_control
     )
     if type(department_fte_trend_content) is ReturnCodes:
         return department_fte_trend_content
@@ -987,11 +2331,15 @@ def generate_department_fte_summary_report(
         report_title = f"{report_title} {period}"
 
         if "md" in department_fte_trend_content.keys():
-            generate_pdf_report(
+            result = generate_pdf_report(
                 summary_report_file_name,
                 department_fte_trend_content["md"],
                 report_title,
+                job_control,
+                pdf_workers,
             )
+            if result == ReturnCodes.ERROR_CANCELLED:
+                return result
         if "excel_df" in department_fte_trend_content.keys():
             title_lines = header_processing_excel(f"{report_title}")
             sheet_header = {"title": title_lines}
@@ -1001,31 +2349,36 @@ def generate_department_fte_summary_report(
             for k, v in department_fte_trend_content["excel_df"].items():
                 department_fte_trend_content["excel_df"][k]["header"] = header_df
 
+            if job_control.checkpoint("Writing Excel", 0):
+                return ReturnCodes.ERROR_CANCELLED
             generate_excel_fr_df(
                 summary_report_file_name, department_fte_trend_content["excel_df"]
             )
     else:
-        if DEBUG:
-            print(
-                f"Error: department_headcount_trend_content is '{department_fte_trend_content}'"
-            )
+        logger.error("Error: report content is '%s'", department_fte_trend_content)
         return ReturnCodes.ERROR_PROGRAM
 
     return ReturnCodes.OK
 
 
+@timing_span("generate_department_headcount_summary_report")
 def generate_department_headcount_summary_report(
-    fte_data_file_name: str,
+    fte_data_source: Union[str, FteDatabase],
     summary_report_file_name: str,
     report_title: str,
     start_year: int,
     start_month: int,
     number_of_month: int = MAX_NUMBER_MONTH_IN_REPORT,
+    job_control: JobControl = None,
+    pdf_workers: int = DEFAULT_PDF_WORKERS,
 ):
-    """Generate department headcount summary report from database file"""
+    """Generate department headcount summary report from database file or loaded FteDatabase"""
+
+    if job_control is None:
+        job_control = JobControl()
 
     department_headcount_trend_content = prepare_department_headcount_trend_report(
-        fte_data_file_name, start_year, start_month, number_of_month
+        fte_data_source, start_year, start_month, number_of_month, job_control
     )
     if type(department_headcount_trend_content) is ReturnCodes:
         return department_headcount_trend_content
@@ -1039,11 +2392,15 @@ def generate_department_headcount_summary_report(
 
         if "md" in department_headcount_trend_content.keys():
 
-            generate_pdf_report(
+            result = generate_pdf_report(
                 summary_report_file_name,
                 department_headcount_trend_content["md"],
                 report_title,
+                job_control,
+                pdf_workers,
             )
+            if result == ReturnCodes.ERROR_CANCELLED:
+                return result
         if "excel_df" in department_headcount_trend_content.keys():
             title_lines = header_processing_excel(f"{report_title}")
             sheet_header = {"title": title_lines}
@@ -1053,34 +2410,41 @@ def generate_department_headcount_summary_report(
             for k, v in department_headcount_trend_content["excel_df"].items():
                 department_headcount_trend_content["excel_df"][k]["header"] = header_df
 
+            if job_control.checkpoint("Writing Excel", 0):
+                return ReturnCodes.ERROR_CANCELLED
             generate_excel_fr_df(
                 summary_report_file_name, department_headcount_trend_content["excel_df"]
             )
 
     else:
-        if DEBUG:
-            print(
-                f"Error: department_headcount_trend_content is '{department_headcount_trend_content}'"
-            )
+        logger.error("Error: report content is '%s'", department_headcount_trend_content)
         return ReturnCodes.ERROR_PROGRAM
 
     return ReturnCodes.OK
 
 
+@timing_span("generate_department_fte_costcentre_report")
 def generate_department_fte_costcentre_report(
-    fte_data_file_name: str,
+    fte_data_source: Union[str, FteDatabase],
     costcentre_report_file_name: str,
     report_title: str,
     start_year: int,
     start_month: int,
     number_of_month: int = MAX_NUMBER_MONTH_IN_REPORT,
+    job_control: JobControl = None,
+    pdf_workers: int = DEFAULT_PDF_WORKERS,
 ):
-    """Generate department fte report with costcentre breakdown from database file"""
+    """Generate department fte report with costcentre breakdown from database file or loaded FteDatabase
+
+    Cost centre sections of the PDF are rendered by pdf_workers processes.
+    """
+
+    if job_control is None:
+        job_control = JobControl()
 
     department_fte_costcentre_content = prepare_department_fte_costcentre_report(
-        fte_data_file_name, start_year, start_month, number_of_month
+        fte_data_source, start_year, start_month, number_of_month, job_control
     )
-    # print(department_fte_trend_content)
     if type(department_fte_costcentre_content) is ReturnCodes:
         return department_fte_costcentre_content
     elif type(department_fte_costcentre_content) is dict:
@@ -1092,11 +2456,15 @@ def generate_department_fte_costcentre_report(
         report_title = f"{report_title} {period}"
 
         if "md" in department_fte_costcentre_content.keys():
-            generate_pdf_report(
+            result = generate_pdf_report(
                 costcentre_report_file_name,
                 department_fte_costcentre_content["md"],
                 report_title,
+                job_control,
+                pdf_workers,
             )
+            if result == ReturnCodes.ERROR_CANCELLED:
+                return result
         if "excel_df" in department_fte_costcentre_content.keys():
             title_lines = header_processing_excel(f"{report_title}")
             sheet_header = {"title": title_lines}
@@ -1106,37 +2474,245 @@ def generate_department_fte_costcentre_report(
             for k, v in department_fte_costcentre_content["excel_df"].items():
                 department_fte_costcentre_content["excel_df"][k]["header"] = header_df
 
+            if job_control.checkpoint("Writing Excel", 0):
+                return ReturnCodes.ERROR_CANCELLED
             generate_excel_fr_df(
                 costcentre_report_file_name,
                 department_fte_costcentre_content["excel_df"]
             )
     else:
-        if DEBUG:
-            print(
-                f"Error: department_headcount_trend_content is '{department_fte_costcentre_content}'"
-            )
+        logger.error("Error: report content is '%s'", department_fte_costcentre_content)
         return ReturnCodes.ERROR_PROGRAM
 
     return ReturnCodes.OK
 
 
-if __name__ == "__main__":
-    # Load the dataset
+# reports of generate_department_reports, by report key
+DEPARTMENT_REPORT_GENERATORS = {
+    "fte_summary": generate_department_fte_summary_report,
+    "headcount_summary": generate_department_headcount_summary_report,
+    "fte_costcentre": generate_department_fte_costcentre_report,
+}
+
+# report file name and title of each department report, by report key
+DEPARTMENT_REPORT_NAMES = {
+    "fte_summary": (
+        "HR_department_fte_summary_report",
+        "Full Time Equivalent (FTE) - Total",
+    ),
+    "headcount_summary": (
+        "HR_department_headcount_summary_report",
+        "Headcount - Total",
+    ),
+    "fte_costcentre": (
+        "HR_department_fte_costcentres_report",
+        "Full Time Equivalent (FTE) by Department",
+    ),
+}
+# page header of reports, company name / report title / financial year
+REPORT_COMPANY_NAME = "CUHK Medical Centre Limited"
+REPORT_FINANCIAL_YEAR_HEADER = "Financial Year: "
+
+# seconds between progress updates while waiting for report workers
+REPORT_PROGRESS_INTERVAL = 0.2
+
+
+def department_report_files(
+    report_directory: str, timestamp: str, report_keys: list = None
+) -> dict:
+    """Return report_files of generate_department_reports, all reports if report_keys not given
+
+    Report files are in report_directory, their names end with timestamp.
+    """
+
+    if report_keys is None:
+        report_keys = list(DEPARTMENT_REPORT_NAMES)
+
+    report_files = {}
+    for report_key in report_keys:
+        report_file_name, report_title = DEPARTMENT_REPORT_NAMES[report_key]
+        report_files[report_key] = (
+            os.path.join(report_directory, f"{report_file_name}_{timestamp}"),
+            f"{REPORT_COMPANY_NAME}{HEADER_SEPARATOR}{report_title}{HEADER_SEPARATOR}{REPORT_FINANCIAL_YEAR_HEADER}",
+        )
+    return report_files
 
-    database_file = "HR_FTE_Database.xlsx"
-    start_year = 2025
-    start_month = 7
 
-    department_headcount_summary_report_file_name = (
-        "HR_department_headcount_summary_report.pdf"
+@timing_span("generate_department_reports")
+def generate_department_reports(
+    fte_data_source: Union[str, FteDatabase],
+    report_files: dict,
+    start_year: int,
+    start_month: int,
+    number_of_month: int = MAX_NUMBER_MONTH_IN_REPORT,
+    job_control: JobControl = None,
+    concurrent: bool = True,
+    pdf_workers: int = DEFAULT_PDF_WORKERS,
+) -> dict:
+    """Generate department reports from database file or loaded FteDatabase, return ReturnCodes by report key
+
+    report_files is (report file name, report title) by key of DEPARTMENT_REPORT_GENERATORS.
+    The database is loaded and aggregated once for all reports. When concurrent,
+    each report is generated in its own worker process from the aggregated data,
+    otherwise one after another. Reports of worker processes failing to start or
+    dying are generated one after another. pdf_workers is used only for reports
+    generated one after another. A failing report does not stop the others.
+    """
+
+    if job_control is None:
+        job_control = JobControl()
+
+    fte_database = load_fte_database(fte_data_source)
+    if type(fte_database) is ReturnCodes:
+        return {key: fte_database for key in report_files}
+    aggregation = prepare_report_aggregation(
+        fte_database, start_year, start_month, number_of_month, job_control
     )
-    department_headcount_summary_report_title = "Yearly Department Headcount Trend.pdf"
-
-    generate_department_headcount_summary_report(
-        database_file,
-        department_headcount_summary_report_file_name,
-        department_headcount_summary_report_title,
-        start_year,
-        start_month,
-        12,
+    if type(aggregation) is ReturnCodes:
+        return {key: aggregation for key in report_files}
+
+    sub_jobs = job_control.sub_jobs(list(report_files))
+    results = {}
+    if concurrent and len(report_files) > 1:
+        available_periods = get_available_periods(
+            fte_database.periods(), start_year, start_month, number_of_month
+        )
+        try:
+            results = generate_department_reports_concurrently(
+                fte_database.aggregation_copy(available_periods),
+                report_files,
+                start_year,
+                start_month,
+                number_of_month,
+                sub_jobs,
+                # report workers render their PDF alone, not a pool per report
+                DEFAULT_PDF_WORKERS,
+            )
+        except (OSError, BrokenProcessPool):
+            logger.warning(
+                "report worker processes not started, reports generated one after another",
+                exc_info=True,
+            )
+
+    for key, (report_file_name, report_title) in report_files.items():
+        if key in results:
+            continue
+        try:
+            results[key] = DEPARTMENT_REPORT_GENERATORS[key](
+                fte_database,
+                report_file_name,
+                report_title,
+                start_year,
+                start_month,
+                number_of_month,
+                sub_jobs[key],
+                pdf_workers,
+            )
+        except Exception:
+            logger.error("report %s not generated", report_file_name, exc_info=True)
+            results[key] = ReturnCodes.ERROR_PROGRAM
+    return {key: results[key] for key in report_files}
+
+
+def generate_department_report_process(
+    report_key: str,
+    fte_database: FteDatabase,
+    report_file_name: str,
+    report_title: str,
+    start_year: int,
+    start_month: int,
+    number_of_month: int,
+    pdf_workers: int,
+    cancel_event,
+    progress_queue,
+):
+    """Generate a report in worker process, return its ReturnCodes and timing spans
+
+    Progress is put to progress_queue, cancel_event is shared with the calling process.
+    """
+
+    job_control = JobControl(
+        lambda stage, fraction: progress_queue.put((report_key, stage, fraction))
     )
+    job_control.cancel_event = cancel_event
+    timing_report = start_timing_report(report_key)
+    try:
+        result = DEPARTMENT_REPORT_GENERATORS[report_key](
+            fte_database,
+            report_file_name,
+            report_title,
+            start_year,
+            start_month,
+            number_of_month,
+            job_control,
+            pdf_workers,
+        )
+    finally:
+        stop_timing_report()
+    return result, timing_report.spans
+
+
+def generate_department_reports_concurrently(
+    fte_database: FteDatabase,
+    report_files: dict,
+    start_year: int,
+    start_month: int,
+    number_of_month: int,
+    sub_jobs: dict,
+    pdf_workers: int,
+) -> dict:
+    """Generate each report in its own worker process, return ReturnCodes by report key
+
+    Reports of worker processes that died are left out of the result.
+    """
+
+    results = {}
+    with multiprocessing.Manager() as manager, ProcessPoolExecutor(
+        max_workers=len(report_files)
+    ) as executor:
+        cancel_event = manager.Event()
+        progress_queue = manager.Queue()
+        start_time = time.perf_counter()
+        futures = {
+            executor.submit(
+                generate_department_report_process,
+                key,
+                fte_database,
+                report_file_name,
+                report_title,
+                start_year,
+                start_month,
+                number_of_month,
+                pdf_workers,
+                cancel_event,
+                progress_queue,
+            ): key
+            for key, (report_file_name, report_title) in report_files.items()
+        }
+
+        pending = set(futures)
+        while pending:
+            _, pending = wait(
+                pending, timeout=REPORT_PROGRESS_INTERVAL, return_when=FIRST_COMPLETED
+            )
+            if any(job_control.cancelled() for job_control in sub_jobs.values()):
+                cancel_event.set()
+            while True:
+                try:
+                    key, stage, fraction = progress_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if sub_jobs[key].progress_callback is not None:
+                    sub_jobs[key].progress_callback(stage, fraction)
+
+        for future, key in futures.items():
+            try:
+                results[key], spans = future.result()
+                add_timing_spans(spans, start_time)
+            except BrokenProcessPool:
+                logger.warning("worker process of report %s died", report_files[key][0])
+            except Exception:
+                logger.error("report %s not generated", report_files[key][0], exc_info=True)
+                results[key] = ReturnCodes.ERROR_PROGRAM
+
+    return results
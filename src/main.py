@@ -1,18 +1,27 @@
 """The main module of the HR Cost Reporting Application using Flet framework"""
 
 import os
+import multiprocessing
+import threading
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
 
 from dataprocess import (
     process_source_data,
-    generate_excel_fr_df,
+    validate_source_file,
+    update_fte_database,
     ReturnCodes,
-    generate_department_fte_summary_report,
-    generate_department_headcount_summary_report,
-    generate_department_fte_costcentre_report,
-    HEADER_SEPARATOR,
+    EXCEL_MODE_APPEND,
+    EXCEL_MODE_REPLACE,
+    DEFAULT_PDF_WORKERS,
+    load_fte_database,
+    generate_department_reports,
+    department_report_files,
+    configure_logging,
+    configure_excel_reader,
+    JobControl,
 )
+from timing import start_timing_report, stop_timing_report
 
 import flet
 from flet import (
@@ -24,6 +33,7 @@ from flet import (
     NavigationRailDestination,
     Page,
     Text,
+    Checkbox,
     Card,
     Colors,
     ElevatedButton,
@@ -34,6 +44,7 @@ from flet import (
     Theme,
     ElevatedButtonTheme,
     MainAxisAlignment,
+    ProgressBar,
 )
 
 # from flet import colors, icons
@@ -52,17 +63,13 @@ saved_database_name = None
 
 report_start_date = None
 
-company_name = "CUHK Medical Centre Limited"
-financial_year_header = "Financial Year: "
+database_update_timing_file_suffix = "_update_timing.json"
+reports_timing_file_name = "HR_reports_timing"
 
-department_fte_summary_report_file_name = "HR_department_fte_summary_report"
-department_fte_summary_report_title = "Full Time Equivalent (FTE) - Total"
-
-department_headcount_summary_report_file_name = "HR_department_headcount_summary_report"
-department_headcount_summary_report_title = "Headcount - Total"
-
-department_fte_costcentre_report_file_name = "HR_department_fte_costcentres_report"
-department_fte_costcentre_report_title = "Full Time Equivalent (FTE) by Department"
+# processes rendering cost centre sections of PDF report
+pdf_render_workers = DEFAULT_PDF_WORKERS
+# reports are generated one after another, worker processes are not checked in packaged app
+concurrent_reports = False
 
 def init_data_upload_setup():
     """Initialize the data upload, database setup parameters"""
@@ -76,13 +83,112 @@ def init_data_upload_setup():
     data_name = None
     data_directory = None
     database_file_directory = None
-    database_file_name = "HR_FTE_Database"
+    database_file_name = "HR_FTE_Database.xlsx"
     fte_data_date = datetime.now() - relativedelta(months=1)
 
 
+def save_timing_report(timing_file_name: str) -> str:
+    """Stop the timing report of the run, save it as JSON file and return its summary"""
+
+    timing_report = stop_timing_report()
+    if timing_report is None:
+        return ""
+    try:
+        timing_report.save_json(timing_file_name)
+    except OSError:
+        return timing_report.summary() + "\nTiming report not saved"
+    return timing_report.summary()
+
+
+def report_status_text(result: ReturnCodes, report_file_name: str) -> str:
+    """Return status text of a generated report"""
+
+    if result == ReturnCodes.OK:
+        if os.path.exists(report_file_name + ".pdf") and os.path.exists(
+            report_file_name + ".xlsx"
+        ):
+            return f"Congratulation!!\nReport {report_file_name} (pdf / xlsx) was generated."
+        return f"Oops\nGenerating report named {report_file_name} (pdf / xlsx) was not successful."
+    if result == ReturnCodes.ERROR_CANCELLED:
+        return f"Cancelled!!\nReport named {report_file_name} (pdf / xlsx) not generated"
+    return f"Oops\nDatabase file has problem. Report named {report_file_name} (pdf / xlsx) not generated"
+
+
+# log level can be set by HR_COST_LOG_LEVEL environment variable, e.g. DEBUG
+configure_logging()
+# excel reader engine can be set by HR_COST_EXCEL_READER environment variable, e.g. openpyxl
+configure_excel_reader()
 init_data_upload_setup()
 
 
+class JobProgress:
+    """Progress bar, stage text and cancel button of a job running in background thread
+
+    job_lock is shared by the job progress of all pages, so one job runs at a time in the app.
+    """
+
+    def __init__(self, page: Page, job_lock: threading.Lock):
+        self.page = page
+        self.job_lock = job_lock
+        self.progress_bar = ProgressBar(value=0, visible=False)
+        self.stage_text = Text("", color=Colors.BLUE, visible=False)
+        self.cancel_button = ElevatedButton(
+            "Cancel", icon=Icons.CANCEL, on_click=self.cancel, visible=False
+        )
+        self.locked_controls = []
+        self.disabled_states = []
+        self.job_control = None
+
+    def start(self, locked_controls: list) -> JobControl:
+        """Show progress and disable locked_controls until the job finishes, return job control
+
+        None is returned if another job of the app is running.
+        """
+
+        if not self.job_lock.acquire(blocking=False):
+            return None
+        self.locked_controls = locked_controls
+        self.disabled_states = [c.disabled for c in locked_controls]
+        for c in locked_controls:
+            c.disabled = True
+        self.progress_bar.value = None
+        self.stage_text.value = "Starting"
+        self.progress_bar.visible = True
+        self.stage_text.visible = True
+        self.cancel_button.visible = True
+        self.cancel_button.disabled = False
+        self.job_control = JobControl(self.update_progress)
+        self.page.update()
+        return self.job_control
+
+    def update_progress(self, stage: str, fraction: float):
+        """Progress callback of job control, called from worker thread"""
+
+        self.stage_text.value = stage
+        self.progress_bar.value = fraction
+        self.page.update()
+
+    def cancel(self, e):
+        """Request the running job to stop"""
+
+        if self.job_control is not None:
+            self.job_control.cancel()
+            self.cancel_button.disabled = True
+            self.stage_text.value = "Cancelling"
+            self.page.update()
+
+    def finish(self):
+        """Hide progress and restore the locked controls"""
+
+        for c, disabled in zip(self.locked_controls, self.disabled_states):
+            c.disabled = disabled
+        self.progress_bar.visible = False
+        self.stage_text.visible = False
+        self.cancel_button.visible = False
+        self.job_control = None
+        self.job_lock.release()
+
+
 class DesktopAppLayout(Row):
     """A desktop app layout with a menu on the left."""
 
@@ -255,9 +361,49 @@ def main(page: Page):
         disabled=True,
     )
 
+    replace_period_checkbox = Checkbox(
+        label="Replace data of the month if it is already in Database File",
+        value=False,
+    )
+
+    # jobs share the timing report and the database file, one job runs at a time
+    job_lock = threading.Lock()
+
+    fte_upload_progress = JobProgress(page, job_lock)
+
     def update_database(e):
+        """function to start database update in background thread, window is not blocked"""
+
+        job_control = fte_upload_progress.start(
+            [
+                fte_data_upload_button,
+                optional_report_upload_button,
+                replace_period_checkbox,
+                update_database_button,
+                restart_button_fte_upload,
+                database_file_upload_button,
+                generate_reports_button,
+                restart_button_generate_reports,
+            ]
+        )
+        if job_control is None:
+            return
+        page.run_thread(run_update_database, job_control)
+
+    def run_update_database(job_control: JobControl):
         """function to update or create database file from uploaded data file"""
 
+        try:
+            update_database_job(job_control)
+        finally:
+            fte_upload_progress.finish()
+            # reports can be generated from the updated database once the job finished
+            generate_reports_button.disabled = not database_file_saved
+            page.update()
+
+    def update_database_job(job_control: JobControl):
+        """update or create database file from uploaded data file, and show the result"""
+
         global database_file_saved
         global saved_database_file_directory
         global saved_database_name
@@ -265,35 +411,66 @@ def main(page: Page):
         data_period = f"{str(fte_data_date.year)}{str(fte_data_date.month).zfill(2)}"
         datafile = data_directory + data_name
         report_file = database_file_directory + database_file_name
-        result_dict = process_source_data(datafile)
-        input_excel_data_dict = {data_period : {'data' : result_dict["hr_fte_df"]}}
-        result = generate_excel_fr_df(
-            report_file, input_excel_data_dict
-        )
+        start_timing_report("update database")
+        # all problems of sheets and headers are shown at once, before parsing the sheets
+        source_problems = validate_source_file(datafile)
+        if len(source_problems) > 0:
+            result_dict = ReturnCodes.ERROR_FILE_ERROR
+        else:
+            result_dict = process_source_data(datafile, job_control, validate=False)
+        if type(result_dict) is not ReturnCodes and job_control.checkpoint(
+            "Writing database", 0
+        ):
+            result_dict = ReturnCodes.ERROR_CANCELLED
+        if type(result_dict) is ReturnCodes:
+            result = result_dict
+            result_dict = {
+                "issue_staff_numbers_not_in_base": [],
+                "issue_expand_staff_fte_not_1": [],
+            }
+        else:
+            result = update_fte_database(
+                report_file,
+                data_period,
+                result_dict["hr_fte_df"],
+                mode=(
+                    EXCEL_MODE_REPLACE
+                    if replace_period_checkbox.value
+                    else EXCEL_MODE_APPEND
+                ),
+            )
         if result == ReturnCodes.OK_UPDATE_DATABASE:
             status_text_fte_upload.value = f"Congratulation!!\nDatabase file {database_file_directory}{database_file_name} was updated."
             database_file_saved = True
             saved_database_file_directory = database_file_directory
             saved_database_name = database_file_name
-            generate_reports_button.disabled = False
             status_text_generate_reports.value = generate_report_status_content()
         elif result == ReturnCodes.OK_GEN_NEW_DATABASE:
             status_text_fte_upload.value = f"Congratulation!!\nDatabase file {database_file_directory}]{database_file_name} was created."
             database_file_saved = True
             saved_database_file_directory = database_file_directory
             saved_database_name = database_file_name
-            generate_reports_button.disabled = False
             status_text_generate_reports.value = generate_report_status_content()
         elif result == ReturnCodes.ERROR_FILE_ERROR:
             status_text_fte_upload.value = (
                 "Oops!!\nInput file has error. Please check Headers and Sheets"
             )
+            if len(source_problems) > 0:
+                status_text_fte_upload.value = (
+                    status_text_fte_upload.value + "\n" + "\n".join(source_problems)
+                )
         elif result == ReturnCodes.ERROR_FILE_DATA_ERROR:
             status_text_fte_upload.value = (
                 "Oops!!\nInput file has duplicated staff ID or Error in Category Order"
             )
+        elif result == ReturnCodes.ERROR_DATABASE_PERIOD_EXISTED:
+            status_text_fte_upload.value = f"Oops!!\nDatabase file already has data of {fte_data_date.strftime('%Y / %m')}.\nTick the replace option to overwrite it."
         elif result == ReturnCodes.ERROR_FILE_LOADING:
             status_text_fte_upload.value = "Oops!!\nInput file cannot be loaded"
+        elif result == ReturnCodes.ERROR_CANCELLED:
+            status_text_fte_upload.value = (
+                "Cancelled!!\nDatabase file was not updated"
+            )
         elif result == ReturnCodes.ERROR_PROGRAM:
             status_text_fte_upload.value = "Oops!!\nPossible program error occurred"
         elif result == ReturnCodes.ERROR:
@@ -312,8 +489,13 @@ def main(page: Page):
                 + "\n"
                 + f"Staff Numbers with FTE not 100% in Expand Data: {', '.join(result_dict['issue_expand_staff_fte_not_1'])}"
             )
-
-        page.update()
+        status_text_fte_upload.value = (
+            status_text_fte_upload.value
+            + "\n"
+            + save_timing_report(
+                os.path.splitext(report_file)[0] + database_update_timing_file_suffix
+            )
+        )
 
     update_database_button = ElevatedButton(
         update_database_button_prompt,
@@ -331,6 +513,7 @@ def main(page: Page):
         status_text_fte_upload.value = init_fte_upload_status_content
         update_database_button.disabled = True
         optional_report_upload_button.disabled = True
+        replace_period_checkbox.value = False
         page.update()
 
     restart_button_fte_upload = ElevatedButton(
@@ -385,10 +568,53 @@ def main(page: Page):
         ),
     )
 
+    generate_reports_progress = JobProgress(page, job_lock)
+
     def generate_reports(e):
+        """function to start reports generation in background thread, window is not blocked"""
+
+        job_control = generate_reports_progress.start(
+            [
+                database_file_upload_button,
+                generate_reports_button,
+                restart_button_generate_reports,
+                fte_data_upload_button,
+                optional_report_upload_button,
+                replace_period_checkbox,
+                update_database_button,
+                restart_button_fte_upload,
+            ]
+        )
+        if job_control is None:
+            return
+        page.run_thread(run_generate_reports, job_control)
+
+    def run_generate_reports(job_control: JobControl):
         """function to generate reports from saved database file"""
 
+        try:
+            generate_reports_job(job_control)
+        finally:
+            generate_reports_progress.finish()
+            page.update()
+
+    def generate_reports_job(job_control: JobControl):
+        """generate reports from saved database file, and show the result"""
+
         database_file_name = saved_database_file_directory + saved_database_name
+        start_timing_report("generate reports")
+
+        # load database once and share it across all reports
+        if job_control.checkpoint("Loading database", 0):
+            stop_timing_report()
+            status_text_generate_reports.value = "Cancelled!!\nReports not generated"
+            return
+        fte_database = load_fte_database(database_file_name)
+        if type(fte_database) is ReturnCodes:
+            stop_timing_report()
+            status_text_generate_reports.value = f"Oops\nDatabase file {database_file_name} cannot be loaded. Reports not generated"
+            return
+
         timestamp = (
             str(report_start_date.year)
             + str(report_start_date.month).zfill(2)
@@ -397,120 +623,33 @@ def main(page: Page):
             + str(report_start_date.minute).zfill(2)
         )
 
-        adj_department_fte_summary_report_file_name = (
-            department_fte_summary_report_file_name + "_" + timestamp
-        )
-        adj_department_fte_summary_report_file_name = (
-            saved_database_file_directory + adj_department_fte_summary_report_file_name
-        )
-
-        report_header = f"{company_name}{HEADER_SEPARATOR}{department_fte_summary_report_title}{HEADER_SEPARATOR}{financial_year_header}"
-        
-        
-        if generate_department_fte_summary_report(
-                database_file_name,
-                adj_department_fte_summary_report_file_name,
-                report_header,
-                report_start_date.year,
-                report_start_date.month,
-            ) == ReturnCodes.OK:
-            
-            pdf = adj_department_fte_summary_report_file_name + ".pdf"
-            excel = adj_department_fte_summary_report_file_name + ".xlsx"
-            if os.path.exists(pdf) and os.path.exists(excel):
-                status_text_generate_reports.value = f"Congratulation!!\nReport {adj_department_fte_summary_report_file_name} (pdf / xlsx) was generated."
-            else:
-                status_text_generate_reports.value = f"Oops\nGenerating report named {adj_department_fte_summary_report_file_name} (pdf / xlsx) was not successful."
-        else:
-            status_text_generate_reports.value = f"Oops\nDatabase file has problem. Report named {adj_department_fte_summary_report_file_name} (pdf / xlsx) not generated"
+        report_files = department_report_files(saved_database_file_directory, timestamp)
 
-        adj_department_headcount_summary_report_file_name = (
-            department_headcount_summary_report_file_name + "_" + timestamp
-        )
-        adj_department_headcount_summary_report_file_name = (
-            saved_database_file_directory
-            + adj_department_headcount_summary_report_file_name
+        results = generate_department_reports(
+            fte_database,
+            report_files,
+            report_start_date.year,
+            report_start_date.month,
+            job_control=job_control,
+            concurrent=concurrent_reports,
+            pdf_workers=pdf_render_workers,
         )
 
-        report_header = f"{company_name}{HEADER_SEPARATOR}{department_headcount_summary_report_title}{HEADER_SEPARATOR}{financial_year_header}"
-
-        if generate_department_headcount_summary_report(
-                database_file_name,
-                adj_department_headcount_summary_report_file_name,
-                report_header,
-                report_start_date.year,
-                report_start_date.month,
-            ) == ReturnCodes.OK:
-            
-            pdf = adj_department_headcount_summary_report_file_name + ".pdf"
-            excel = adj_department_headcount_summary_report_file_name + ".xlsx"
-            if os.path.exists(pdf) and os.path.exists(excel):
-
-    
-            #if os.path.exists(adj_department_headcount_summary_report_file_name):
-                status_text_generate_reports.value = (
-                    status_text_generate_reports.value
-                    + "\n"
-                    + f"Congratulation!!\nReport {adj_department_headcount_summary_report_file_name} (pdf / xlsx) was generated."
-                )
-            else:
-                status_text_generate_reports.value = (
-                    status_text_generate_reports.value
-                    + "\n"
-                    + f"Oops\nGenerating report named {adj_department_headcount_summary_report_file_name} (pdf / xlsx) was not successful."
-                )
-        else:
-            status_text_generate_reports.value = (
-                status_text_generate_reports.value
-                + "\n"
-                + f"Oops\nDatabase file has problem. Report named {adj_department_headcount_summary_report_file_name} (pdf / xlsx) not generated"
-            )
-
-        adj_department_fte_costcentre_report_file_name = (
-            department_fte_costcentre_report_file_name + "_" + timestamp
-        )
-        adj_department_fte_costcentre_report_file_name = (
-            saved_database_file_directory
-            + adj_department_fte_costcentre_report_file_name
+        status_text_generate_reports.value = "\n".join(
+            report_status_text(results[report_key], report_file_name)
+            for report_key, (report_file_name, _) in report_files.items()
         )
-
-        report_header = f"{company_name}{HEADER_SEPARATOR}{department_fte_costcentre_report_title}{HEADER_SEPARATOR}{financial_year_header}"
-
-        if (
-            generate_department_fte_costcentre_report(
-                database_file_name,
-                adj_department_fte_costcentre_report_file_name,
-                report_header,
-                report_start_date.year,
-                report_start_date.month,
+        status_text_generate_reports.value = (
+            status_text_generate_reports.value
+            + "\n"
+            + save_timing_report(
+                saved_database_file_directory
+                + reports_timing_file_name
+                + "_"
+                + timestamp
+                + ".json"
             )
-            == ReturnCodes.OK
-        ):
-            
-            pdf = adj_department_fte_costcentre_report_file_name + ".pdf"
-            excel = adj_department_fte_costcentre_report_file_name + ".xlsx"
-            if os.path.exists(pdf) and os.path.exists(excel):
-                
-            #if os.path.exists(adj_department_fte_costcentre_report_file_name):
-                status_text_generate_reports.value = (
-                    status_text_generate_reports.value
-                    + "\n"
-                    + f"Congratulation!!\nReport {adj_department_fte_costcentre_report_file_name} (pdf / xlsx) was generated."
-                )
-            else:
-                status_text_generate_reports.value = (
-                    status_text_generate_reports.value
-                    + "\n"
-                    + f"Oops\nGenerating report named {adj_department_fte_costcentre_report_file_name} (pdf / xlsx) was not successful."
-                )
-        else:
-            status_text_generate_reports.value = (
-                status_text_generate_reports.value
-                + "\n"
-                + f"Oops\nDatabase file has problem. Report named {adj_department_fte_costcentre_report_file_name} (pdf / xlsx) not generated"
-            )
-
-        page.update()
+        )
 
     generate_reports_button = ElevatedButton(
         "Generate Reports",
@@ -684,6 +823,7 @@ def main(page: Page):
                 controls=[
                     Column(
                         horizontal_alignment="stretch",
+                        scroll="auto",
                         controls=[
                             Card(
                                 content=Container(
@@ -707,7 +847,11 @@ def main(page: Page):
                             ),
                             fte_data_upload_button,
                             optional_report_upload_button,
+                            replace_period_checkbox,
                             update_database_button,
+                            fte_upload_progress.stage_text,
+                            fte_upload_progress.progress_bar,
+                            fte_upload_progress.cancel_button,
                             restart_button_fte_upload,
                         ],
                         expand=True,
@@ -725,6 +869,7 @@ def main(page: Page):
                 controls=[
                     Column(
                         horizontal_alignment="stretch",
+                        scroll="auto",
                         controls=[
                             Card(
                                 content=Container(
@@ -750,6 +895,9 @@ def main(page: Page):
                             ),
                             database_file_upload_button,
                             generate_reports_button,
+                            generate_reports_progress.stage_text,
+                            generate_reports_progress.progress_bar,
+                            generate_reports_progress.cancel_button,
                             restart_button_generate_reports,
                         ],
                         expand=True,
@@ -770,6 +918,8 @@ def main(page: Page):
 
 
 if __name__ == "__main__":
+    # PDF worker processes of packaged app start from this program
+    multiprocessing.freeze_support()
     flet.app(
         target=main,
     )
@@ -0,0 +1,190 @@
+"""
+Module provide timing of named processing stages, consumed by data processing and main program
+
+Functions:
+exported class:
+- TimingReport
+
+exported functions:
+- start_timing_report
+- stop_timing_report
+- timing_span
+- add_timing_spans
+
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+TIMING_REPORT_VERSION = 1
+
+# path separator of nested span names, e.g. "generate_pdf_report/save pdf"
+SPAN_PATH_SEPARATOR = "/"
+
+# active timing report of current run, None when timing is not started
+active_timing_report = None
+
+span_stack = threading.local()
+
+
+class TimingReport:
+    """Named timing spans of a run, saved as JSON timing report"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self.start_time = time.perf_counter()
+        self.total_seconds = None
+        self.spans = []
+        self.lock = threading.Lock()
+
+    def add_span(self, path: str, start_time: float, seconds: float):
+        """Add a finished span of path name"""
+
+        span = {
+            "name": path.split(SPAN_PATH_SEPARATOR)[-1],
+            "path": path,
+            "depth": path.count(SPAN_PATH_SEPARATOR),
+            "start": round(start_time - self.start_time, 6),
+            "seconds": round(seconds, 6),
+            "thread": threading.current_thread().name,
+        }
+        with self.lock:
+            self.spans.append(span)
+
+    def stop(self):
+        """Stop the timing report, setting the total run time"""
+        self.total_seconds = round(time.perf_counter() - self.start_time, 6)
+
+    def stage_totals(self, max_depth: int = 0) -> dict:
+        """Return total seconds and count of spans by path, spans with the same path are summed"""
+
+        totals = {}
+        with self.lock:
+            spans = list(self.spans)
+        for span in sorted(spans, key=lambda x: x["start"]):
+            if span["depth"] > max_depth:
+                continue
+            if span["path"] not in totals:
+                totals[span["path"]] = {"seconds": 0.0, "count": 0}
+            totals[span["path"]]["seconds"] += span["seconds"]
+            totals[span["path"]]["count"] += 1
+
+        # paths in tree order, stages of concurrent threads are listed under their parent
+        first_start = {path: i for i, path in enumerate(totals)}
+
+        def tree_order(path: str) -> list:
+            names = path.split(SPAN_PATH_SEPARATOR)
+            return [
+                first_start.get(SPAN_PATH_SEPARATOR.join(names[: i + 1]), first_start[path])
+                for i in range(len(names))
+            ]
+
+        return {path: totals[path] for path in sorted(totals, key=tree_order)}
+
+    def to_dict(self) -> dict:
+        """Return the timing report as dictionary for JSON output"""
+
+        with self.lock:
+            spans = sorted(self.spans, key=lambda x: x["start"])
+        return {
+            "version": TIMING_REPORT_VERSION,
+            "name": self.name,
+            "started_at": self.started_at,
+            "total_seconds": self.total_seconds,
+            "stages": {
+                path: {"seconds": round(v["seconds"], 6), "count": v["count"]}
+                for path, v in self.stage_totals(max_depth=len(spans)).items()
+            },
+            "spans": spans,
+        }
+
+    def save_json(self, file_name: str):
+        """Save the timing report as JSON file"""
+
+        with open(file_name, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def summary(self, max_depth: int = 1) -> str:
+        """Return text summary of stage timings, for display in status text"""
+
+        total = self.total_seconds
+        if total is None:
+            total = time.perf_counter() - self.start_time
+        lines = [f"Timing {self.name}: {total:.2f}s"]
+        for path, v in self.stage_totals(max_depth=max_depth).items():
+            indent = "  " * (path.count(SPAN_PATH_SEPARATOR) + 1)
+            count = f" x{v['count']}" if v["count"] > 1 else ""
+            lines.append(
+                f"{indent}{path.split(SPAN_PATH_SEPARATOR)[-1]}{count}: {v['seconds']:.2f}s"
+            )
+        return "\n".join(lines)
+
+
+def start_timing_report(name: str) -> TimingReport:
+    """Start a timing report, spans of all threads are added to it until stopped"""
+
+    global active_timing_report
+
+    active_timing_report = TimingReport(name)
+    # spans of calling thread are nested in the new report only, e.g. in forked worker process
+    span_stack.names = []
+    return active_timing_report
+
+
+def stop_timing_report() -> TimingReport:
+    """Stop and return the active timing report"""
+
+    global active_timing_report
+
+    timing_report = active_timing_report
+    active_timing_report = None
+    if timing_report is not None:
+        timing_report.stop()
+    return timing_report
+
+
+@contextmanager
+def timing_span(name: str):
+    """Time the enclosed stage as a named span of the active timing report
+
+    It can also be used as function decorator. Nothing is recorded when no
+    timing report is started.
+    """
+
+    timing_report = active_timing_report
+    if timing_report is None:
+        yield
+        return
+
+    stack = getattr(span_stack, "names", None)
+    if stack is None:
+        stack = span_stack.names = []
+    stack.append(name)
+    path = SPAN_PATH_SEPARATOR.join(stack)
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing_report.add_span(path, start_time, time.perf_counter() - start_time)
+        stack.pop()
+
+
+def add_timing_spans(spans: list, start_time: float):
+    """Add spans recorded by timing report of another process to the active timing report
+
+    Span start is relative to start_time of this process, and span path is
+    nested in the current span of the calling thread.
+    """
+
+    timing_report = active_timing_report
+    if timing_report is None:
+        return
+
+    parent_path = SPAN_PATH_SEPARATOR.join(getattr(span_stack, "names", None) or [])
+    for span in spans:
+        path = span["path"] if not parent_path else parent_path + SPAN_PATH_SEPARATOR + span["path"]
+        timing_report.add_span(path, start_time + span["start"], span["seconds"])
@@ -0,0 +1,178 @@
+import pytest
+import os
+import subprocess
+import sys
+import pandas as pd
+
+sys.path.insert(0, "../src")
+
+# Import the module to test
+from cli import main, exit_code
+from dataprocess import ReturnCodes, load_fte_database
+
+
+@pytest.fixture
+def source_excel_file(tmp_path):
+    """Fixture providing a source excel file, override sheet has a title row above header"""
+    file_path = tmp_path / 'source.xlsx'
+    with pd.ExcelWriter(file_path) as writer:
+        pd.DataFrame({
+            'StaffNo': [1001, 1002, 1003],
+            'Rank': ['RN', 'MO', 'RN'],
+            'Section': ['A', 'B', 'A'],
+            'Staff Category': ['Nurse', 'Doctor', 'Nurse'],
+            'FTE': [1.0, 1.0, 0.5],
+            'Default Cost Centre': [10, 10, 20],
+        }).to_excel(writer, sheet_name='Base', index=False)
+        pd.DataFrame([['Override']]).to_excel(writer, sheet_name='Override', index=False, header=False)
+        pd.DataFrame({
+            'StaffNo': [1002, 1002],
+            'Rank': ['MO', 'MO'],
+            'CCode': [10, 20],
+            'CostCentre': ['IT', 'HR'],
+            'Allocated Percentage': [60, 40],
+        }).to_excel(writer, sheet_name='Override', index=False, startrow=1)
+        pd.DataFrame({
+            'Value': ['010', '020'],
+            'Description': ['IT', 'HR'],
+            'Enabled/ Disabled': ['Enabled', 'Enabled'],
+        }).to_excel(writer, sheet_name='Cost Centre', index=False)
+    return str(file_path)
+
+
+class TestExitCode:
+    """Test cases for exit_code function"""
+
+    def test_exit_codes(self):
+        """Test that OK results exit with 0 and errors with distinct codes above 10"""
+        assert exit_code(ReturnCodes.OK) == 0
+        assert exit_code(ReturnCodes.OK_UPDATE_DATABASE) == 0
+        assert exit_code(ReturnCodes.ERROR) == 10
+        assert exit_code(ReturnCodes.ERROR_FILE_ERROR) == 11
+        assert exit_code(ReturnCodes.ERROR_DATABASE_PERIOD_EXISTED) == 13
+        assert exit_code(ReturnCodes.ERROR_PROGRAM) == 20
+
+
+class TestCommands:
+    """Test cases for validate, ingest and reports commands"""
+
+    def test_validate(self, source_excel_file, tmp_path, capsys):
+        """Test that problems of source file are printed with error exit code"""
+        assert main(['validate', source_excel_file]) == 0
+
+        assert main(['validate', str(tmp_path / 'missing.xlsx')]) == 11
+        assert 'Source file cannot be opened' in capsys.readouterr().err
+
+    def test_ingest(self, source_excel_file, tmp_path, capsys):
+        """Test that periods are added to database, existing period only with replace"""
+        database = str(tmp_path / 'HR_FTE_Database.xlsx')
+
+        assert main(['--quiet', 'ingest', source_excel_file, database, '--period', '202506']) == 0
+        assert main(['--quiet', 'ingest', source_excel_file, database, '--period', '202506']) == 13
+        assert 'already has period 202506' in capsys.readouterr().err
+        assert main(['ingest', source_excel_file, database, '--period', '202506', '--replace']) == 0
+        assert main(['--no-timing', 'ingest', source_excel_file, database, '--period', '202507']) == 0
+
+        assert load_fte_database(database).periods() == ['202506', '202507']
+        assert os.path.exists(str(tmp_path / 'HR_FTE_Database_update_timing.json'))
+
+    def test_ingest_sqlite(self, source_excel_file, tmp_path):
+        """Test that database of SQLite extension is written as SQLite file"""
+        database = str(tmp_path / 'HR_FTE_Database.sqlite')
+
+        assert main(['--quiet', 'ingest', source_excel_file, database, '--period', '202506']) == 0
+
+        assert load_fte_database(database).periods() == ['202506']
+
+    def test_reports(self, source_excel_file, tmp_path, capsys):
+        """Test that chosen reports are generated in output directory and listed"""
+        database = str(tmp_path / 'HR_FTE_Database.xlsx')
+        main(['--quiet', 'ingest', source_excel_file, database, '--period', '202506'])
+        output_dir = tmp_path / 'reports'
+        output_dir.mkdir()
+        capsys.readouterr()
+
+        result = main([
+            '--quiet', 'reports', database, '--start', '202506', '--months', '3',
+            '--report', 'fte_summary', '--report', 'headcount_summary',
+            '--output-dir', str(output_dir), '--sequential',
+        ])
+
+        assert result == 0
+        report_files = capsys.readouterr().out.split()
+        assert len(report_files) == 4
+        assert all(os.path.exists(f) for f in report_files)
+        assert os.path.basename(report_files[0]).startswith('HR_department_fte_summary_report_202506_')
+        assert len([f for f in os.listdir(output_dir) if f.startswith('HR_reports_timing_')]) == 1
+
+    def test_reports_to_missing_output_directory(self, source_excel_file, tmp_path, capsys):
+        """Test that missing output directory is created with the reports and timing report"""
+        database = str(tmp_path / 'HR_FTE_Database.sqlite')
+        main(['--quiet', 'ingest', source_excel_file, database, '--period', '202506'])
+        output_dir = tmp_path / 'reports' / '2025'
+        capsys.readouterr()
+
+        result = main([
+            '--quiet', 'reports', database, '--start', '202506',
+            '--report', 'fte_summary', '--output-dir', str(output_dir), '--sequential',
+        ])
+
+        assert result == 0
+        assert all(os.path.exists(f) for f in capsys.readouterr().out.split())
+        assert len([f for f in os.listdir(output_dir) if f.startswith('HR_reports_timing_')]) == 1
+
+    def test_reports_to_output_directory_not_created(self, tmp_path, capsys):
+        """Test that output directory which cannot be created is an input file error"""
+        (tmp_path / 'file').write_text('')
+
+        result = main([
+            '--no-timing', 'reports', str(tmp_path / 'HR_FTE_Database.xlsx'), '--start', '202506',
+            '--output-dir', str(tmp_path / 'file' / 'reports'),
+        ])
+
+        assert result == exit_code(ReturnCodes.ERROR_FILE_ERROR)
+        assert 'cannot be created' in capsys.readouterr().err
+
+    def test_reports_of_missing_database(self, tmp_path, capsys):
+        """Test that exit code is of the failed database loading"""
+        result = main(['--no-timing', 'reports', str(tmp_path / 'missing.xlsx'), '--start', '202506'])
+
+        assert result == exit_code(ReturnCodes.ERROR_FILE_LOADING)
+        assert capsys.readouterr().err.count('not generated: ERROR_FILE_LOADING') == 3
+
+    def test_wrong_period(self, tmp_path):
+        """Test that period not in yyyymm is an argument error"""
+        with pytest.raises(SystemExit) as exit_info:
+            main(['reports', str(tmp_path / 'HR_FTE_Database.xlsx'), '--start', '2025-06'])
+
+        assert exit_info.value.code == 2
+
+    def test_flet_not_imported(self):
+        """Test that command line does not import the window framework"""
+        src_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+        result = subprocess.run(
+            [sys.executable, '-c', "import sys, cli; print('flet' in sys.modules)"],
+            cwd=src_dir, capture_output=True, text=True, check=True,
+        )
+
+        assert result.stdout.strip() == 'False'
+
+    def test_validate_without_data_and_pdf_libraries(self, source_excel_file):
+        """Test that validation only run does not import pandas and the PDF libraries"""
+        src_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+        code = (
+            "import sys, cli; "
+            "code = cli.main(['--no-timing', 'validate', sys.argv[1]]); "
+            "print(code, ' '.join(sorted({m.split('.')[0] for m in sys.modules if '.' in m})))"
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', code, source_excel_file],
+            cwd=src_dir, capture_output=True, text=True, check=True,
+        )
+
+        exit_code_text, *imported_packages = result.stdout.split()
+        assert exit_code_text == '0'
+        # numpy is imported by openpyxl
+        assert 'openpyxl' in imported_packages
+        for library in ['pandas', 'pymupdf', 'markdown_pdf']:
+            assert library not in imported_packages
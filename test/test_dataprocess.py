@@ -1,4 +1,10 @@
 import pytest
+import logging
+import json
+import sqlite3
+import os
+import subprocess
+import openpyxl
 import pandas as pd
 from unittest.mock import Mock, patch, MagicMock
 import sys
@@ -14,8 +20,44 @@ from dataprocess import (
     prepare_department_headcount_trend_report,
     prepare_department_fte_costcentre_report,
     generate_pdf_report,
-    MAX_NUMBER_MONTH_IN_REPORT
+    MAX_NUMBER_MONTH_IN_REPORT,
+    FteDatabase,
+    load_fte_database,
+    update_fte_database,
+    get_columnar_store_dir,
+    FTE_DATABASE_DTYPES,
+    to_category_dtypes,
+    FTE_CATEGORY_COLUMNS,
+    generate_excel_fr_df,
+    EXCEL_MODE_APPEND,
+    EXCEL_MODE_REPLACE,
+    process_source_data,
+    validate_source_file,
+    configure_logging,
+    set_log_level,
+    set_excel_reader,
+    configure_excel_reader,
+    EXCEL_READER_AUTO,
+    JobControl,
+    aggregate_period,
+    aggregate_periods,
+    FteCube,
+    SqliteFteDatabase,
+    DEPARTMENT_REPORT_GENERATORS,
+    DEFAULT_PDF_WORKERS,
+    generate_department_reports,
+    report_table_html,
+    format_report_numbers,
 )
+from timing import start_timing_report, stop_timing_report
+
+
+def mock_database_file(sheet_names: list):
+    """Return pd.ExcelFile patch of database file with sheet_names, sheets are read by read_excel"""
+
+    excel_file = MagicMock()
+    excel_file.__enter__.return_value.sheet_names = list(sheet_names)
+    return patch('dataprocess.pd.ExcelFile', new=Mock(return_value=excel_file))
 
 
 class TestReturnCodes:
@@ -151,6 +193,7 @@ class TestPrepareDepartmentFTETrendReport:
         
         assert result == ReturnCodes.ERROR_FILE_LOADING
     
+    @mock_database_file(['202305'])
     @patch('dataprocess.pd.read_excel')
     def test_no_available_periods(self, mock_read_excel):
         """Test when no periods are available in data"""
@@ -260,6 +303,7 @@ class TestPrepareDepartmentHeadcountTrendReport:
         
         assert result == ReturnCodes.ERROR_FILE_LOADING
     
+    @mock_database_file(['202305'])
     @patch('dataprocess.pd.read_excel')
     def test_headcount_no_available_periods(self, mock_read_excel):
         """Test when no periods are available"""
@@ -355,6 +399,7 @@ class TestPrepareDepartmentFTECostcentreReport:
         
         assert result == ReturnCodes.ERROR_FILE_LOADING
     
+    @mock_database_file(['202305'])
     @patch('dataprocess.pd.read_excel')
     def test_costcentre_no_available_periods(self, mock_read_excel):
         """Test when no periods match"""
@@ -420,10 +465,131 @@ class TestPrepareDepartmentFTECostcentreReport:
         assert '#135F2f' in result[0]['css']
 
 
+    def test_costcentre_matrix_across_periods(self, fte_period_df):
+        """Test FTE by staff category and rank of each cost centre in columns of periods"""
+        fte_database = FteDatabase('test.xlsx', ['202401', '202402'])
+        fte_database.period_data = {
+            '202401': fte_period_df,
+            '202402': fte_period_df[fte_period_df['cost centre name'] == 'IT'],
+        }
+
+        result = prepare_department_fte_costcentre_report(fte_database, 2024, 1)
+
+        assert list(result['excel_df']) == ['HR', 'IT']
+        hr_df = result['excel_df']['HR']['data']
+        assert list(hr_df.columns) == ['Staff Category', 'Rank', '202401']
+        it_df = result['excel_df']['IT']['data']
+        assert it_df.values.tolist()[:2] == [
+            ['Doctor', 'MO', 1.0, 1.0],
+            ['Nurse', 'RN', 0.9, 0.9],
+        ]
+        assert it_df.loc[2, ['Staff Category', '202401', '202402']].tolist() == ['Total', 1.9, 1.9]
+        assert 'Cost Centre : HR (020)' in result['md'][0]['content']
+
+    def test_staff_category_not_in_last_period(self, fte_period_df):
+        """Test that staff category only in earlier period is kept in report"""
+        fte_database = FteDatabase('test.xlsx', ['202401', '202402'])
+        fte_database.period_data = {
+            '202401': fte_period_df,
+            '202402': fte_period_df[fte_period_df['Staff Category'] == 'Nurse'],
+        }
+
+        result = prepare_department_fte_costcentre_report(fte_database, 2024, 1)
+
+        it_df = result['excel_df']['IT']['data']
+        assert it_df['Staff Category'].tolist() == ['Doctor', 'Nurse', 'Total']
+        assert it_df.loc[0, '202401'] == 1.0
+
+
+class TestFormatReportNumbers:
+    """Test cases for format_report_numbers function"""
+
+    def test_thousands_separator_and_decimals(self):
+        """Test that numbers have thousands separator and decimals, text columns are kept"""
+        table_df = pd.DataFrame({
+            'Staff Category': ['Nurse', 'Total'],
+            'Rank': ['RN', None],
+            '202401': [1234.5, 1234.5],
+            '202402': [0.25, float('nan')],
+        })
+
+        display_df = format_report_numbers(table_df, 1)
+
+        assert display_df['202401'].tolist() == ['1,234.5', '1,234.5']
+        assert display_df.loc[0, '202402'] == '0.2'
+        assert pd.isna(display_df.loc[1, '202402'])
+        assert display_df['Staff Category'].tolist() == ['Nurse', 'Total']
+        assert pd.isna(display_df.loc[1, 'Rank'])
+
+    def test_decimals_of_reports(self):
+        """Test that decimals of fte, headcount and cost centre reports are 2, 0 and 1"""
+        table_df = pd.DataFrame({'Staff Category': ['Nurse'], '202401': [12345.678]})
+
+        assert format_report_numbers(table_df, 2).loc[0, '202401'] == '12,345.68'
+        assert format_report_numbers(table_df, 0).loc[0, '202401'] == '12,346'
+        assert format_report_numbers(table_df, 1).loc[0, '202401'] == '12,345.7'
+
+
+class TestReportTableHtml:
+    """Test cases for report_table_html function"""
+
+    def test_missing_values_and_names_with_nan(self):
+        """Test that missing values are shown as dash and names containing nan are kept"""
+        display_df = pd.DataFrame({
+            'Staff Category': ['Finance', 'Nanny'],
+            '202401': ['1.00', None],
+        })
+
+        table_html = report_table_html(display_df)
+
+        assert '<td>Finance</td><td>1.00</td>' in table_html
+        assert '<td>Nanny</td><td>-</td>' in table_html
+
+    def test_total_row(self):
+        """Test that Total row is bold after two blank rows, empty cells are not bold"""
+        display_df = pd.DataFrame({
+            'Staff Category': ['Nurse', 'Total'],
+            'Rank': ['RN', ''],
+            '202401': ['1.0', '1.0'],
+        })
+
+        table_html = report_table_html(display_df)
+
+        blank_row = '<tr><td></td><td></td><td></td></tr>'
+        assert (
+            f'{blank_row}\n{blank_row}\n'
+            '<tr><td><strong>Total</strong></td><td></td><td><strong>1.0</strong></td></tr>'
+        ) in table_html
+        assert '\n\n' not in table_html
+
+    def test_repeated_values_blank(self):
+        """Test that value of repeated column same as in row above is blank"""
+        display_df = pd.DataFrame({
+            'Staff Category': ['Nurse', 'Nurse', 'Doctor', 'Total'],
+            'Rank': ['RN', 'EN', 'MO', ''],
+            '202401': ['1.0', '1.0', '1.0', '3.0'],
+        })
+
+        table_html = report_table_html(display_df, repeated_column='Staff Category')
+
+        assert '<td>Nurse</td><td>RN</td>' in table_html
+        assert '<td></td><td>EN</td>' in table_html
+        assert '<td>Doctor</td><td>MO</td>' in table_html
+
+    def test_html_escaped(self):
+        """Test that text of cells and headers is escaped"""
+        display_df = pd.DataFrame({'Staff Category': ['R&D <Lab>'], 'A<B': ['1.0']})
+
+        table_html = report_table_html(display_df)
+
+        assert '<th>A&lt;B</th>' in table_html
+        assert '<td>R&amp;D &lt;Lab&gt;</td>' in table_html
+
+
 class TestGeneratePDFReport:
     """Test cases for generate_pdf_report function"""
     
-    @patch('dataprocess.MarkdownPdf')
+    @patch('dataprocess.markdown_pdf.MarkdownPdf')
     def test_generate_pdf_basic(self, mock_markdown_pdf):
         """Test basic PDF generation"""
         mock_pdf_instance = MagicMock()
@@ -439,7 +605,7 @@ class TestGeneratePDFReport:
         except Exception as e:
             pytest.fail(f"PDF generation failed: {e}")
     
-    @patch('dataprocess.MarkdownPdf')
+    @patch('dataprocess.markdown_pdf.MarkdownPdf')
     def test_generate_pdf_with_title(self, mock_markdown_pdf):
         """Test PDF generation with custom title"""
         mock_pdf_instance = MagicMock()
@@ -453,7 +619,7 @@ class TestGeneratePDFReport:
         except Exception:
             pytest.fail("PDF generation with title failed")
     
-    @patch('dataprocess.MarkdownPdf')
+    @patch('dataprocess.markdown_pdf.MarkdownPdf')
     def test_generate_pdf_empty_content(self, mock_markdown_pdf):
         """Test PDF generation with empty content list"""
         mock_pdf_instance = MagicMock()
@@ -468,7 +634,7 @@ class TestGeneratePDFReport:
             # Empty content might cause issues, but should be handled
             pass
     
-    @patch('dataprocess.MarkdownPdf')
+    @patch('dataprocess.markdown_pdf.MarkdownPdf')
     def test_generate_pdf_multiple_sections(self, mock_markdown_pdf):
         """Test PDF generation with multiple content sections"""
         mock_pdf_instance = MagicMock()
@@ -487,6 +653,993 @@ class TestGeneratePDFReport:
             pytest.fail(f"Multi-section PDF generation failed: {e}")
 
 
+    def test_parallel_sections_merged_in_order(self, tmp_path):
+        """Test that sections rendered by worker processes are merged in section order"""
+        pymupdf = pytest.importorskip('pymupdf')
+        content = [{'content': f'# Section {i}', 'css': 'h1 {}'} for i in range(5)]
+
+        result = generate_pdf_report(str(tmp_path / 'report'), content, 'Title', workers=2)
+
+        assert result == ReturnCodes.OK
+        with pymupdf.open(tmp_path / 'report.pdf') as report_pdf:
+            texts = [page.get_text() for page in report_pdf]
+        assert len(texts) == 5
+        assert all(f'Section {i}' in text for i, text in enumerate(texts))
+
+    def test_sections_rendered_one_after_another_without_workers(self, tmp_path):
+        """Test that sections are rendered in calling process when worker processes fail"""
+        pymupdf = pytest.importorskip('pymupdf')
+        content = [{'content': f'# Section {i}', 'css': 'h1 {}'} for i in range(3)]
+
+        with patch('dataprocess.ProcessPoolExecutor', side_effect=OSError('no processes')):
+            result = generate_pdf_report(str(tmp_path / 'report'), content, 'Title', workers=2)
+
+        assert result == ReturnCodes.OK
+        with pymupdf.open(tmp_path / 'report.pdf') as report_pdf:
+            assert len(report_pdf) == 3
+
+
+class TestFteDatabase:
+    """Test cases for FteDatabase shared by report functions"""
+
+    @mock_database_file(['202301'])
+    @patch('dataprocess.pd.read_excel')
+    def test_load_fte_database(self, mock_read_excel, fte_period_df):
+        """Test database file loaded into FteDatabase"""
+        mock_read_excel.return_value = {'202301': fte_period_df}
+
+        fte_database = load_fte_database('test.xlsx')
+
+        assert isinstance(fte_database, FteDatabase)
+        assert fte_database.periods() == ['202301']
+        pd.testing.assert_frame_equal(
+            fte_database.get_period_data('202301'), to_category_dtypes(fte_period_df)
+        )
+
+    @patch('dataprocess.pd.read_excel')
+    def test_load_fte_database_error(self, mock_read_excel):
+        """Test error code when database file cannot be loaded"""
+        mock_read_excel.side_effect = Exception("File not found")
+
+        assert load_fte_database('nonexistent.xlsx') == ReturnCodes.ERROR_FILE_LOADING
+
+    @mock_database_file(['202301', '202302'])
+    @patch('dataprocess.pd.read_excel')
+    def test_database_parsed_once_for_all_reports(self, mock_read_excel, fte_period_df):
+        """Test that the three reports share one parse of the database file"""
+        mock_read_excel.side_effect = mock_database_sheets(
+            {'202301': fte_period_df, '202302': fte_period_df.copy()}
+        )
+
+        fte_database = load_fte_database('test.xlsx')
+        fte_result = prepare_department_fte_trend_report(fte_database, 2023, 1, 2)
+        headcount_result = prepare_department_headcount_trend_report(fte_database, 2023, 1, 2)
+        costcentre_result = prepare_department_fte_costcentre_report(fte_database, 2023, 1, 2)
+
+        assert mock_read_excel.call_count == 1
+        assert isinstance(fte_result, dict)
+        assert isinstance(headcount_result, dict)
+        assert isinstance(costcentre_result, dict)
+        assert len(costcentre_result['md']) == 2
+
+    @patch('dataprocess.pd.read_excel')
+    def test_only_report_periods_parsed(self, mock_read_excel, fte_period_df):
+        """Test that only the sheets of report periods are parsed"""
+        sheets = {f'{y}{str(m).zfill(2)}': fte_period_df for y in range(2020, 2024) for m in range(1, 13)}
+        mock_read_excel.side_effect = mock_database_sheets(sheets)
+
+        with mock_database_file(sheets):
+            fte_database = load_fte_database('test.xlsx')
+        assert len(fte_database.periods()) == 48
+        assert fte_database.period_data == {}
+
+        prepare_department_fte_trend_report(fte_database, 2023, 7, 3)
+
+        assert mock_read_excel.call_count == 1
+        assert mock_read_excel.call_args.kwargs['sheet_name'] == ['202307', '202308', '202309']
+        assert sorted(fte_database.period_data.keys()) == ['202307', '202308', '202309']
+
+    @patch('dataprocess.pd.read_excel')
+    def test_period_sheet_loading_error(self, mock_read_excel, fte_period_df):
+        """Test error code when period sheets cannot be parsed"""
+        mock_read_excel.side_effect = [{'202301': fte_period_df.head(0)}, Exception("Bad sheet")]
+
+        result = prepare_department_fte_trend_report('test.xlsx', 2023, 1, 2)
+
+        assert result == ReturnCodes.ERROR_FILE_LOADING
+
+    @mock_database_file(['202301'])
+    @patch('dataprocess.pd.read_excel')
+    def test_same_result_from_file_name_and_database(self, mock_read_excel, fte_period_df):
+        """Test that loaded FteDatabase gives same report as database file name"""
+        mock_read_excel.return_value = {'202301': fte_period_df}
+
+        from_file = prepare_department_fte_trend_report('test.xlsx', 2023, 1, 2)
+        from_database = prepare_department_fte_trend_report(load_fte_database('test.xlsx'), 2023, 1, 2)
+
+        assert from_file['md'] == from_database['md']
+
+    @mock_database_file(['202301'])
+    @patch('dataprocess.pd.read_excel')
+    def test_database_data_not_modified(self, mock_read_excel, fte_period_df):
+        """Test that report functions do not modify the shared period data"""
+        fte_period_df['allocation'] = fte_period_df['allocation'].astype(str)
+        mock_read_excel.return_value = {'202301': fte_period_df}
+
+        fte_database = load_fte_database('test.xlsx')
+        prepare_department_fte_trend_report(fte_database, 2023, 1, 2)
+
+        assert fte_database.get_period_data('202301')['allocation'].dtype == object
+
+
+class TestAggregatePeriods:
+    """Test cases for aggregate_periods function"""
+
+    def test_tables_of_periods(self, fte_period_df):
+        """Test FTE, headcount and cost centre tables with a column of each period"""
+        second_period_df = fte_period_df[fte_period_df['Staff Category'] == 'Nurse']
+
+        aggregation = aggregate_periods({'202401': fte_period_df, '202402': second_period_df})
+
+        assert aggregation['periods'] == ['202401', '202402']
+        fte_df = aggregation['fte_by_category_df']
+        assert fte_df.loc['Nurse'].tolist() == pytest.approx([1.5, 1.5])
+        assert fte_df.loc['Doctor', '202401'] == pytest.approx(1.0)
+        assert pd.isna(fte_df.loc['Doctor', '202402'])
+        # staff 003 in 2 cost centres is counted once
+        headcount_df = aggregation['headcount_by_category_df']
+        assert headcount_df.loc['Nurse'].tolist() == [2, 2]
+        costcentre_df = aggregation['fte_by_costcentre_df']
+        assert costcentre_df.loc[('IT', 'Nurse', 'RN')].tolist() == pytest.approx([0.9, 0.9])
+        assert aggregation['cost_centre_periods'] == {
+            'HR': ['202401', '202402'], 'IT': ['202401', '202402']
+        }
+        assert aggregation['cost_centre_code_dict'] == {'IT': '010', 'HR': '020'}
+
+    def test_staff_category_order_of_later_period(self, fte_period_df):
+        """Test that staff category order of later period replaces earlier one"""
+        second_period_df = fte_period_df.assign(**{'staff category order': [3, 1, 1, 1]})
+
+        aggregation = aggregate_periods({'202401': fte_period_df, '202402': second_period_df})
+
+        assert aggregation['staff_category_order_df'].values.tolist() == [
+            ['Nurse', 1], ['Doctor', 2]
+        ]
+
+    def test_aggregation_shared_by_reports(self, fte_period_df):
+        """Test that reports of the same FteDatabase aggregate the periods once"""
+        fte_database = FteDatabase('test.xlsx', ['202401'])
+        fte_database.period_data = {'202401': fte_period_df}
+
+        with patch('dataprocess.FteCube', wraps=FteCube) as mock_cube:
+            prepare_department_fte_trend_report(fte_database, 2024, 1)
+            prepare_department_headcount_trend_report(fte_database, 2024, 1)
+            prepare_department_fte_costcentre_report(fte_database, 2024, 1)
+
+        assert mock_cube.call_count == 1
+        assert len(fte_database.aggregations) == 1
+
+    def test_cube_reused_for_period_window(self, fte_period_df):
+        """Test that aggregation of a window of the cube periods does not build the cube again"""
+        periods = ['202401', '202402', '202403']
+        fte_database = FteDatabase('test.xlsx', periods)
+        fte_database.period_data = {period: fte_period_df for period in periods}
+
+        with patch('dataprocess.FteCube', wraps=FteCube) as mock_cube:
+            fte_database.get_aggregation(periods)
+            aggregation = fte_database.get_aggregation(['202402', '202403'])
+
+        assert mock_cube.call_count == 1
+        assert aggregation['periods'] == ['202402', '202403']
+        assert aggregation['fte_by_category_df'].columns.tolist() == ['202402', '202403']
+        assert aggregation['cost_centre_periods']['IT'] == ['202402', '202403']
+
+    def test_zero_allocation_not_missing(self, fte_period_df):
+        """Test that zero FTE of records is 0, and staff category without records is NaN"""
+        second_period_df = fte_period_df.assign(allocation=0.0)
+        second_period_df = second_period_df[second_period_df['Staff Category'] == 'Nurse']
+
+        aggregation = aggregate_periods({'202401': fte_period_df, '202402': second_period_df})
+
+        fte_df = aggregation['fte_by_category_df']
+        assert fte_df.loc['Nurse', '202402'] == 0.0
+        assert pd.isna(fte_df.loc['Doctor', '202402'])
+        costcentre_df = aggregation['fte_by_costcentre_df']
+        assert costcentre_df.loc[('IT', 'Nurse', 'RN'), '202402'] == 0.0
+
+
+class TestColumnarStore:
+    """Test cases for columnar store of FTE database"""
+
+    def test_store_written_with_new_database(self, tmp_path, fte_period_df):
+        """Test that columnar store is written next to new database file"""
+        pytest.importorskip('pyarrow')
+        database_file_name = str(tmp_path / 'HR_FTE_Database')
+
+        result = update_fte_database(database_file_name, '202301', fte_period_df)
+
+        assert result == ReturnCodes.OK_GEN_NEW_DATABASE
+        store_dir = get_columnar_store_dir(database_file_name + '.xlsx')
+        assert (tmp_path / 'HR_FTE_Database_columnar' / '202301.parquet').exists()
+        assert store_dir == str(tmp_path / 'HR_FTE_Database_columnar')
+
+    def test_reports_read_from_store(self, tmp_path, fte_period_df):
+        """Test that database is loaded from columnar store with same data as excel file"""
+        pytest.importorskip('pyarrow')
+        database_file_name = str(tmp_path / 'HR_FTE_Database')
+        update_fte_database(database_file_name, '202301', fte_period_df)
+
+        with patch('dataprocess.pd.read_excel') as mock_read_excel:
+            fte_database = load_fte_database(database_file_name + '.xlsx')
+            result = prepare_department_fte_costcentre_report(fte_database, 2023, 1, 2)
+            assert mock_read_excel.call_count == 0
+
+        assert fte_database.columnar_store_dir is not None
+        excel_df = pd.read_excel(database_file_name + '.xlsx', sheet_name='202301', dtype=FTE_DATABASE_DTYPES)
+        pd.testing.assert_frame_equal(
+            fte_database.get_period_data('202301'), to_category_dtypes(excel_df), check_dtype=False
+        )
+        assert isinstance(result, dict)
+
+    def test_reports_from_stored_aggregates(self, tmp_path, fte_period_df):
+        """Test that reports are built from stored period aggregates without period records"""
+        pytest.importorskip('pyarrow')
+        database_file_name = str(tmp_path / 'HR_FTE_Database')
+        update_fte_database(database_file_name, '202301', fte_period_df)
+        update_fte_database(database_file_name, '202302', fte_period_df.head(2))
+        expected = aggregate_periods({'202301': fte_period_df, '202302': fte_period_df.head(2)})
+
+        with patch('dataprocess.pd.read_parquet', wraps=pd.read_parquet) as mock_read_parquet:
+            fte_database = load_fte_database(database_file_name + '.xlsx')
+            aggregation = fte_database.get_aggregation(['202301', '202302'])
+
+        assert fte_database.period_data == {}
+        assert all(
+            c.args[0].endswith('.aggregates.parquet') for c in mock_read_parquet.call_args_list
+        )
+        for name in ['fte_by_category_df', 'headcount_by_category_df', 'fte_by_costcentre_df']:
+            pd.testing.assert_frame_equal(aggregation[name], expected[name])
+        assert aggregation['cost_centre_code_dict'] == expected['cost_centre_code_dict']
+
+    def test_only_new_period_aggregated(self, tmp_path, fte_period_df):
+        """Test that adding a period to database aggregates that period only"""
+        pytest.importorskip('pyarrow')
+        database_file_name = str(tmp_path / 'HR_FTE_Database')
+        update_fte_database(database_file_name, '202301', fte_period_df)
+
+        with patch('dataprocess.aggregate_period', wraps=aggregate_period) as mock_aggregate:
+            update_fte_database(database_file_name, '202302', fte_period_df)
+            fte_database = load_fte_database(database_file_name + '.xlsx')
+            prepare_department_fte_trend_report(fte_database, 2023, 1, 2)
+
+        assert mock_aggregate.call_count == 1
+        assert (tmp_path / 'HR_FTE_Database_columnar' / '202302.aggregates.parquet').exists()
+
+    def test_store_without_aggregates_rebuilt(self, tmp_path, fte_period_df):
+        """Test that columnar store written without aggregates is rebuilt on next update"""
+        pytest.importorskip('pyarrow')
+        database_file_name = str(tmp_path / 'HR_FTE_Database')
+        update_fte_database(database_file_name, '202301', fte_period_df)
+        store_dir = tmp_path / 'HR_FTE_Database_columnar'
+        (store_dir / '202301.aggregates.parquet').unlink()
+        manifest = json.loads((store_dir / 'manifest.json').read_text())
+        del manifest['aggregates_version']
+        (store_dir / 'manifest.json').write_text(json.dumps(manifest))
+
+        assert load_fte_database(database_file_name + '.xlsx').aggregates_in_store is False
+        update_fte_database(database_file_name, '202302', fte_period_df)
+
+        assert (store_dir / '202301.aggregates.parquet').exists()
+        assert load_fte_database(database_file_name + '.xlsx').aggregates_in_store is True
+
+    def test_store_not_used_after_excel_changed(self, tmp_path, fte_period_df):
+        """Test that columnar store is ignored when database excel file is changed outside the program"""
+        pytest.importorskip('pyarrow')
+        database_file_name = str(tmp_path / 'HR_FTE_Database')
+        update_fte_database(database_file_name, '202301', fte_period_df)
+
+        with pd.ExcelWriter(database_file_name + '.xlsx') as writer:
+            fte_period_df.to_excel(writer, sheet_name='202301', index=False)
+            fte_period_df.to_excel(writer, sheet_name='202302', index=False)
+
+        fte_database = load_fte_database(database_file_name + '.xlsx')
+
+        assert fte_database.columnar_store_dir is None
+        assert fte_database.periods() == ['202301', '202302']
+
+    def test_store_not_used_without_parquet_library(self, tmp_path, fte_period_df):
+        """Test that excel file is used when parquet library is not installed"""
+        database_file_name = str(tmp_path / 'HR_FTE_Database')
+
+        with patch('dataprocess.columnar_store_available', return_value=False):
+            result = update_fte_database(database_file_name, '202301', fte_period_df)
+            fte_database = load_fte_database(database_file_name + '.xlsx')
+
+        assert result == ReturnCodes.OK_GEN_NEW_DATABASE
+        assert not (tmp_path / 'HR_FTE_Database_columnar').exists()
+        assert fte_database.columnar_store_dir is None
+        assert len(fte_database.get_period_data('202301')) == len(fte_period_df)
+
+
+class TestSqliteDatabase:
+    """Test cases for FTE database in SQLite file"""
+
+    def test_period_added_and_reported(self, tmp_path, fte_period_df):
+        """Test that periods written to SQLite database give the same aggregation as records"""
+        database_file = str(tmp_path / 'HR_FTE_Database.sqlite')
+
+        assert update_fte_database(database_file, '202401', fte_period_df) == ReturnCodes.OK_GEN_NEW_DATABASE
+        assert update_fte_database(database_file, '202402', fte_period_df.head(2)) == ReturnCodes.OK_UPDATE_DATABASE
+
+        fte_database = load_fte_database(database_file)
+        assert isinstance(fte_database, SqliteFteDatabase)
+        assert fte_database.periods() == ['202401', '202402']
+        aggregation = fte_database.get_aggregation(['202401', '202402'])
+        expected = aggregate_periods({'202401': fte_period_df, '202402': fte_period_df.head(2)})
+        for name in ['fte_by_category_df', 'headcount_by_category_df', 'fte_by_costcentre_df']:
+            pd.testing.assert_frame_equal(aggregation[name], expected[name])
+        assert aggregation['cost_centre_code_dict'] == expected['cost_centre_code_dict']
+        pd.testing.assert_frame_equal(
+            fte_database.get_period_data('202401'), to_category_dtypes(fte_period_df), check_dtype=False
+        )
+
+    def test_existing_period_not_appended(self, tmp_path, fte_period_df):
+        """Test that existing period is kept in append mode and overwritten in replace mode"""
+        database_file = str(tmp_path / 'HR_FTE_Database.db')
+        update_fte_database(database_file, '202401', fte_period_df)
+
+        result = update_fte_database(database_file, '202401', fte_period_df.head(1))
+        assert result == ReturnCodes.ERROR_DATABASE_PERIOD_EXISTED
+        assert len(load_fte_database(database_file).get_period_data('202401')) == 4
+
+        result = update_fte_database(database_file, '202401', fte_period_df.head(1), mode=EXCEL_MODE_REPLACE)
+        assert result == ReturnCodes.OK_UPDATE_DATABASE
+        assert len(load_fte_database(database_file).get_period_data('202401')) == 1
+
+    def test_failed_insert_rolled_back(self, tmp_path, fte_period_df):
+        """Test that period is not partly written when insert fails"""
+        database_file = str(tmp_path / 'HR_FTE_Database.sqlite')
+        update_fte_database(database_file, '202401', fte_period_df)
+        # value of unsupported type fails the insert after the old records are deleted
+        bad_df = fte_period_df.assign(**{'cost centre name': ['IT', 'IT', {'HR': 1}, 'IT']})
+
+        result = update_fte_database(database_file, '202401', bad_df, mode=EXCEL_MODE_REPLACE)
+
+        assert result == ReturnCodes.ERROR_FILE_ERROR
+        assert len(load_fte_database(database_file).get_period_data('202401')) == 4
+
+    def test_indexes_and_wal_mode(self, tmp_path, fte_period_df):
+        """Test that database is in WAL mode with indexes of period, cost centre code and staff category"""
+        database_file = str(tmp_path / 'HR_FTE_Database.sqlite')
+        update_fte_database(database_file, '202401', fte_period_df)
+
+        with sqlite3.connect(database_file) as connection:
+            journal_mode = connection.execute('PRAGMA journal_mode').fetchone()[0]
+            indexes = [
+                [row[2] for row in connection.execute(f'PRAGMA index_info({index[1]})')]
+                for index in connection.execute('PRAGMA index_list(fte_records)')
+            ]
+        assert journal_mode == 'wal'
+        assert ['cost_centre_code', 'period'] in indexes
+        assert ['period', 'staff_category'] in indexes
+        assert any(index[0] == 'period' for index in indexes)
+
+    def test_missing_database(self, tmp_path):
+        """Test error code of missing SQLite database file"""
+        assert load_fte_database(str(tmp_path / 'missing.sqlite')) == ReturnCodes.ERROR_FILE_LOADING
+        assert not (tmp_path / 'missing.sqlite').exists()
+
+
+class TestUpdateDatabase:
+    """Test cases for appending and replacing periods of FTE database"""
+
+    def test_existing_file_not_overwritten_in_new_mode(self, tmp_path, fte_period_df):
+        """Test that new mode refuses to write existing file"""
+        report_name = str(tmp_path / 'report')
+        generate_excel_fr_df(report_name, {'fte': {'data': fte_period_df}})
+
+        result = generate_excel_fr_df(report_name, {'fte': {'data': fte_period_df}})
+
+        assert result == ReturnCodes.ERROR_FILE_ERROR
+
+    @pytest.mark.parametrize('engine', ['xlsxwriter', 'openpyxl'])
+    def test_report_numbers_written_as_numbers(self, tmp_path, engine):
+        """Test that report numbers are numbers of number format, cells centred, by both writer engines"""
+        if engine == 'xlsxwriter':
+            pytest.importorskip('xlsxwriter')
+        report_name = str(tmp_path / 'report')
+        header_df = pd.DataFrame({'title': ['FTE', 'Company']})
+        data_df = pd.DataFrame({
+            'Staff Category': ['Nurse', 'Total'],
+            'Rank': ['RN', None],
+            '202401': [1234.5, 1234.5],
+        })
+
+        with patch('dataprocess.excel_writer_engine', return_value=engine):
+            result = generate_excel_fr_df(
+                report_name,
+                {'IT': {'header': header_df, 'data': data_df, 'number_format': '#,##0.0'}},
+            )
+
+        assert result == ReturnCodes.OK_GEN_NEW_DATABASE
+        worksheet = openpyxl.load_workbook(report_name + '.xlsx')['IT']
+        assert worksheet['A1'].value == 'FTE'
+        assert [cell.value for cell in worksheet[3]] == ['Staff Category', 'Rank', '202401']
+        assert worksheet['C4'].value == 1234.5
+        assert worksheet['C4'].number_format == '#,##0.0'
+        assert worksheet['C4'].alignment.horizontal == 'center'
+        assert worksheet['A4'].number_format == 'General'
+        assert worksheet['B5'].value is None
+
+    def test_append_period(self, tmp_path, fte_period_df):
+        """Test that new period is added and existing period kept"""
+        database_file_name = str(tmp_path / 'HR_FTE_Database')
+        update_fte_database(database_file_name, '202301', fte_period_df)
+
+        result = update_fte_database(database_file_name, '202302', fte_period_df.head(2))
+
+        assert result == ReturnCodes.OK_UPDATE_DATABASE
+        sheets = pd.read_excel(database_file_name + '.xlsx', sheet_name=None, dtype=FTE_DATABASE_DTYPES)
+        assert list(sheets.keys()) == ['202301', '202302']
+        pd.testing.assert_frame_equal(sheets['202301'], fte_period_df)
+        assert len(sheets['202302']) == 2
+
+    def test_append_period_to_file_name_with_extension(self, tmp_path, fte_period_df):
+        """Test that period is added to database file picked with its .xlsx extension"""
+        database_excel_file = str(tmp_path / 'HR_FTE_Database.xlsx')
+        update_fte_database(str(tmp_path / 'HR_FTE_Database'), '202301', fte_period_df)
+
+        result = update_fte_database(database_excel_file, '202302', fte_period_df.head(2))
+
+        assert result == ReturnCodes.OK_UPDATE_DATABASE
+        assert os.listdir(tmp_path).count('HR_FTE_Database.xlsx.xlsx') == 0
+        assert load_fte_database(database_excel_file).periods() == ['202301', '202302']
+
+    def test_append_existing_period_refused(self, tmp_path, fte_period_df):
+        """Test that appending a period already in database is refused"""
+        database_file_name = str(tmp_path / 'HR_FTE_Database')
+        update_fte_database(database_file_name, '202301', fte_period_df)
+
+        result = update_fte_database(database_file_name, '202301', fte_period_df.head(2), mode=EXCEL_MODE_APPEND)
+
+        assert result == ReturnCodes.ERROR_DATABASE_PERIOD_EXISTED
+        sheet = pd.read_excel(database_file_name + '.xlsx', sheet_name='202301')
+        assert len(sheet) == len(fte_period_df)
+
+    def test_replace_period(self, tmp_path, fte_period_df):
+        """Test that replaced period is overwritten at same sheet position"""
+        database_file_name = str(tmp_path / 'HR_FTE_Database')
+        update_fte_database(database_file_name, '202301', fte_period_df)
+        update_fte_database(database_file_name, '202302', fte_period_df)
+
+        result = update_fte_database(database_file_name, '202301', fte_period_df.head(1), mode=EXCEL_MODE_REPLACE)
+
+        assert result == ReturnCodes.OK_UPDATE_DATABASE
+        sheets = pd.read_excel(database_file_name + '.xlsx', sheet_name=None)
+        assert list(sheets.keys()) == ['202301', '202302']
+        assert len(sheets['202301']) == 1
+        assert len(sheets['202302']) == len(fte_period_df)
+
+    def test_columnar_store_follows_updates(self, tmp_path, fte_period_df):
+        """Test that columnar store has all periods after append and replace"""
+        pytest.importorskip('pyarrow')
+        database_file_name = str(tmp_path / 'HR_FTE_Database')
+        update_fte_database(database_file_name, '202301', fte_period_df)
+        update_fte_database(database_file_name, '202302', fte_period_df)
+        update_fte_database(database_file_name, '202301', fte_period_df.head(1), mode=EXCEL_MODE_REPLACE)
+
+        fte_database = load_fte_database(database_file_name + '.xlsx')
+
+        assert fte_database.columnar_store_dir is not None
+        assert fte_database.periods() == ['202301', '202302']
+        assert isinstance(fte_database.get_period_data('202302')['Rank'].dtype, pd.CategoricalDtype)
+        assert len(fte_database.get_period_data('202301')) == 1
+
+    def test_columnar_store_rebuilt_when_out_of_date(self, tmp_path, fte_period_df):
+        """Test that columnar store is rebuilt from database excel file when it is out of date"""
+        pytest.importorskip('pyarrow')
+        database_file_name = str(tmp_path / 'HR_FTE_Database')
+        with pd.ExcelWriter(database_file_name + '.xlsx') as writer:
+            fte_period_df.to_excel(writer, sheet_name='202301', index=False)
+
+        update_fte_database(database_file_name, '202302', fte_period_df)
+        fte_database = load_fte_database(database_file_name + '.xlsx')
+
+        assert fte_database.columnar_store_dir is not None
+        assert fte_database.periods() == ['202301', '202302']
+        pd.testing.assert_frame_equal(
+            fte_database.get_period_data('202301'), to_category_dtypes(fte_period_df)
+        )
+
+
+class TestProcessSourceData:
+    """Test cases for process_source_data function"""
+
+    def test_process_source_data(self, source_excel_file):
+        """Test that base records are expanded by override records"""
+        result = process_source_data(source_excel_file)
+
+        hr_fte_df = result['hr_fte_df']
+        assert list(hr_fte_df.columns) == [
+            'staff_number', 'Rank', 'Staff Category', 'staff category order',
+            'cost centre code', 'cost centre name', 'allocation',
+        ]
+        assert hr_fte_df['staff_number'].tolist() == ['1002', '1002', '1003', '1001', '1004']
+        assert hr_fte_df['cost centre code'].tolist() == ['010', '020', '020', '010', '020']
+        assert hr_fte_df['cost centre name'].tolist() == ['IT', 'HR', 'HR', 'IT', 'HR']
+        assert hr_fte_df['allocation'].tolist() == pytest.approx([0.48, 0.32, 0.5, 1.0, 1.0])
+        assert hr_fte_df['staff category order'].tolist() == [1, 1, 2, 2, 1]
+        assert result['issue_staff_numbers_not_in_base'] == ['9999']
+        assert result['issue_expand_staff_fte_not_1'] == ['1003(0.5)']
+
+    def test_repeated_columns_category_dtype(self, source_excel_file):
+        """Test that repeated text columns of FTE records are category dtype"""
+        hr_fte_df = process_source_data(source_excel_file)['hr_fte_df']
+
+        for column in FTE_CATEGORY_COLUMNS:
+            assert isinstance(hr_fte_df[column].dtype, pd.CategoricalDtype)
+        assert hr_fte_df['allocation'].dtype == 'float64'
+
+    def test_source_file_opened_once(self, source_excel_file):
+        """Test that source excel file is opened once and not read again per sheet"""
+        with patch('dataprocess.pd.ExcelFile', wraps=pd.ExcelFile) as mock_excel_file, \
+                patch('dataprocess.pd.read_excel') as mock_read_excel:
+            result = process_source_data(source_excel_file)
+
+        assert isinstance(result, dict)
+        assert mock_excel_file.call_count == 1
+        assert mock_read_excel.call_count == 0
+
+    def test_without_staff_category_order_sheet(self, tmp_path, source_sheets):
+        """Test that staff category is in alphabetical order without the optional sheet"""
+        file_path = write_source_excel_file(tmp_path / 'source.xlsx', source_sheets[:3])
+
+        result = process_source_data(file_path)
+
+        orders = result['hr_fte_df'].drop_duplicates('Staff Category')
+        assert dict(zip(orders['Staff Category'], orders['staff category order'])) == {
+            'Doctor': 1, 'Nurse': 2
+        }
+
+    def test_cost_centre_not_enabled(self, tmp_path, source_sheets):
+        """Test error code when override record has cost centre not enabled"""
+        source_sheets[1].loc[0, 'CCode'] = 30
+        file_path = write_source_excel_file(tmp_path / 'source.xlsx', source_sheets)
+
+        assert process_source_data(file_path) == ReturnCodes.ERROR_FILE_DATA_ERROR
+
+    def test_staff_category_without_order(self, tmp_path, source_sheets):
+        """Test error code when staff category is not in staff category order sheet"""
+        source_sheets[3] = source_sheets[3].head(1)
+        file_path = write_source_excel_file(tmp_path / 'source.xlsx', source_sheets)
+
+        assert process_source_data(file_path) == ReturnCodes.ERROR_FILE_DATA_ERROR
+
+    def test_missing_sheet(self, tmp_path, source_sheets):
+        """Test error code when cost centre sheet is missing"""
+        file_path = write_source_excel_file(tmp_path / 'source.xlsx', source_sheets[:2])
+
+        assert process_source_data(file_path) == ReturnCodes.ERROR_FILE_ERROR
+
+    def test_file_not_found(self, tmp_path):
+        """Test error code when source file cannot be opened"""
+        assert process_source_data(str(tmp_path / 'missing.xlsx')) == ReturnCodes.ERROR_FILE_ERROR
+
+
+class TestValidateSourceFile:
+    """Test cases for validate_source_file function"""
+
+    def test_valid_source_file(self, source_excel_file):
+        """Test that no problem is found, override sheet header is on row 2"""
+        assert validate_source_file(source_excel_file) == []
+
+    def test_all_problems_reported(self, tmp_path, source_sheets):
+        """Test that missing headers of every sheet are reported together"""
+        source_sheets[0] = source_sheets[0].drop(columns=['FTE', 'Section'])
+        source_sheets[2] = source_sheets[2].rename(columns={'Value': 'Code'})
+        source_sheets[3] = source_sheets[3].drop(columns=['Order'])
+        file_path = write_source_excel_file(tmp_path / 'source.xlsx', source_sheets)
+
+        assert validate_source_file(file_path) == [
+            "Sheet 1 'Sheet1' (Base) row 1 missing headers: Section, FTE",
+            "Sheet 3 'Sheet3' (Cost Centre) row 1 missing headers: Value",
+            "Sheet 4 'Sheet4' (Staff Category Order) row 1 missing headers: Order",
+        ]
+
+    def test_override_header_not_on_row_2(self, tmp_path, source_sheets):
+        """Test that override sheet with header on the first row is reported"""
+        file_path = tmp_path / 'source.xlsx'
+        with pd.ExcelWriter(file_path) as writer:
+            for i, sheet_df in enumerate(source_sheets):
+                sheet_df.to_excel(writer, sheet_name=f'Sheet{i + 1}', index=False)
+
+        problems = validate_source_file(str(file_path))
+
+        assert len(problems) == 1
+        assert problems[0].startswith("Sheet 2 'Sheet2' (Override) row 2 missing headers: StaffNo")
+
+    def test_missing_sheets(self, tmp_path, source_sheets):
+        """Test that too few sheets are reported with headers of the sheets found"""
+        source_sheets[0] = source_sheets[0].drop(columns=['Rank'])
+        file_path = write_source_excel_file(tmp_path / 'source.xlsx', source_sheets[:2])
+
+        assert validate_source_file(file_path) == [
+            "Source file has 2 sheets, 3 sheets (Base, Override, Cost Centre) are required",
+            "Sheet 1 'Sheet1' (Base) row 1 missing headers: Rank",
+        ]
+
+    def test_file_not_opened(self, tmp_path):
+        """Test that file not found is reported"""
+        problems = validate_source_file(str(tmp_path / 'missing.xlsx'))
+
+        assert len(problems) == 1
+        assert problems[0].startswith('Source file cannot be opened')
+
+    def test_sheets_not_parsed_when_invalid(self, tmp_path, source_sheets, caplog):
+        """Test that process_source_data returns error before parsing sheets of invalid file"""
+        source_sheets[1] = source_sheets[1].drop(columns=['CCode'])
+        file_path = write_source_excel_file(tmp_path / 'source.xlsx', source_sheets)
+
+        with patch('dataprocess.pd.ExcelFile') as mock_excel_file:
+            result = process_source_data(file_path)
+
+        assert result == ReturnCodes.ERROR_FILE_ERROR
+        assert mock_excel_file.call_count == 0
+        assert 'missing headers: CCode' in caplog.text
+
+
+class TestExcelReader:
+    """Test cases for selecting excel reader engine"""
+
+    @pytest.fixture(autouse=True)
+    def restore_excel_reader(self):
+        yield
+        set_excel_reader(EXCEL_READER_AUTO)
+
+    def test_same_data_of_engines(self, source_excel_file):
+        """Test that source data read by calamine is the same as read by openpyxl"""
+        pytest.importorskip('python_calamine')
+        set_excel_reader('openpyxl')
+        expected = process_source_data(source_excel_file)
+        set_excel_reader('calamine')
+
+        with patch('dataprocess.pd.ExcelFile', wraps=pd.ExcelFile) as mock_excel_file:
+            result = process_source_data(source_excel_file)
+
+        assert mock_excel_file.call_args.kwargs['engine'] == 'calamine'
+        pd.testing.assert_frame_equal(result['hr_fte_df'], expected['hr_fte_df'])
+
+    def test_fallback_to_openpyxl(self, tmp_path, fte_period_df):
+        """Test that database is read by openpyxl when the faster engine fails"""
+        pytest.importorskip('python_calamine')
+        database_file_name = str(tmp_path / 'HR_FTE_Database')
+        with pd.ExcelWriter(database_file_name + '.xlsx') as writer:
+            fte_period_df.to_excel(writer, sheet_name='202301', index=False)
+        excel_file = pd.ExcelFile
+
+        def failing_calamine(*args, **kwargs):
+            if kwargs['engine'] == 'calamine':
+                raise ValueError('not readable')
+            return excel_file(*args, **kwargs)
+
+        with patch('dataprocess.pd.ExcelFile', side_effect=failing_calamine) as mock_excel_file:
+            fte_database = load_fte_database(database_file_name + '.xlsx')
+
+        assert [c.kwargs['engine'] for c in mock_excel_file.call_args_list] == ['calamine', 'openpyxl']
+        assert fte_database.periods() == ['202301']
+
+    def test_source_read_again_by_openpyxl(self, source_excel_file):
+        """Test that whole source file is read by openpyxl when a sheet fails with the faster engine"""
+        pytest.importorskip('python_calamine')
+        expected = process_source_data(source_excel_file)
+        excel_file = pd.ExcelFile
+
+        def failing_calamine_sheet(*args, **kwargs):
+            opened = excel_file(*args, **kwargs)
+            if kwargs['engine'] == 'calamine':
+                parse = opened.parse
+
+                def parse_first_sheet(sheet_name, **parse_kwargs):
+                    if sheet_name != 0:
+                        raise ValueError('not readable')
+                    return parse(sheet_name=sheet_name, **parse_kwargs)
+
+                opened.parse = parse_first_sheet
+            return opened
+
+        with patch('dataprocess.pd.ExcelFile', side_effect=failing_calamine_sheet) as mock_excel_file:
+            result = process_source_data(source_excel_file)
+
+        assert [c.kwargs['engine'] for c in mock_excel_file.call_args_list] == ['calamine', 'openpyxl']
+        pd.testing.assert_frame_equal(result['hr_fte_df'], expected['hr_fte_df'])
+
+    def test_selected_engine_not_fallen_back(self, source_excel_file):
+        """Test that error of the selected engine is returned without trying other engines"""
+        set_excel_reader('openpyxl')
+
+        with patch('dataprocess.pd.ExcelFile', side_effect=ValueError('not readable')) as mock_excel_file:
+            result = process_source_data(source_excel_file)
+
+        assert result == ReturnCodes.ERROR_FILE_ERROR
+        assert mock_excel_file.call_count == 1
+
+    def test_engine_of_environment_variable(self, monkeypatch, caplog):
+        """Test that unknown engine is an error, and engine is set by environment variable"""
+        with pytest.raises(ValueError):
+            set_excel_reader('xlrd')
+        monkeypatch.setenv('HR_COST_EXCEL_READER', 'xlrd')
+        configure_excel_reader()
+        assert "Unknown excel reader 'xlrd'" in caplog.text
+
+        monkeypatch.setenv('HR_COST_EXCEL_READER', 'OpenPyXL')
+        configure_excel_reader()
+
+        with patch('dataprocess.pd.ExcelFile') as mock_excel_file:
+            load_fte_database('test.xlsx')
+        assert mock_excel_file.call_args.kwargs['engine'] == 'openpyxl'
+
+
+class TestLazyImports:
+    """Test cases for libraries imported on first use"""
+
+    def test_import_without_heavy_libraries(self):
+        """Test that importing the module does not run data, excel and PDF libraries"""
+        src_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+        code = (
+            "import sys, dataprocess; "
+            "print(' '.join(sorted({m.split('.')[0] for m in sys.modules if '.' in m})))"
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', code], cwd=src_dir, capture_output=True, text=True, check=True
+        )
+
+        imported_packages = result.stdout.split()
+        for library in ['pandas', 'numpy', 'openpyxl', 'pymupdf', 'markdown_pdf', 'pyarrow']:
+            assert library not in imported_packages
+
+    def test_display_options_not_changed(self):
+        """Test that pandas display options of other modules are not changed"""
+        assert pd.get_option('display.float_format') is None
+
+
+class TestLogging:
+    """Test cases for log output of data processing"""
+
+    @pytest.fixture(autouse=True)
+    def restore_log_level(self):
+        yield
+        set_log_level(logging.WARNING)
+
+    def test_debug_messages_when_enabled(self, caplog, source_excel_file):
+        """Test that debug messages are logged when log level is DEBUG"""
+        set_log_level('debug')
+
+        with caplog.at_level(logging.DEBUG, logger='dataprocess'):
+            process_source_data(source_excel_file)
+
+        assert 'Total records processed: 5' in caplog.text
+
+    def test_no_debug_messages_by_default(self, caplog, source_excel_file, monkeypatch):
+        """Test that debug messages and dataframe formatting are skipped by default"""
+        monkeypatch.delenv('HR_COST_LOG_LEVEL', raising=False)
+        configure_logging()
+
+        with patch.object(pd.DataFrame, '__str__') as mock_str:
+            process_source_data(source_excel_file)
+
+        assert mock_str.call_count == 0
+        assert not [r for r in caplog.records if r.levelno < logging.WARNING]
+
+    def test_log_level_from_environment(self, monkeypatch):
+        """Test that log level is set by environment variable"""
+        monkeypatch.setenv('HR_COST_LOG_LEVEL', 'debug')
+
+        configure_logging()
+
+        assert logging.getLogger('dataprocess').level == logging.DEBUG
+
+
+class TestJobControl:
+    """Test cases for progress report and cancel of jobs"""
+
+    def test_source_processing_progress(self, source_excel_file):
+        """Test that progress is reported for each stage of source processing"""
+        progress = []
+        job_control = JobControl(lambda stage, fraction: progress.append((stage, fraction)))
+
+        result = process_source_data(source_excel_file, job_control)
+
+        assert isinstance(result, dict)
+        assert [fraction for _, fraction in progress] == [0.0, 0.2, 0.4, 0.6, 0.8]
+
+    def test_cancel_before_source_processing(self, source_excel_file):
+        """Test that cancelled job does not process source file"""
+        job_control = JobControl()
+        job_control.cancel()
+
+        assert process_source_data(source_excel_file, job_control) == ReturnCodes.ERROR_CANCELLED
+
+    def test_cancel_between_cost_centres(self, fte_period_df):
+        """Test that cost centre report stops at next cost centre when cancelled"""
+        fte_database = FteDatabase('test.xlsx', ['202401'])
+        fte_database.period_data = {'202401': fte_period_df}
+        stages = []
+
+        def progress_callback(stage, fraction):
+            stages.append(stage)
+            if stage.startswith('Cost centre'):
+                job_control.cancel()
+
+        job_control = JobControl(progress_callback)
+        result = prepare_department_fte_costcentre_report(fte_database, 2024, 1, 12, job_control)
+
+        assert result == ReturnCodes.ERROR_CANCELLED
+        assert stages == ['Loading database', 'Cost centre HR']
+
+    @patch('dataprocess.markdown_pdf.MarkdownPdf')
+    def test_cancelled_pdf_not_saved(self, mock_markdown_pdf):
+        """Test that PDF is not saved when job is cancelled"""
+        job_control = JobControl()
+        job_control.cancel()
+
+        result = generate_pdf_report('report', [{'content': '# Test', 'css': ''}], job_control=job_control)
+
+        assert result == ReturnCodes.ERROR_CANCELLED
+        mock_markdown_pdf.return_value.save.assert_not_called()
+
+    def test_sub_jobs_progress_and_cancel(self):
+        """Test that sub jobs report average progress and share cancel request of their job"""
+        progress = []
+        job_control = JobControl(lambda stage, fraction: progress.append((stage, fraction)))
+        sub_jobs = job_control.sub_jobs(['a', 'b'])
+
+        sub_jobs['a'].checkpoint('Writing PDF', 1, 1)
+        sub_jobs['b'].checkpoint('Writing Excel', 1, 2)
+        job_control.cancel()
+
+        assert progress == [('a: Writing PDF', 0.5), ('b: Writing Excel', 0.75)]
+        assert sub_jobs['b'].checkpoint('Writing Excel', 2, 2) is True
+
+
+class TestGenerateDepartmentReports:
+    """Test cases for generate_department_reports function"""
+
+    @pytest.fixture
+    def report_files(self, tmp_path):
+        return {
+            key: (str(tmp_path / f'{key}_report'), 'Title')
+            for key in DEPARTMENT_REPORT_GENERATORS
+        }
+
+    def test_failed_report_does_not_stop_others(self, fte_period_df, report_files):
+        """Test that failure of a report is returned for that report only"""
+        fte_database = FteDatabase('test.xlsx', ['202401'])
+        fte_database.period_data = {'202401': fte_period_df}
+        failing_report = Mock(side_effect=ValueError('failed'))
+        ok_report = Mock(return_value=ReturnCodes.OK)
+
+        with patch.dict(
+            'dataprocess.DEPARTMENT_REPORT_GENERATORS',
+            {'fte_summary': ok_report, 'headcount_summary': failing_report, 'fte_costcentre': ok_report},
+        ):
+            results = generate_department_reports(
+                fte_database, report_files, 2024, 1, concurrent=False
+            )
+
+        assert results == {
+            'fte_summary': ReturnCodes.OK,
+            'headcount_summary': ReturnCodes.ERROR_PROGRAM,
+            'fte_costcentre': ReturnCodes.OK,
+        }
+        assert ok_report.call_count == 2
+
+    def test_reports_generated_concurrently(self, tmp_path, fte_period_df, report_files):
+        """Test that reports generated in worker processes write PDF and excel files of each report"""
+        database_file_name = str(tmp_path / 'HR_FTE_Database')
+        update_fte_database(database_file_name, '202401', fte_period_df)
+
+        results = generate_department_reports(
+            database_file_name + '.xlsx', report_files, 2024, 1, concurrent=True
+        )
+
+        assert results == {key: ReturnCodes.OK for key in report_files}
+        for report_file_name, _ in report_files.values():
+            assert (tmp_path / (report_file_name + '.pdf')).exists()
+            assert (tmp_path / (report_file_name + '.xlsx')).exists()
+
+    def test_concurrent_reports_render_pdf_alone(self, fte_period_df, report_files):
+        """Test that reports in worker processes get one PDF worker, not pdf_workers each"""
+        fte_database = FteDatabase('test.xlsx', ['202401'])
+        fte_database.period_data = {'202401': fte_period_df}
+
+        with patch(
+            'dataprocess.generate_department_reports_concurrently',
+            return_value={key: ReturnCodes.OK for key in report_files},
+        ) as mock_concurrently:
+            generate_department_reports(
+                fte_database, report_files, 2024, 1, concurrent=True, pdf_workers=4
+            )
+
+        assert mock_concurrently.call_args.args[-1] == DEFAULT_PDF_WORKERS
+
+    def test_reports_generated_one_after_another_without_workers(
+        self, tmp_path, fte_period_df, report_files
+    ):
+        """Test that reports are generated in calling process when worker processes cannot start"""
+        database_file_name = str(tmp_path / 'HR_FTE_Database')
+        update_fte_database(database_file_name, '202401', fte_period_df)
+
+        with patch('dataprocess.ProcessPoolExecutor', side_effect=OSError('no processes')):
+            results = generate_department_reports(
+                database_file_name + '.xlsx', report_files, 2024, 1, concurrent=True
+            )
+
+        assert results == {key: ReturnCodes.OK for key in report_files}
+        for report_file_name, _ in report_files.values():
+            assert (tmp_path / (report_file_name + '.pdf')).exists()
+
+    def test_aggregation_copy(self, fte_period_df):
+        """Test that copy for worker processes has aggregated data of periods only"""
+        fte_database = FteDatabase('test.xlsx', ['202401'])
+        fte_database.period_data = {'202401': fte_period_df}
+
+        database_copy = fte_database.aggregation_copy(['202401'])
+
+        assert database_copy.period_data == {}
+        assert database_copy.period_aggregates == {}
+        assert database_copy.cube is None
+        assert database_copy.has_aggregation(['202401'])
+        assert fte_database.period_data == {'202401': fte_period_df}
+        result = prepare_department_fte_trend_report(database_copy, 2024, 1)
+        assert result['excel_df']['fte']['data'].equals(
+            prepare_department_fte_trend_report(fte_database, 2024, 1)['excel_df']['fte']['data']
+        )
+
+    def test_database_error_returned_for_each_report(self, report_files):
+        """Test that database loading error is returned for all reports"""
+        results = generate_department_reports('missing.xlsx', report_files, 2024, 1)
+
+        assert results == {key: ReturnCodes.ERROR_FILE_LOADING for key in report_files}
+
+
+class TestTiming:
+    """Test cases for timing spans of data processing stages"""
+
+    def test_process_source_data_stages(self, source_excel_file):
+        """Test that every stage of source processing is timed"""
+        timing_report = start_timing_report('update database')
+        try:
+            process_source_data(source_excel_file)
+        finally:
+            stop_timing_report()
+
+        assert list(timing_report.stage_totals(max_depth=1)) == [
+            'process_source_data',
+            'process_source_data/validate source file',
+            'process_source_data/open source file',
+            'process_source_data/read base sheet',
+            'process_source_data/read override sheet',
+            'process_source_data/read cost centre sheet',
+            'process_source_data/read staff category order sheet',
+            'process_source_data/expand records',
+        ]
+
+    def test_report_stages(self, fte_period_df):
+        """Test that report preparation stages are timed"""
+        fte_database = FteDatabase('test.xlsx', ['202401', '202402'])
+        fte_database.period_data = {'202401': fte_period_df, '202402': fte_period_df}
+
+        timing_report = start_timing_report('generate reports')
+        try:
+            prepare_department_fte_costcentre_report(fte_database, 2024, 1)
+        finally:
+            stop_timing_report()
+
+        stages = timing_report.stage_totals(max_depth=1)
+        assert 'prepare_department_fte_costcentre_report/load periods' in stages
+        assert stages['prepare_department_fte_costcentre_report/html table']['count'] == 2
+
+
 class TestIntegration:
     """Integration tests for the module"""
     
@@ -595,6 +1748,77 @@ def sample_dataframe():
     })
 
 
+def mock_database_sheets(sheets: dict):
+    """Return read_excel side effect returning the requested sheets of database"""
+
+    def read_excel(io, sheet_name=0, **kwargs):
+        if sheet_name is None:
+            names = list(sheets.keys())
+        else:
+            names = sheet_name
+        return {name: sheets[name] for name in names}
+
+    return read_excel
+
+
+@pytest.fixture
+def fte_period_df():
+    """Fixture providing a period dataframe as stored in FTE database"""
+    return pd.DataFrame({
+        'staff_number': ['001', '002', '003', '003'],
+        'Rank': ['MO', 'RN', 'RN', 'RN'],
+        'Staff Category': ['Doctor', 'Nurse', 'Nurse', 'Nurse'],
+        'staff category order': [1, 2, 2, 2],
+        'cost centre code': ['010', '010', '020', '010'],
+        'cost centre name': ['IT', 'IT', 'HR', 'IT'],
+        'allocation': [1.0, 0.5, 0.6, 0.4],
+    })
+
+
+@pytest.fixture
+def source_sheets():
+    """Fixture providing base, override, cost centre and staff category order sheets of source file"""
+    base_df = pd.DataFrame({
+        'StaffNo': [1001, 1002, 1003, 1004],
+        'Rank': ['RN', 'MO', 'RN', 'MO'],
+        'Section': ['A', 'B', 'A', 'B'],
+        'Staff Category': ['Nurse', 'Doctor', 'Nurse', 'Doctor'],
+        'FTE': [1.0, 0.8, 1.0, 1.0],
+        'Default Cost Centre': [10, 10, 20, 20],
+    })
+    expand_df = pd.DataFrame({
+        'StaffNo': [1002, 1002, 9999, 1003],
+        'Rank': ['MO', 'MO', 'RN', 'RN'],
+        'CCode': [10, 20, 10, 20],
+        'CostCentre': ['IT', 'HR', 'IT', 'HR'],
+        'Allocated Percentage': [60, 40, 100, 50],
+    })
+    cost_centre_df = pd.DataFrame({
+        'Value': ['010', '020', '030'],
+        'Description': ['IT', 'HR', 'Closed'],
+        'Enabled/ Disabled': ['Enabled', 'Enabled', 'Disabled'],
+    })
+    order_df = pd.DataFrame({'Staff Category': ['Nurse', 'Doctor'], 'Order': [20, 10]})
+    return [base_df, expand_df, cost_centre_df, order_df]
+
+
+def write_source_excel_file(file_path, sheets: list) -> str:
+    """Write source excel file with sheets, override sheet has a title row above header"""
+    with pd.ExcelWriter(file_path) as writer:
+        for i, sheet_df in enumerate(sheets):
+            startrow = 1 if i == 1 else 0
+            if i == 1:
+                pd.DataFrame([['Override']]).to_excel(writer, sheet_name=f'Sheet{i + 1}', index=False, header=False)
+            sheet_df.to_excel(writer, sheet_name=f'Sheet{i + 1}', index=False, startrow=startrow)
+    return str(file_path)
+
+
+@pytest.fixture
+def source_excel_file(tmp_path, source_sheets):
+    """Fixture providing a source excel file"""
+    return write_source_excel_file(tmp_path / 'source.xlsx', source_sheets)
+
+
 @pytest.fixture
 def mock_excel_file(tmp_path, sample_dataframe):
     """Fixture providing a mock Excel file"""
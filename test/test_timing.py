@@ -0,0 +1,158 @@
+import pytest
+import json
+import sys
+import threading
+
+sys.path.insert(0, "../src")
+
+# Import the module to test
+from timing import (
+    TimingReport,
+    start_timing_report,
+    stop_timing_report,
+    timing_span,
+    add_timing_spans,
+)
+
+
+@pytest.fixture(autouse=True)
+def no_active_timing_report():
+    stop_timing_report()
+    yield
+    stop_timing_report()
+
+
+class TestTimingSpan:
+    """Test cases for timing_span function"""
+
+    def test_nested_spans(self):
+        """Test that nested spans are recorded with path of their parents"""
+        timing_report = start_timing_report('run')
+
+        with timing_span('outer'):
+            with timing_span('inner'):
+                pass
+            with timing_span('inner'):
+                pass
+
+        stop_timing_report()
+        assert [s['path'] for s in timing_report.spans] == [
+            'outer/inner', 'outer/inner', 'outer'
+        ]
+        assert [s['depth'] for s in timing_report.spans] == [1, 1, 0]
+        assert timing_report.stage_totals(max_depth=1)['outer/inner']['count'] == 2
+
+    def test_decorator(self):
+        """Test that span used as decorator times each call"""
+        @timing_span('stage')
+        def stage(value):
+            return value * 2
+
+        timing_report = start_timing_report('run')
+        assert stage(1) == 2
+        assert stage(2) == 4
+        stop_timing_report()
+
+        assert timing_report.stage_totals() == {
+            'stage': {'seconds': pytest.approx(0.0, abs=1.0), 'count': 2}
+        }
+
+    def test_span_recorded_on_exception(self):
+        """Test that span is recorded when the stage raises exception"""
+        timing_report = start_timing_report('run')
+
+        with pytest.raises(ValueError):
+            with timing_span('stage'):
+                raise ValueError('failed')
+        with timing_span('next'):
+            pass
+
+        assert [s['path'] for s in timing_report.spans] == ['stage', 'next']
+
+    def test_no_active_timing_report(self):
+        """Test that nothing is recorded when timing report is not started"""
+        with timing_span('stage'):
+            pass
+
+        assert stop_timing_report() is None
+
+    def test_spans_of_threads(self):
+        """Test that spans of worker threads are added to the same report"""
+        timing_report = start_timing_report('run')
+
+        def worker():
+            with timing_span('worker'):
+                pass
+
+        with timing_span('main'):
+            threads = [threading.Thread(target=worker) for _ in range(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+        paths = [s['path'] for s in timing_report.spans]
+        assert paths.count('worker') == 4
+        assert paths.count('main') == 1
+
+    def test_spans_of_other_process(self):
+        """Test that spans of another process are nested in the current span"""
+        timing_report = start_timing_report('run')
+        worker_spans = [
+            {'path': 'report/stage', 'start': 0.5, 'seconds': 1.0},
+            {'path': 'report', 'start': 0.0, 'seconds': 2.0},
+        ]
+
+        with timing_span('main'):
+            add_timing_spans(worker_spans, timing_report.start_time)
+
+        assert [s['path'] for s in timing_report.spans] == [
+            'main/report/stage', 'main/report', 'main'
+        ]
+        assert timing_report.spans[0]['start'] == pytest.approx(0.5)
+
+
+class TestTimingReport:
+    """Test cases for TimingReport class"""
+
+    def test_save_json(self, tmp_path):
+        """Test that timing report is saved as JSON with stage totals"""
+        start_timing_report('run')
+        with timing_span('stage'):
+            with timing_span('step'):
+                pass
+        timing_report = stop_timing_report()
+
+        file_name = tmp_path / 'timing.json'
+        timing_report.save_json(file_name)
+
+        with open(file_name) as f:
+            content = json.load(f)
+        assert content['name'] == 'run'
+        assert content['total_seconds'] >= 0
+        assert list(content['stages']) == ['stage', 'stage/step']
+        assert len(content['spans']) == 2
+
+    def test_summary(self):
+        """Test that summary lists stages within depth"""
+        timing_report = TimingReport('run')
+        timing_report.add_span('stage', timing_report.start_time, 1.5)
+        timing_report.add_span('stage/step', timing_report.start_time, 0.5)
+        timing_report.add_span('stage/step', timing_report.start_time, 0.25)
+        timing_report.add_span('stage/step/detail', timing_report.start_time, 0.1)
+        timing_report.stop()
+
+        lines = timing_report.summary().splitlines()
+        assert lines[0].startswith('Timing run: ')
+        assert lines[1:] == ['  stage: 1.50s', '    step x2: 0.75s']
+
+    def test_stage_totals_in_tree_order(self):
+        """Test that stages of concurrent threads are listed under their parent"""
+        timing_report = TimingReport('run')
+        start = timing_report.start_time
+        timing_report.add_span('a', start, 1.0)
+        timing_report.add_span('b', start + 0.1, 1.0)
+        timing_report.add_span('a/step', start + 0.2, 0.5)
+        timing_report.add_span('b/step', start + 0.3, 0.5)
+
+        assert list(timing_report.stage_totals(max_depth=1)) == ['a', 'a/step', 'b', 'b/step']